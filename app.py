@@ -1,13 +1,17 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Depends, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Literal
+from starlette.background import BackgroundTask
 from dotenv import load_dotenv
-import uvicorn
 import os
 import time
 import json
+import uuid
+import asyncio
+import math
+from contextlib import aclosing, asynccontextmanager
 from datetime import datetime
 import logging
 
@@ -26,11 +30,122 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+def start_redmine_sync():
+    """Starts the background replica sync when the tools read a Redmine replica."""
+    if os.environ.get("REDMINE_SYNC_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None, None
+    # Import here to avoid circular imports
+    from src.agents.database import STORE
+    from src.redmine.replica import RedmineReplica
+    if not isinstance(STORE, RedmineReplica):
+        return None, None
+
+    from src.redmine.sync import RedmineSync
+    sync = RedmineSync.from_env(STORE)
+    logger.info(f"Starting Redmine sync every {sync.interval_seconds}s")
+    return sync, asyncio.create_task(sync.run())
+
+def start_issue_search_build():
+    """Builds the issue search index in the background when the tools read a replica.
+
+    The index covers every issue, so on a large replica this would otherwise
+    delay the first search_issues call.
+    """
+    from src.agents.database import STORE
+    from src.redmine.replica import RedmineReplica
+    if not isinstance(STORE, RedmineReplica):
+        return None
+    from src.agents.search import get_issue_search
+    return asyncio.create_task(asyncio.to_thread(get_issue_search().build))
+
+# Seconds a stopping worker waits for in-flight chats and streams to finish
+GRACEFUL_SHUTDOWN_SECONDS = float(os.environ.get("GRACEFUL_SHUTDOWN_SECONDS", 30))
+
+# Largest batch /chat/batch accepts in one request
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", 1000))
+
+def warm_up(app: FastAPI):
+    """Loads the LLM client and the agent graph in threads while the worker already serves.
+
+    A cold start therefore does not delay /health; chats wait for what they use
+    through their dependencies, so plain chats never wait for (or fail with) the agent.
+    """
+    app.state.llm_warmup = asyncio.create_task(asyncio.to_thread(load_llm, app))
+    app.state.agent_warmup = asyncio.create_task(asyncio.to_thread(load_agent, app))
+
+def load_llm(app: FastAPI):
+    """Creates the async OpenAI client used by plain chats."""
+    # Import here: openai is one of the slow imports of the process
+    from src.llm.openai import AsyncOpenAI
+    app.state.llm = AsyncOpenAI()
+
+def load_agent(app: FastAPI):
+    """Compiles the agent graph (langchain, langgraph)."""
+    start = time.perf_counter()
+    # Import here: these are the slow imports of the process
+    from src.agents.agent import get_graph
+    app.state.agent = get_graph()
+    logger.info(f"Worker {os.getpid()} loaded the agent in {time.perf_counter() - start:.2f}s")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Import here to avoid circular imports
+    from src.utils.admission import AdmissionController
+    from src.utils.config import checkpoint_backend
+    from src.utils.lifecycle import InFlightRequests
+    from src.utils.tracing import get_tracer
+
+    # Resources shared by every request of this worker process; the LLM client
+    # and the agent (app.state.llm, .agent) are set by the warmup. The tools'
+    # store stays the module-level STORE of src.agents.database.
+    # Refuses to start a worker with per-process conversations when there are several workers
+    checkpoint_backend()
+    app.state.llm = None
+    warm_up(app)
+    app.state.in_flight = InFlightRequests()
+    app.state.admission = AdmissionController.from_env()
+
+    sync, sync_task = start_redmine_sync()
+    search_task = start_issue_search_build()
+    logger.info(f"Worker {os.getpid()} serving")
+    yield
+
+    # Stop taking chats and let the running ones (streams included) finish
+    remaining = await app.state.in_flight.drain(GRACEFUL_SHUTDOWN_SECONDS)
+    if remaining:
+        logger.warning(f"Shutting down with {remaining} requests still in flight")
+    if sync_task is not None:
+        sync_task.cancel()
+        try:
+            await sync_task
+        except asyncio.CancelledError:
+            pass
+        sync.close()
+    if search_task is not None:
+        # The build runs in a thread, which finishes on its own; only the wait is cancelled
+        search_task.cancel()
+        try:
+            await search_task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Issue search build failed: {e}")
+    for name in ("llm", "agent"):
+        try:
+            await getattr(app.state, f"{name}_warmup")
+        except Exception as e:
+            logger.error(f"Warmup of the {name} failed: {e}")
+    if app.state.llm is not None:
+        await app.state.llm.aclose()
+    # Writes the traces still queued for the exporter
+    get_tracer().close()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Redmine Assistant API",
     description="API for Redmine project management assistant",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -51,36 +166,256 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Process metrics (response cache, node, tool and LLM call latencies, tokens, ...) in the Prometheus text format."""
+    from src.utils.metrics import REGISTRY
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 # Chat request model
 class ChatRequest(BaseModel):
     query: str
     conversation_history: Optional[List[Dict[str, str]]] = None
+    # When a Redmine user is given the query goes through the tool-using agent
+    user: Optional[str] = None
+    session_id: Optional[str] = None
 
 # Chat response model
 class ChatResponse(BaseModel):
     response: str
 
+# Dependencies: the resources the lifespan handler created for this worker.
+# Right after a cold start they wait for their warmup; a failed warmup fails the chats that need it.
+async def get_llm(http_request: Request):
+    await http_request.app.state.llm_warmup
+    return http_request.app.state.llm
+
+async def load_agent_graph(http_request: Request):
+    try:
+        await http_request.app.state.agent_warmup
+    except Exception as e:
+        logger.error(f"Agent unavailable: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Agent unavailable: {str(e)}")
+    return http_request.app.state.agent
+
+async def get_agent(http_request: Request, request: ChatRequest):
+    """The agent graph for chats with a user; None for plain chats, which do not wait for it."""
+    return await load_agent_graph(http_request) if request.user else None
+
+def overloaded(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(status_code=503, detail=detail, headers={"Retry-After": str(math.ceil(retry_after))})
+
+def get_in_flight(request: Request):
+    in_flight = request.app.state.in_flight
+    if in_flight.draining:
+        # The worker is shutting down; the client should retry on another one
+        raise overloaded("Server is shutting down", 1)
+    return in_flight
+
+async def admit(http_request: Request, request: ChatRequest):
+    """Waits for an admission slot for this chat; raises 503 with Retry-After when overloaded."""
+    from src.utils.admission import AdmissionRejected, estimate_chat_cost
+    llm_calls, tokens = estimate_chat_cost(request.query, request.conversation_history, agent=bool(request.user))
+    # Anonymous chats are limited per session, or per client address without one
+    user = request.user or request.session_id or (http_request.client.host if http_request.client else None)
+    try:
+        return await http_request.app.state.admission.acquire(user, llm_calls, tokens)
+    except AdmissionRejected as e:
+        logger.warning(f"Chat rejected: {e}")
+        raise overloaded(f"Server is busy ({e.reason}), retry later", e.retry_after)
+
+def is_rate_limited(error: Exception) -> bool:
+    """True for OpenAI's 429; openai is already loaded by the warmup when a chat fails."""
+    import openai
+    return isinstance(error, openai.RateLimitError)
+
+def upstream_rate_limited(http_request: Request, error) -> float:
+    """Holds back new chats after an OpenAI 429 and returns the seconds to wait."""
+    from src.utils.admission import upstream_retry_after
+    retry_after = upstream_retry_after(error)
+    http_request.app.state.admission.upstream_limited(retry_after)
+    logger.warning(f"OpenAI rate limit reached, retry after {retry_after}s")
+    return retry_after
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request, llm=Depends(get_llm), agent=Depends(get_agent),
+               in_flight=Depends(get_in_flight)):
+    ticket = await admit(http_request, request)
     try:
-        # Import here to avoid circular imports
-        from src.llm.openai import OpenAI
-        
-        # Initialize OpenAI client
-        openai_client = OpenAI()
-        
-        # Get response from OpenAI
-        response = openai_client.get_assistant_response(request.query, request.conversation_history)
-        
-        return {"response": response}
+        async with ticket, in_flight.track("request"):
+            if request.user:
+                # Import here to avoid circular imports
+                from src.agents.agent import acall_agent
+
+                result = await acall_agent(
+                    request.query,
+                    request.session_id or str(uuid.uuid4()),
+                    request.user,
+                    request.conversation_history or [],
+                    graph=agent
+                )
+                return {"response": result["message"]}
+
+            # Get response from OpenAI without blocking the event loop
+            response = await llm.get_assistant_response(request.query, request.conversation_history)
+
+            return {"response": response}
     except Exception as e:
+        if is_rate_limited(e):
+            raise overloaded("The language model is rate limited, retry later", upstream_rate_limited(http_request, e))
         logger.error(f"Error in chat endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
 
 
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request, llm=Depends(get_llm), agent=Depends(get_agent),
+                      in_flight=Depends(get_in_flight)):
+    """Streams the reply as Server-Sent Events: token, tool_start, tool_end, then end (or error)."""
+    # Admitted before the response starts, so an overloaded server can still answer 503
+    ticket = await admit(http_request, request)
+
+    async def event_stream():
+        try:
+            # Tracked inside the generator so shutdown waits for the whole stream
+            async with ticket, in_flight.track("stream"):
+                if request.user:
+                    # Import here to avoid circular imports
+                    from src.agents.agent import astream_agent
+
+                    async for event, data in astream_agent(
+                        request.query,
+                        request.session_id or str(uuid.uuid4()),
+                        request.user,
+                        request.conversation_history or [],
+                        graph=agent
+                    ):
+                        yield sse_event(event, data)
+                    return
+
+                parts = []
+                async for token in llm.stream_assistant_response(request.query, request.conversation_history):
+                    parts.append(token)
+                    yield sse_event("token", {"content": token})
+                yield sse_event("end", {"message": "".join(parts)})
+        except Exception as e:
+            if is_rate_limited(e):
+                retry_after = upstream_rate_limited(http_request, e)
+                yield sse_event("error", {"message": "The language model is rate limited, retry later", "retry_after": retry_after})
+                return
+            logger.error(f"Error in chat stream endpoint: {str(e)}")
+            yield sse_event("error", {"message": f"Error generating response: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Frees the slot even if the client left before the stream started
+        background=BackgroundTask(ticket.release)
+    )
+
+
+# Batch request models
+class BatchItem(BaseModel):
+    # Identifies the item's result line; the item's position when not given
+    id: Optional[str] = None
+    query: str
+    conversation_history: Optional[List[Dict[str, str]]] = None
+    user: Optional[str] = None
+    session_id: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    # "concurrent" answers right away; "provider" goes through OpenAI's Batch API at half the price, but slowly
+    mode: Literal["concurrent", "provider"] = "concurrent"
+    concurrency: Optional[int] = Field(None, ge=1)
+
+async def get_batch_agent(http_request: Request, request: BatchRequest):
+    """The agent graph when an item has a user or the batch goes through the provider; None otherwise."""
+    needed = request.mode == "provider" or any(item.user for item in request.items)
+    return await load_agent_graph(http_request) if needed else None
+
+@app.post("/chat/batch")
+async def chat_batch(request: BatchRequest, http_request: Request, llm=Depends(get_llm), agent=Depends(get_batch_agent),
+                     in_flight=Depends(get_in_flight)):
+    """Answers many chats; streams one JSON line per item as it finishes (NDJSON).
+
+    Result lines are {"id", "response"} or {"id", "error"}. In provider mode the
+    stream also carries {"batch", "round", "status", ...} progress lines while
+    OpenAI works on the batch.
+    """
+    if not request.items or len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch takes between 1 and {BATCH_MAX_ITEMS} items")
+    items = [dict(item.model_dump(), id=item.id or str(index)) for index, item in enumerate(request.items)]
+    if len({item["id"] for item in items}) < len(items):
+        raise HTTPException(status_code=400, detail="Batch item ids must be unique")
+
+    async def result_lines():
+        # Import here to avoid circular imports
+        from src.agents.batch import BATCH_MAX_CONCURRENCY, astream_batch, astream_provider_batch
+        try:
+            # Tracked inside the generator so shutdown waits for the whole batch
+            async with in_flight.track("batch"):
+                if request.mode == "provider":
+                    results = astream_provider_batch(items, graph=agent)
+                else:
+                    # Each item is still admitted on its own, like a /chat request
+                    concurrency = min(request.concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+                    results = astream_batch(items, llm, agent, concurrency, http_request.app.state.admission)
+                async with aclosing(results) as stream:
+                    async for line in stream:
+                        yield json.dumps(line, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.error(f"Error in chat batch endpoint: {str(e)}")
+            yield json.dumps({"error": f"Error running batch: {str(e)}"}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        result_lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/chat/batch/{batch_id}")
+async def chat_batch_results(batch_id: str):
+    """Status and, once finished, results of a provider batch, for clients that lost the /chat/batch stream.
+
+    Streams the {"batch", "status", "completed", "total"} line, then the
+    {"id", "response"} or {"id", "error"} lines of the batch's items (NDJSON).
+    """
+    async def result_lines():
+        # Import here to avoid circular imports
+        from src.agents.batch import astream_batch_results
+        try:
+            async with aclosing(astream_batch_results(batch_id)) as stream:
+                async for line in stream:
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.error(f"Error fetching batch {batch_id}: {str(e)}")
+            yield json.dumps({"error": f"Error fetching batch: {str(e)}"}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        result_lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
 # For Google Cloud Run, we need to use the PORT environment variable
 port = int(os.environ.get("PORT", 8080))
 
-# Run the application
+# Run the application (production images use gunicorn, see gunicorn.conf.py)
 if __name__ == "__main__":
-    uvicorn.run("app:app", host="0.0.0.0", port=port, reload=False)  # Disable reload for production to avoid duplicate schedulers
+    import uvicorn
+    from src.utils.config import worker_count
+
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=port,
+        reload=False,  # Disable reload for production to avoid duplicate schedulers
+        workers=worker_count(),
+        timeout_graceful_shutdown=int(GRACEFUL_SHUTDOWN_SECONDS)
+    )
@@ -0,0 +1,91 @@
+"""
+A traffic spike on /chat against a rate-limited fake LLM, with and without admission limits.
+
+Without limits every request goes upstream at once, most of them get 429s and
+only fail after the OpenAI client's retries. With the admission controller sized
+to the same requests per minute, requests are let through at the rate upstream
+accepts, and the ones that could not be served within the queue timeout are
+turned away immediately with 503 and Retry-After.
+
+    python benchmarks/bench_admission.py --requests 200 --rpm 600 --latency 0.2
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+import numpy as np
+
+from benchmarks.fake_openai import create_app, run_server
+
+
+async def spike(app, requests):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=120) as client:
+        async def one(i):
+            start = time.perf_counter()
+            response = await client.post("/chat", json={"query": f"pregunta {i}", "session_id": f"spike-{i}"})
+            return response.status_code, time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(requests)))
+        return results, time.perf_counter() - start
+
+
+async def run(api, requests):
+    # ASGITransport does not run the lifespan handler that creates the shared resources
+    async with api.app.router.lifespan_context(api.app):
+        return await spike(api.app, requests)
+
+
+def ms(values, q):
+    return np.percentile(np.array(values) * 1000, q) if values else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rpm", type=float, default=600, help="Requests per minute the fake LLM accepts")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake upstream latency in seconds")
+    parser.add_argument("--queue-timeout", type=float, default=5)
+    args = parser.parse_args()
+
+    fake = create_app(args.latency, rpm=args.rpm)
+    with run_server(fake) as url:
+        os.environ["OPENAI_BASE_URL"] = f"{url}/v1"
+        os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+        os.environ["REDMINE_SYNC_ENABLED"] = "false"
+        import app as api
+        # Every rejection and upstream retry is logged; only the summary matters here
+        logging.disable(logging.WARNING)
+
+        scenarios = {
+            "no limits": {"ADMISSION_MAX_CONCURRENCY": "100000", "ADMISSION_MAX_QUEUE": "100000",
+                          "LLM_REQUESTS_PER_MINUTE": "0"},
+            "admission": {"ADMISSION_MAX_CONCURRENCY": "32", "ADMISSION_MAX_QUEUE": "64",
+                          "ADMISSION_QUEUE_TIMEOUT_SECONDS": str(args.queue_timeout),
+                          "LLM_REQUESTS_PER_MINUTE": str(args.rpm)},
+        }
+        print(f"{args.requests} simultaneous chats, upstream accepts {args.rpm:.0f} requests/min, "
+              f"latency {args.latency * 1000:.0f} ms")
+        for name, env in scenarios.items():
+            os.environ.update(env, OPENAI_API_KEY="sk-benchmark")
+            fake.state.requests = fake.state.rate_limited = 0
+            time.sleep(1.1)  # start with a fresh upstream rate window
+            results, elapsed = asyncio.run(run(api, args.requests))
+            ok = [seconds for status, seconds in results if status == 200]
+            busy = [seconds for status, seconds in results if status == 503]
+            failed = len(results) - len(ok) - len(busy)
+            print(f"{name:<10} {elapsed:5.1f}s  200: {len(ok):>4} (p50 {ms(ok, 50):6.0f} ms, p95 {ms(ok, 95):6.0f} ms)  "
+                  f"503: {len(busy):>4} (p95 {ms(busy, 95):6.0f} ms)  other: {failed}  "
+                  f"upstream calls {fake.state.requests}, 429s {fake.state.rate_limited}")
+
+
+if __name__ == "__main__":
+    main()
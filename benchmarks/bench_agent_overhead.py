@@ -0,0 +1,86 @@
+"""
+Per-turn agent overhead: rebuilding the graph and LLM on every call vs the cached ones.
+
+The LLM is replaced by a stub that answers instantly, so the numbers only reflect
+the work done around the model call.
+
+    python benchmarks/bench_agent_overhead.py --turns 200
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.agents import agent
+
+
+class StubLLM:
+    """Answers every prompt immediately without tool calls."""
+
+    def invoke(self, messages, *args, **kwargs):
+        return AIMessage(content="ok")
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        return AIMessage(content="ok")
+
+
+STUB = StubLLM()
+
+
+def legacy_turn(session_id):
+    """Mimics the old behaviour: new graph, new ChatOpenAI and re-bound tools per turn."""
+    def rebuild_llm(model=None):
+        agent._build_llm_with_tools(model)
+        return STUB
+
+    agent.get_llm_with_tools = rebuild_llm
+    graph = agent.build_graph()
+    graph.invoke(
+        {"messages": [HumanMessage(content="hola")], "user": "sally"},
+        config={"configurable": {"thread_id": session_id}}
+    )
+
+
+def cached_turn(session_id):
+    agent.get_llm_with_tools = lambda model=None: STUB
+    graph = agent.get_graph()
+    graph.invoke(
+        {"messages": [HumanMessage(content="hola")], "user": "sally"},
+        config={"configurable": {"thread_id": session_id}}
+    )
+
+
+def run(label, turn, turns):
+    turn(str(uuid.uuid4()))  # warm-up
+    start = time.perf_counter()
+    for _ in range(turns):
+        # A new session per turn: threads keep their history, and a growing one is not what is measured here
+        turn(str(uuid.uuid4()))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<8} {turns} turns  {elapsed * 1000 / turns:8.2f} ms/turn")
+    return elapsed / turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=100)
+    args = parser.parse_args()
+
+    # ChatOpenAI refuses to build without a key; no request is ever sent
+    os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+    # Keep remote tracing out of the measurement
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+    before = run("before", legacy_turn, args.turns)
+    after = run("after", cached_turn, args.turns)
+    print(f"speedup  {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
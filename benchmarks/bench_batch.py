@@ -0,0 +1,159 @@
+"""
+Bulk agent questions: one /chat at a time versus /chat/batch, concurrent and through the Batch API.
+
+Runs the API in-process against the local fake OpenAI server and answers the same
+--items questions of one user three ways: sequential /chat requests, one
+/chat/batch request answered by a pool of --concurrency workers, and one
+/chat/batch request in provider mode (OpenAI's Batch API, served by the fake
+server after --batch-latency seconds). Reports the wall time, the LLM calls, the
+tool lookups actually executed (the rest were shared within the batch) and the
+estimated cost at list prices, half of it for the Batch API.
+
+    python benchmarks/bench_batch.py --items 40 --concurrency 8 --latency 0.3
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+
+from benchmarks.bench_e2e import AGENT_SCRIPT, REPLY
+from benchmarks.fake_openai import create_app, run_server
+
+# All routed to the full agent; the fake model looks at the project's open issues for each
+QUESTIONS = [
+    "¿Qué incidencias abiertas de Project Phoenix debería atender primero y por qué?",
+    "Resume el estado de Project Phoenix y sus riesgos",
+    "¿Por qué se retrasan las incidencias de Project Phoenix?",
+    "Recomienda un plan para cerrar las incidencias abiertas de Project Phoenix",
+]
+
+# The Batch API costs half the list price
+BATCH_DISCOUNT = 0.5
+
+
+def tool_executions() -> int:
+    """Tool calls that ran so far, i.e. were neither cached nor shared with a concurrent identical call."""
+    from src.agents.agent import TOOLS_BY_NAME
+    from src.agents.memo import TOOL_CACHE_REQUESTS
+    return int(sum(TOOL_CACHE_REQUESTS.value(tool=name, result="miss") for name in TOOLS_BY_NAME))
+
+
+def cost(tokens: dict, discount: float = 1.0) -> float:
+    from src.agents.router import price_for
+    from src.llm.resilience import get_resilient_llm
+    prompt, _, completion = price_for(get_resilient_llm("agent").model) or (0, 0, 0)
+    return discount * (tokens["prompt"] * prompt + tokens["completion"] * completion) / 1_000_000
+
+
+def make_items(count: int) -> list[dict]:
+    # A new session per item: each question starts its own conversation
+    return [
+        {"id": str(i), "query": QUESTIONS[i % len(QUESTIONS)], "user": "sally", "session_id": f"batch-{uuid.uuid4().hex}"}
+        for i in range(count)
+    ]
+
+
+async def sequential(client, items):
+    errors = 0
+    for item in items:
+        response = await client.post("/chat", json={k: v for k, v in item.items() if k != "id"})
+        errors += response.status_code != 200 or response.json()["response"].startswith("Error:")
+    return errors
+
+
+async def batch(client, items, mode, concurrency):
+    errors, answered = 0, 0
+    body = {"items": items, "mode": mode, "concurrency": concurrency}
+    async with client.stream("POST", "/chat/batch", json=body) as response:
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            result = json.loads(line)
+            if "id" not in result:
+                if "error" in result:
+                    errors += 1
+                continue  # progress of the provider batch
+            answered += 1
+            errors += "error" in result or result["response"].startswith("Error:")
+    return errors + len(items) - answered
+
+
+async def run(api, upstream, args):
+    from src.agents import memo
+    # Only lookups shared within one run or batch count; the cross-request cache would hide the difference
+    memo.SHARED_CACHE.get = lambda key, default=None: default
+    results = {}
+    async with api.app.router.lifespan_context(api.app):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=600) as client:
+            # Warm-up: the agent loads, first-use imports
+            await client.post("/chat", json={"query": QUESTIONS[0], "user": "sally"})
+            scenarios = {
+                "sequential /chat": lambda items: sequential(client, items),
+                f"batch x{args.concurrency}": lambda items: batch(client, items, "concurrent", args.concurrency),
+                "batch provider": lambda items: batch(client, items, "provider", None),
+            }
+            for name, scenario in scenarios.items():
+                calls, tools = upstream.state.requests, tool_executions()
+                tokens = dict(upstream.state.tokens)
+                start = time.perf_counter()
+                errors = await scenario(make_items(args.items))
+                elapsed = time.perf_counter() - start
+                used = {kind: upstream.state.tokens[kind] - tokens[kind] for kind in tokens}
+                results[name] = {
+                    "seconds": elapsed,
+                    "errors": errors,
+                    "llm_calls": upstream.state.requests - calls,
+                    "tool_runs": tool_executions() - tools,
+                    "cost": cost(used, BATCH_DISCOUNT if name == "batch provider" else 1.0),
+                }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8, help="Workers of the concurrent batch")
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake upstream latency in seconds")
+    parser.add_argument("--batch-latency", type=float, default=2, help="Seconds the fake Batch API takes per batch")
+    args = parser.parse_args()
+
+    upstream = create_app(latency=args.latency, reply=REPLY, script=AGENT_SCRIPT, batch_latency=args.batch_latency)
+    logging.disable(logging.WARNING)
+    # Every question reaches the model, and one user may fill the concurrency
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ["ADMISSION_MAX_PER_USER"] = str(args.concurrency)
+    os.environ["BATCH_MAX_CONCURRENCY"] = str(args.concurrency)
+    os.environ["BATCH_POLL_SECONDS"] = "0.2"
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        with run_server(upstream) as url:
+            os.environ["OPENAI_BASE_URL"] = f"{url}/v1"
+            os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+            import app as api
+            results = asyncio.run(run(api, upstream, args))
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print(f"{args.items} agent questions of one user, fake model latency {args.latency * 1000:.0f} ms")
+    print(f"{'scenario':<20} {'seconds':>8} {'items/s':>8} {'errors':>6} {'LLM calls':>9} {'tool runs':>9} {'cost USD':>9}")
+    for name, r in results.items():
+        print(f"{name:<20} {r['seconds']:>8.2f} {args.items / r['seconds']:>8.1f} {r['errors']:>6} "
+              f"{r['llm_calls']:>9} {r['tool_runs']:>9} {r['cost']:>9.4f}")
+    sys.exit(1 if any(r["errors"] for r in results.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
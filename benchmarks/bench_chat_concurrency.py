@@ -0,0 +1,86 @@
+"""
+Concurrent /chat requests against a local fake LLM server.
+
+With the async path, N concurrent chats should finish in roughly one upstream
+latency; a blocking client would take about N of them.
+
+    python benchmarks/bench_chat_concurrency.py --concurrency 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+
+from benchmarks.fake_openai import fake_openai
+
+
+async def fire(app, concurrency, payload):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+        async def one(i):
+            body = dict(payload)
+            if "user" in body:
+                body["session_id"] = f"bench-{i}"
+            response = await client.post("/chat", json=body)
+            response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(concurrency)))
+        return time.perf_counter() - start
+
+
+async def run_scenarios(app, scenarios, concurrency):
+    # Everything runs on one event loop so the pooled clients stay valid
+    results = {}
+    # ASGITransport does not run the lifespan handler that creates the shared resources
+    async with app.router.lifespan_context(app):
+        for name, payload in scenarios.items():
+            await fire(app, concurrency, payload)  # warm-up: client and connection setup
+            results[name] = await fire(app, concurrency, payload)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake upstream latency in seconds")
+    args = parser.parse_args()
+
+    with fake_openai(latency=args.latency) as base_url:
+        import app as api
+
+        os.environ["OPENAI_BASE_URL"] = base_url
+        os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+        os.environ["LANGCHAIN_TRACING_V2"] = "false"
+        # The warm-up asks the same questions: without this every timed chat would be a cache hit
+        os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+        # Every agent chat is from the same user; measure the event loop, not the per-user limit
+        os.environ["ADMISSION_MAX_PER_USER"] = str(args.concurrency)
+        # A greeting would be answered by the router without calling the model
+        os.environ["AGENT_ROUTER_ENABLED"] = "false"
+
+        scenarios = {
+            "llm": {"query": "hola"},
+            "agent": {"query": "hola", "user": "sally"},
+        }
+        results = asyncio.run(run_scenarios(api.app, scenarios, args.concurrency))
+
+    budget = args.latency * 2
+    failed = False
+    for name, elapsed in results.items():
+        ok = elapsed < budget
+        failed |= not ok
+        print(f"{name:<6} {args.concurrency} concurrent chats in {elapsed:.2f}s "
+              f"(upstream latency {args.latency:.2f}s, serial would be {args.concurrency * args.latency:.2f}s) "
+              f"{'OK' if ok else 'SLOW'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Checkpointer backends: memory growth, eviction and restart recovery.
+
+Drives many short sessions through the agent graph with a stubbed LLM and compares
+the unbounded MemorySaver with BoundedMemorySaver, then checks that SqliteSaver
+brings a conversation back after a simulated restart.
+
+    python benchmarks/bench_checkpointer.py --sessions 2000 --turns 3
+"""
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.agents import agent
+from src.agents.checkpointers import BoundedMemorySaver, SqliteSaver
+
+
+class StubLLM:
+    def invoke(self, messages, *args, **kwargs):
+        return AIMessage(content="ok")
+
+
+def compiled_with(checkpointer):
+    graph = agent.build_graph()
+    graph.checkpointer = checkpointer
+    return graph
+
+
+def drive(graph, sessions, turns):
+    for session in range(sessions):
+        config = {"configurable": {"thread_id": f"session-{session}"}}
+        for turn in range(turns):
+            # The thread keeps the history; each turn only sends the new question
+            graph.invoke({"messages": [HumanMessage(content=f"pregunta {turn}")], "user": "sally"}, config=config)
+
+
+def footprint(saver) -> int:
+    return len(pickle.dumps((dict(saver.storage), dict(saver.writes), saver.blobs)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--max-threads", type=int, default=100)
+    args = parser.parse_args()
+
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    agent.get_llm_with_tools = lambda model=None: StubLLM()
+
+    for label, saver in (("MemorySaver", MemorySaver()),
+                         ("BoundedMemorySaver", BoundedMemorySaver(max_threads=args.max_threads, keep_per_thread=2))):
+        start = time.perf_counter()
+        drive(compiled_with(saver), args.sessions, args.turns)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<20} threads kept {len(saver.storage):>6}   size {footprint(saver) / 1024:10.1f} KiB   "
+              f"{elapsed * 1000 / (args.sessions * args.turns):.2f} ms/turn")
+
+    saver = BoundedMemorySaver(max_threads=args.max_threads)
+    drive(compiled_with(saver), args.max_threads + 10, 1)
+    assert len(saver.storage) == args.max_threads, "LRU eviction did not bound the thread count"
+    assert "session-0" not in saver.storage, "least recently used thread was not evicted"
+    saver.ttl_seconds = 0
+    assert saver.get_tuple({"configurable": {"thread_id": f"session-{args.max_threads}"}}) is None, "TTL expiry failed"
+    print("eviction             LRU bound and TTL expiry OK")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "checkpoints.sqlite")
+        config = {"configurable": {"thread_id": "restart"}}
+        graph = compiled_with(SqliteSaver(path))
+        graph.invoke({"messages": [HumanMessage(content="hola")], "user": "sally"}, config=config)
+        graph.checkpointer.close()
+
+        # A new process would open the same file
+        restored = compiled_with(SqliteSaver(path)).get_state(config).values["messages"]
+        assert [m.content for m in restored][-2:] == ["hola", "ok"], restored
+        print(f"restart recovery     {len(restored)} messages restored from SQLite OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Cold start of an API worker: import time, time to the first /health and to the first chat.
+
+Imports ``app`` in fresh interpreters with ``-X importtime`` and lists the slowest
+modules, then starts ``uvicorn app:app`` against the local fake OpenAI server and
+times how long a new process takes to answer /health and its first /chat. Exits
+non-zero when the import of ``app`` goes over its budget or loads one of the
+modules the warmup is meant to load in the background (openai, LangChain,
+LangGraph).
+
+    python benchmarks/bench_cold_start.py --runs 5 --import-budget-ms 800 --health-budget-ms 2000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+import numpy as np
+
+from benchmarks.fake_openai import _free_port, create_app, run_server
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Loaded by the warmup thread, never by the import of app
+DEFERRED = ("openai", "langchain", "langchain_core", "langchain_openai", "langgraph", "tiktoken", "numpy")
+
+
+def import_times(module: str) -> dict:
+    """Cumulative import time in milliseconds of every module loaded by ``import module``."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def wait_for(request, timeout: float = 60) -> float:
+    """Seconds until ``request()`` answers 200."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            if request().status_code == 200:
+                return time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"no answer after {timeout:.0f}s")
+
+
+def server_start(env: dict) -> tuple[float, float]:
+    """Starts a worker; returns the seconds until its first /health and its first /chat."""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        health = wait_for(lambda: httpx.get(f"{base_url}/health", timeout=5))
+        wait_for(lambda: httpx.post(f"{base_url}/chat", json={"query": "hola"}, timeout=30))
+        return health, time.perf_counter() - start
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to list")
+    parser.add_argument("--import-budget-ms", type=float, default=800, help="Median import time of app")
+    parser.add_argument("--health-budget-ms", type=float, default=2000, help="Median time to the first /health")
+    args = parser.parse_args()
+
+    runs = [import_times("app") for _ in range(args.runs)]
+    app_ms = float(np.median([times["app"] for times in runs]))
+    deferred = sorted({name for name in runs[0] if name.split(".")[0] in DEFERRED})
+    print(f"import app: median {app_ms:.0f} ms over {args.runs} runs")
+    print("slowest modules (cumulative ms, first run):")
+    for name, ms in sorted(runs[0].items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"  {ms:8.1f}  {name}")
+    agent_ms = float(np.median([import_times("src.agents.agent")["src.agents.agent"] for _ in range(args.runs)]))
+    print(f"import src.agents.agent (loaded by the warmup): median {agent_ms:.0f} ms")
+
+    with run_server(create_app(latency=0.05)) as url:
+        env = dict(
+            os.environ,
+            OPENAI_BASE_URL=f"{url}/v1",
+            OPENAI_API_KEY="sk-benchmark",
+            LANGCHAIN_TRACING_V2="false",
+            RESPONSE_CACHE_ENABLED="false",
+            REDMINE_SYNC_ENABLED="false",
+        )
+        starts = [server_start(env) for _ in range(args.runs)]
+    health_ms, chat_ms = (float(np.median(values)) * 1000 for values in zip(*starts))
+    print(f"new worker: first /health after {health_ms:.0f} ms, first /chat after {chat_ms:.0f} ms (medians)")
+
+    failed = False
+    if deferred:
+        failed = True
+        print(f"FAIL import app loads {', '.join(deferred[:5])}{' ...' if len(deferred) > 5 else ''}; "
+              f"import them in the warmup or inside the functions using them")
+    if app_ms > args.import_budget_ms:
+        failed = True
+        print(f"FAIL import app takes {app_ms:.0f} ms, budget {args.import_budget_ms:.0f} ms")
+    if health_ms > args.health_budget_ms:
+        failed = True
+        print(f"FAIL first /health after {health_ms:.0f} ms, budget {args.health_budget_ms:.0f} ms")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
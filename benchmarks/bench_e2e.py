@@ -0,0 +1,286 @@
+"""
+End-to-end latency, throughput and LLM iterations per turn of /chat, the agent and its tools.
+
+Runs the API in-process against the local fake OpenAI server, where the agent's
+model calls a tool before answering, and times every request from the client's
+side. Instead of the fake model, real conversations can be recorded once through
+OpenAI (--record, costs tokens) and replayed with their recorded latency
+(--cassette). The tools are timed on synthetic Redmine data of each --sizes.
+
+Results are printed and, with --output, written as JSON. --compare fails when a
+scenario got slower, lost throughput or needs more LLM calls than in an earlier
+result file.
+
+    python benchmarks/bench_e2e.py --requests 200 --concurrency 20 --output e2e.json
+    python benchmarks/bench_e2e.py --compare e2e.json --tolerance 0.25
+    python benchmarks/bench_e2e.py --record data/cassettes/e2e.jsonl --requests 5
+    python benchmarks/bench_e2e.py --cassette data/cassettes/e2e.jsonl
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+import numpy as np
+
+from benchmarks.cassettes import Cassette, create_recorder
+from benchmarks.fake_openai import create_app, run_server
+from benchmarks.fake_redmine import generate_data
+
+# Routed to the full agent: it asks for a reason
+QUESTION = "¿Qué incidencias abiertas de Project Phoenix debería atender primero y por qué?"
+REPLY = "Empieza por #1: tiene prioridad alta y sigue abierta; después revisa la documentación pendiente."
+# What the fake model does with the question: look at the project's open issues, then answer
+AGENT_SCRIPT = [[("get_issues_for_project", {"project_name": "Project Phoenix", "status": "Open", "sort": "priority"})]]
+
+HTTP_SCENARIOS = {
+    "chat": ("/chat", {"query": QUESTION}),
+    "chat_stream": ("/chat/stream", {"query": QUESTION}),
+    "agent": ("/chat", {"query": QUESTION, "user": "sally"}),
+    "agent_stream": ("/chat/stream", {"query": QUESTION, "user": "sally"}),
+}
+
+# One typical call per tool on the synthetic data, where sally is user 1 and in every project
+TOOL_CALLS = {
+    "get_user_name": {"username": "sally"},
+    "get_projects_for_user": {"user_id": 1},
+    "get_all_projects": {},
+    "get_issues_for_project": {"project_name": "Project 1", "status": "Open", "sort": "priority"},
+    "get_my_assigned_issues": {"username": "sally", "status": "Open,In Progress", "sort": "updated"},
+    "search_issues": {"query": "crash on launch"},
+    "get_more_results": None,  # the cursor comes from a truncated result
+}
+
+# Replies that mean the request failed although the API answered 200
+FAILURES = ("Error:", "encountered an error", "event: error")
+
+
+def summarize(latencies, errors, elapsed, llm_calls=None) -> dict:
+    turns = len(latencies)
+    return {
+        "requests": turns,
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 3),
+        "mean_ms": round(float(np.mean(latencies)) * 1000, 3),
+        "throughput_rps": round(turns / elapsed, 2),
+        "llm_calls_per_turn": None if llm_calls is None else round(llm_calls / turns, 2),
+    }
+
+
+async def fire(client, path, payload, requests, concurrency):
+    """Sends ``requests`` chats, at most ``concurrency`` at a time; returns latencies, errors and elapsed time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        body = dict(payload)
+        if "user" in body:
+            # Every agent turn opens a new session, like a user starting a conversation
+            body["session_id"] = f"e2e-{uuid.uuid4().hex}"
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(path, json=body)
+            latencies.append(time.perf_counter() - start)
+        if response.status_code != 200 or any(failure in response.text for failure in FAILURES):
+            errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def run_http(api, upstream, names, requests, concurrency):
+    results = {}
+    # ASGITransport does not run the lifespan handler that creates the shared resources
+    async with api.app.router.lifespan_context(api.app):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=120) as client:
+            for name in names:
+                path, payload = HTTP_SCENARIOS[name]
+                # Warm-up: connection setup, first-use imports
+                await fire(client, path, payload, min(concurrency, requests), concurrency)
+                calls = upstream.state.requests
+                latencies, errors, elapsed = await fire(client, path, payload, requests, concurrency)
+                results[name] = summarize(latencies, errors, elapsed, upstream.state.requests - calls)
+    return results
+
+
+def build_store(issues: int):
+    """RedmineStore with ``issues`` synthetic issues in 20 projects."""
+    from src.agents.database import RedmineStore
+    from src.redmine.source import issue_record
+
+    data = generate_data(issues=issues)
+    store = RedmineStore()
+    for user in data["users"]:
+        store.upsert_user({"id": user["id"], "username": user["login"]})
+    for project in data["projects"]:
+        members = sorted(uid for uid, project_ids in data["memberships"].items() if project["id"] in project_ids)
+        store.upsert_project({"id": project["id"], "name": project["name"], "members": members})
+    for issue in data["issues"]:
+        store.upsert_issue(issue_record(issue))
+    return store
+
+
+def run_tools(names, sizes, repeat):
+    from src.agents import agent, memo, tools
+    from src.agents.search import create_issue_search
+
+    # Measure the tools, not the shared result cache
+    memo.SHARED_CACHE.get = lambda key, default=None: default
+    results = {}
+    for size in sizes:
+        tools.STORE = build_store(size)
+        search = create_issue_search(tools.STORE)
+        tools.get_issue_search = lambda: search
+        first_page = agent.execute_tool_call(
+            {"id": "cursor", "name": "get_issues_for_project", "args": {"project_name": "Project 1"}}
+        ).content
+        for name in names:
+            args = TOOL_CALLS[name]
+            if name == "get_more_results":
+                if "cursor=" not in first_page:
+                    continue  # the results fit in one page at this size
+                args = {"cursor": first_page.rsplit("cursor=", 1)[1].split(" ")[0]}
+            call = {"id": "bench", "name": name, "args": args}
+            agent.execute_tool_call(call)  # warm-up: indexes built on first use
+            latencies, errors = [], 0
+            start = time.perf_counter()
+            for _ in range(repeat):
+                call_start = time.perf_counter()
+                message = agent.execute_tool_call(call)
+                latencies.append(time.perf_counter() - call_start)
+                errors += message.status == "error"
+            results[f"tool:{name}@{size}"] = summarize(latencies, errors, time.perf_counter() - start)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions against ``baseline``: slower p95, lower throughput, more LLM calls or errors."""
+    problems = []
+    for name, current in results.items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        # Sub-millisecond differences are noise
+        if current["p95_ms"] > before["p95_ms"] * (1 + tolerance) and current["p95_ms"] - before["p95_ms"] > 1:
+            problems.append(f"{name}: p95 {before['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms")
+        if before["mean_ms"] > 1 and current["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            problems.append(f"{name}: throughput {before['throughput_rps']} -> {current['throughput_rps']} req/s")
+        if (current["llm_calls_per_turn"] or 0) > (before["llm_calls_per_turn"] or 0) + 0.05:
+            problems.append(f"{name}: LLM calls per turn {before['llm_calls_per_turn']} -> {current['llm_calls_per_turn']}")
+        if current["errors"] > before["errors"]:
+            problems.append(f"{name}: errors {before['errors']} -> {current['errors']}")
+    return problems
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", default=list(HTTP_SCENARIOS) + ["tools"],
+                        choices=list(HTTP_SCENARIOS) + ["tools"])
+    parser.add_argument("--requests", type=int, default=100, help="Chats per HTTP scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake upstream latency in seconds")
+    parser.add_argument("--token-rate", type=float, default=0, help="Fake completion tokens per second, 0 = instant")
+    parser.add_argument("--tools", nargs="+", default=list(TOOL_CALLS), choices=list(TOOL_CALLS))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Issues in the tool data")
+    parser.add_argument("--repeat", type=int, default=200, help="Calls per tool and size")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--cassette", help="Replay the completions recorded in this cassette")
+    mode.add_argument("--record", help="Record real OpenAI completions into this cassette")
+    parser.add_argument("--upstream", default="https://api.openai.com/v1", help="API to record from")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Fail on regressions against this earlier --output file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown for --compare")
+    args = parser.parse_args()
+
+    if args.cassette:
+        cassette = Cassette(args.cassette)
+        if not len(cassette):
+            parser.error(f"{args.cassette} has no recorded completions; record them with --record first")
+        upstream = create_app(cassette=cassette)
+    elif args.record:
+        if not os.environ.get("OPENAI_API_KEY"):
+            parser.error("--record sends the requests to OpenAI and needs OPENAI_API_KEY")
+        upstream = create_recorder(Cassette(args.record), args.upstream, os.environ["OPENAI_API_KEY"])
+    else:
+        upstream = create_app(latency=args.latency, reply=REPLY, script=AGENT_SCRIPT, token_rate=args.token_rate)
+
+    logging.disable(logging.WARNING)
+    # Every turn reaches the model: no response cache, and one user may fill the concurrency
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ["ADMISSION_MAX_PER_USER"] = str(args.concurrency)
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+    results = {}
+    http = [name for name in args.scenarios if name in HTTP_SCENARIOS]
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        if http:
+            with run_server(upstream) as url:
+                # The service talks to the fake server or the recorder, never to OpenAI itself
+                os.environ["OPENAI_BASE_URL"] = f"{url}/v1"
+                os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+                import app as api
+                results.update(asyncio.run(run_http(api, upstream, http, args.requests, args.concurrency)))
+            if getattr(upstream.state, "replay_misses", 0):
+                print(f"{upstream.state.replay_misses} requests were not in the cassette", file=sys.stderr)
+        if "tools" in args.scenarios:
+            results.update(run_tools(args.tools, args.sizes, args.repeat))
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print(f"{'scenario':<36} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'req/s':>9} {'LLM/turn':>8}")
+    for name, r in results.items():
+        llm_calls = "-" if r["llm_calls_per_turn"] is None else f"{r['llm_calls_per_turn']:.2f}"
+        print(f"{name:<36} {r['requests']:>8} {r['errors']:>6} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['throughput_rps']:>9.1f} {llm_calls:>8}")
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "mode": "replay" if args.cassette else "record" if args.record else "fake",
+        "options": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "scenarios": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    failed = any(r["errors"] for r in results.values())
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        failed |= bool(problems)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Prompt tokens against conversation length, with and without history compaction.
+
+Builds synthetic agent conversations where every turn calls a tool that returns a
+realistic issue list, then counts the tokens the model would be sent per turn.
+
+    python benchmarks/bench_history_compaction.py --turns 5 10 25 50 100 200
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from src.agents.prompts import SYSTEM_MESSAGE
+from src.utils.history import compact_history, count_prompt_tokens, get_policy
+
+ISSUES = [
+    {"id": i, "subject": f"Issue number {i} about the mobile app", "status": "Open",
+     "priority": "High", "assignee": "sally"}
+    for i in range(25)
+]
+
+
+def agent_conversation(turns: int) -> list:
+    messages = [SystemMessage(content=SYSTEM_MESSAGE)]
+    for turn in range(turns):
+        call_id = f"call_{turn}"
+        messages += [
+            HumanMessage(content=f"¿Qué issues abiertas hay en el proyecto {turn}?"),
+            AIMessage(content="", tool_calls=[{"id": call_id, "name": "get_issues_for_project",
+                                               "args": {"project_name": f"Project {turn}", "status": "Open"}}]),
+            ToolMessage(content=str(ISSUES), tool_call_id=call_id),
+            AIMessage(content="Estas son las issues abiertas: " + ", ".join(i["subject"] for i in ISSUES[:5])),
+        ]
+    return messages
+
+
+def chat_conversation(turns: int) -> list:
+    messages = [{"role": "system", "content": "You are a helpful Redmine project management assistant."}]
+    for turn in range(turns):
+        messages += [
+            {"role": "user", "content": f"¿Cómo configuro el flujo de trabajo número {turn} en Redmine?"},
+            {"role": "assistant", "content": "Para configurarlo ve a Administración > Flujo de trabajo. " * 8},
+        ]
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[5, 10, 25, 50, 100, 200])
+    args = parser.parse_args()
+
+    for endpoint, build in (("agent", agent_conversation), ("chat", chat_conversation)):
+        policy = get_policy(endpoint)
+        print(f"\n{endpoint} (budget {policy.max_tokens} tokens, {policy.keep_recent_turns} recent turns verbatim)")
+        print(f"{'turns':>6} {'raw tokens':>11} {'compacted':>10} {'messages':>9} {'ms':>7}")
+        for turns in args.turns:
+            messages = build(turns)
+            start = time.perf_counter()
+            compacted = compact_history(messages, policy)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"{turns:>6} {count_prompt_tokens(messages):>11} {count_prompt_tokens(compacted):>10} "
+                  f"{len(compacted):>9} {elapsed:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Issue queries with filtering, sorting and paging pushed into the store vs done in Python.
+
+Loads synthetic issues into the in-memory store and the SQLite replica, then
+answers typical questions ("how many open issues", "top 10 by priority",
+"issues mentioning X") either with one query_issues call or by fetching the
+whole project/assignee list and filtering, sorting and slicing it afterwards.
+
+    python benchmarks/bench_issue_queries.py --issues 200000 --repeat 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fake_redmine import generate_data
+from src.agents.database import RedmineStore
+from src.redmine.query import parse_values, sort_key
+from src.redmine.replica import RedmineReplica
+from src.redmine.source import issue_record
+from src.utils.history import count_tokens
+
+QUERIES = {
+    "count open+in progress": dict(project_id=1, status="Open,In Progress", count_only=True),
+    "top 10 by priority": dict(project_id=1, status="Open", sort="priority", limit=10),
+    "10 most recently updated": dict(assigned_to=1, sort="updated", limit=10),
+    "subject contains": dict(project_id=1, subject="ue 123"),
+    "page 5 of 20": dict(assigned_to=1, priority="High,Critical", limit=20, offset=80),
+}
+
+
+def post_filtered(store, project_id=None, assigned_to=None, status=None, priority=None, subject=None,
+                  sort="id", limit=None, offset=0, count_only=False):
+    """What the tools did before: fetch the full list, then filter, sort and slice it."""
+    if project_id is not None:
+        issues = list(store.issues_for_project(project_id))
+    else:
+        issues = list(store.issues_assigned_to(assigned_to))
+    statuses, priorities = parse_values(status), parse_values(priority)
+    issues = [
+        issue for issue in issues
+        if (statuses is None or issue["status"].lower() in statuses)
+        and (priorities is None or issue["priority"].lower() in priorities)
+        and (subject is None or subject.lower() in issue["subject"].lower())
+    ]
+    if count_only:
+        return len(issues)
+    issues.sort(key=sort_key(sort))
+    return issues[offset:None if limit is None else offset + limit]
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--issues", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    records = [issue_record(issue) for issue in generate_data(issues=args.issues, users=200)["issues"]]
+    store = RedmineStore()
+    for record in records:
+        store.upsert_issue(record)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        replica = RedmineReplica(os.path.join(tmp, "replica.sqlite"))
+        replica.write(issues=records, state={"last_synced_at": time.time()})
+
+        print(f"{args.issues} issues")
+        print(f"{'query':<26} {'store':>6} {'post-filter ms':>15} {'indexed ms':>11} {'speedup':>8} {'same':>5}")
+        for name, query in QUERIES.items():
+            for label, backend in (("memory", store), ("sqlite", replica)):
+                expected, slow = timed(lambda: post_filtered(backend, **query), max(args.repeat // 5, 1))
+                result, fast = timed(lambda: backend.query_issues(**query), args.repeat)
+                print(f"{name:<26} {label:>6} {slow * 1000:>15.2f} {fast * 1000:>11.2f} "
+                      f"{slow / fast:>7.1f}x {str(result == expected):>5}")
+
+        # What the model reads to answer "how many open issues does project 1 have?"
+        full = replica.query_issues(project_id=1, status="Open")
+        print(f"\ntokens to answer a count: full list {count_tokens(str(full))}, "
+              f"count_only {count_tokens(f'{len(full)} matching issues')}")
+        replica.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+search_issues at scale: index build, query latency and incremental updates.
+
+Indexes synthetic issues (subject and description) in the BM25 index and,
+optionally, the memory-mapped vector index, then measures query latency
+percentiles, the cost of re-indexing edited issues, and a linear scan over all
+issues (what the agent effectively did before by listing every project).
+
+    python benchmarks/bench_issue_search.py --issues 1000000 --queries 200 --vectors
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fake_redmine import COMPONENTS, PLATFORMS, SYMPTOMS
+from src.agents.search import issue_text
+from src.utils.cache import HashingEmbedder
+from src.utils.search import BM25Index, VectorIndex, tokenize
+
+
+def issue_texts(count: int, vocabulary: int = 50000, seed: int = 7):
+    """Yields (id, text) with a Zipf-like word distribution, like real issue trackers."""
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, vocabulary + 1)]
+    words = rng.choices(range(vocabulary), weights=weights, k=count * 12)
+    for i in range(count):
+        subject = f"{rng.choice(SYMPTOMS)} in the {rng.choice(COMPONENTS)} on {rng.choice(PLATFORMS)}"
+        description = " ".join(f"w{word}" for word in words[i * 12:(i + 1) * 12])
+        yield i + 1, issue_text({"subject": subject, "description": description})
+
+
+def make_queries(count: int, seed: int = 11) -> list[str]:
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.4:
+            queries.append(f"{rng.choice(SYMPTOMS)} {rng.choice(PLATFORMS)}")
+        elif kind < 0.8:
+            queries.append(f"{rng.choice(COMPONENTS)} w{rng.randint(0, 2000)}")
+        else:
+            queries.append(f"w{rng.randint(0, 50000)} w{rng.randint(0, 50000)}")
+    return queries
+
+
+def percentiles(seconds: list[float]) -> str:
+    p50, p95, p99 = np.percentile(np.array(seconds) * 1000, [50, 95, 99])
+    return f"p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  p99 {p99:7.2f} ms"
+
+
+def latencies(search, queries) -> list[float]:
+    result = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        result.append(time.perf_counter() - start)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--issues", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--updates", type=int, default=1000, help="Issues edited after the build")
+    parser.add_argument("--vectors", action="store_true", help="Also benchmark the vector index")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--embed", type=int, default=20000,
+                        help="Issues embedded for real; the other vectors are random (embedding is not what is measured)")
+    args = parser.parse_args()
+    queries = make_queries(args.queries)
+
+    bm25 = BM25Index()
+    start = time.perf_counter()
+    batch = []
+    for doc in issue_texts(args.issues):
+        batch.append(doc)
+        if len(batch) == 10000:
+            bm25.add_many(batch)
+            batch = []
+    bm25.add_many(batch)
+    build = time.perf_counter() - start
+    print(f"{args.issues} issues, BM25 build {build:.1f}s ({args.issues / build:,.0f} issues/s), "
+          f"{len(bm25._postings)} terms")
+
+    print(f"bm25 search (k=40)           {percentiles(latencies(lambda q: bm25.search(q, 40), queries))}")
+
+    # Edited issues: replace their text and search again
+    rng = random.Random(3)
+    edited = [(rng.randint(1, args.issues), f"Edited issue {n}: PDF export crash on Safari") for n in range(args.updates)]
+    start = time.perf_counter()
+    bm25.add_many(edited)
+    print(f"re-index {args.updates} edited issues  {(time.perf_counter() - start) * 1000:.1f} ms")
+    top = bm25.search("edited pdf export crash safari", 5)
+    edited_ids = {doc_id for doc_id, _ in edited}
+    print(f"edited issues ranked first: {bool(top) and all(doc_id in edited_ids for doc_id, _ in top)}")
+
+    # What listing every issue and scanning it costs per question
+    texts = [text.lower() for _, text in issue_texts(min(args.issues, 200000))]
+    scan_queries = queries[:5]
+    start = time.perf_counter()
+    for query in scan_queries:
+        terms = tokenize(query)
+        [i for i, text in enumerate(texts) if all(term in text for term in terms)]
+    scan = (time.perf_counter() - start) / len(scan_queries) * args.issues / len(texts)
+    print(f"linear scan over all issues  ~{scan * 1000:.0f} ms per query (extrapolated from {len(texts)})")
+    del texts
+
+    if not args.vectors:
+        return
+    embedder = HashingEmbedder(args.dim)
+    with tempfile.TemporaryDirectory() as tmp:
+        vectors = VectorIndex(args.dim, os.path.join(tmp, "issues"))
+        start = time.perf_counter()
+        real = [doc for _, doc in zip(range(args.embed), issue_texts(args.embed))]
+        vectors.upsert([doc_id for doc_id, _ in real], embedder.embed_many([text for _, text in real]))
+        embed = time.perf_counter() - start
+        print(f"\nembedded {len(real)} issues in {embed:.1f}s ({len(real) / embed:,.0f} issues/s)")
+
+        noise = np.random.default_rng(5)
+        start = time.perf_counter()
+        for first in range(len(real) + 1, args.issues + 1, 50000):
+            ids = range(first, min(first + 50000, args.issues + 1))
+            block = noise.standard_normal((len(ids), args.dim), dtype=np.float32)
+            vectors.upsert(ids, block / np.linalg.norm(block, axis=1, keepdims=True))
+        vectors.flush()
+        size = os.path.getsize(os.path.join(tmp, "issues.vectors")) / 2 ** 20
+        print(f"filled {len(vectors)} vectors in {time.perf_counter() - start:.1f}s, {size:.0f} MiB memory-mapped")
+
+        embedded = [embedder.embed(query) for query in queries]
+        print(f"vector search (k=40)         {percentiles(latencies(lambda v: vectors.search(v, 40), embedded))}")
+
+        start = time.perf_counter()
+        reopened = VectorIndex(args.dim, os.path.join(tmp, "issues"))
+        print(f"reopen index                 {(time.perf_counter() - start) * 1000:.0f} ms, {len(reopened)} vectors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+LLM call resilience against a fake OpenAI server that injects errors and latency.
+
+Three scenarios, each run with and without the resilience features:
+
+- errors:   a fraction of requests fail with 503; retries with jittered backoff
+- tail:     a few requests are very slow; hedged duplicates after the p95 latency
+- fallback: the primary model is down; the fallback model answers
+
+    python benchmarks/bench_llm_resilience.py --calls 300 --error-rate 0.2 --slow-rate 0.03
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import openai
+
+from benchmarks.fake_openai import create_app, run_server
+from src.llm.resilience import ResilientLLM
+
+MESSAGES = [{"role": "user", "content": "hola"}]
+
+
+async def run_calls(client, llm, calls, concurrency):
+    """Makes ``calls`` completions, ``concurrency`` at a time; returns latencies of successes and failures."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await llm.acall(lambda model: client.chat.completions.create(model=model, messages=MESSAGES))
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                failures += 1
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies, failures
+
+
+def report(name, latencies, failures, extra=""):
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99]) if latencies else (0, 0, 0)
+    total = len(latencies) + failures
+    print(f"  {name:<22} success {len(latencies) / total:6.1%}  p50 {p50:6.0f} ms  p95 {p95:6.0f} ms  "
+          f"p99 {p99:6.0f} ms  {extra}")
+
+
+async def main_async(args, fake, base_url):
+    client = openai.AsyncOpenAI(base_url=base_url, api_key="sk-benchmark", max_retries=0, timeout=30)
+
+    def policy(**kwargs):
+        return ResilientLLM("bench", model="primary", timeout=args.timeout, backoff_base=0.05, backoff_max=1,
+                            cooldown_seconds=60, **kwargs)
+
+    print(f"errors: {args.error_rate:.0%} of requests answer 503")
+    fake.state.error_rate = args.error_rate
+    report("single attempt", *await run_calls(client, policy(max_attempts=1), args.calls, args.concurrency))
+    report("3 attempts + jitter", *await run_calls(client, policy(max_attempts=3), args.calls, args.concurrency))
+    fake.state.error_rate = 0
+
+    print(f"tail: {args.slow_rate:.0%} of requests take {args.slow_latency:.1f}s")
+    fake.state.slow_rate = args.slow_rate
+    plain = policy()
+    report("no hedging", *await run_calls(client, plain, args.calls, args.concurrency))
+    hedged = policy(hedge=True)
+    hedged._latencies.extend(plain._latencies)  # start from the latencies seen so far
+    before = fake.state.requests
+    latencies, failures = await run_calls(client, hedged, args.calls, args.concurrency)
+    extra_requests = fake.state.requests - before - args.calls
+    report(f"hedge at p{hedged.hedge_quantile * 100:.0f}", latencies, failures,
+           f"{extra_requests / args.calls:.1%} extra requests")
+    fake.state.slow_rate = 0
+
+    print("fallback: the primary model always answers 503")
+    fake.state.failing_models = {"primary"}
+    report("no fallback", *await run_calls(client, policy(), args.calls, args.concurrency))
+    fake.state.by_model = {}
+    with_fallback = policy(fallback_model="secondary")
+    report("fallback model", *await run_calls(client, with_fallback, args.calls, args.concurrency),
+           f"requests by model {fake.state.by_model}, primary degraded: {with_fallback.degraded}")
+    fake.state.failing_models = set()
+    await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.1, help="Normal fake upstream latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--timeout", type=float, default=10, help="Per-attempt timeout in seconds")
+    args = parser.parse_args()
+    # Every retry and fallback is logged; only the summary matters here
+    logging.disable(logging.WARNING)
+
+    fake = create_app(args.latency, slow_latency=args.slow_latency)
+    with run_server(fake) as url:
+        asyncio.run(main_async(args, fake, f"{url}/v1"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Agent state growth: full-copy message lists versus the append-only reducer with delta checkpoints.
+
+Drives one long tool-using session through the agent graph with a stubbed LLM
+(each turn: question, tool call, tool result, answer) and reports, as the
+conversation grows to hundreds of messages, the time per turn and the bytes
+serialized per turn for checkpoint blobs and node writes. "full copy" is the
+previous design: a plain list channel, nodes returning the whole history and
+every checkpoint storing all of it.
+
+    python benchmarks/bench_message_state.py --turns 200 --report-every 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import TypedDict
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import StateGraph
+
+from src.agents import agent
+from src.agents.checkpointers import BoundedMemorySaver, SqliteSaver
+
+
+class StubLLM:
+    """Calls get_user_name, then answers once it sees the result."""
+
+    def invoke(self, messages, *args, **kwargs):
+        if isinstance(messages[-1], HumanMessage):
+            return AIMessage(content="", tool_calls=[
+                {"id": f"call_{len(messages)}", "name": "get_user_name", "args": {"username": "sally"}}
+            ])
+        return AIMessage(content="Sally tiene el id 1 y participa en Project Phoenix. " * 4)
+
+
+class CountingSerde:
+    """Wraps a checkpointer's serializer to count the bytes it writes."""
+
+    def __init__(self, serde):
+        self.serde = serde
+        self.bytes = 0
+
+    def dumps_typed(self, obj):
+        typed = self.serde.dumps_typed(obj)
+        self.bytes += len(typed[1] or b"")
+        return typed
+
+    def __getattr__(self, name):
+        return getattr(self.serde, name)
+
+
+class FullCopyState(TypedDict):
+    messages: list[BaseMessage]
+    user: str
+
+
+def full_copy_graph():
+    """The agent graph as it was: nodes return the whole history, which replaces the channel."""
+    def chatbot(state):
+        return {"messages": state["messages"] + agent.chatbot(state)["messages"]}
+
+    def node_tools(state):
+        return {"messages": state["messages"] + agent.node_tools(state)["messages"], "user": state["user"]}
+
+    workflow = StateGraph(FullCopyState)
+    workflow.add_node("chatbot", RunnableLambda(chatbot))
+    workflow.add_node("node_tools", RunnableLambda(node_tools))
+    workflow.set_entry_point("chatbot")
+    # Wrapped: should_continue's annotation would add the append-only state schema
+    workflow.add_conditional_edges("chatbot", lambda state: agent.should_continue(state),
+                                   {"node_tools": "node_tools", "__end__": "__end__"})
+    workflow.add_edge("node_tools", "chatbot")
+    return workflow
+
+
+def run_session(variant: str, backend: str, turns: int, report_every: int, directory: str) -> list[tuple]:
+    """(messages, ms per turn, KiB serialized per turn) every ``report_every`` turns."""
+    append_only = variant == "append-only"
+    # Full copies only for the old design; max_chain=0 turns the deltas off
+    max_chain = 64 if append_only else 0
+    if backend == "sqlite":
+        saver = SqliteSaver(os.path.join(directory, f"{variant}.sqlite"), delta_max_chain=max_chain)
+    else:
+        saver = BoundedMemorySaver(delta_max_chain=max_chain)
+    saver.serde = CountingSerde(saver.serde)
+    graph = agent.build_graph() if append_only else full_copy_graph().compile()
+    graph.checkpointer = saver
+    config = {"configurable": {"thread_id": f"{variant}-{backend}"}}
+
+    rows, messages = [], []
+    start, written = time.perf_counter(), 0
+    for turn in range(1, turns + 1):
+        question = HumanMessage(content=f"¿Qué tareas tengo pendientes? ({turn})")
+        if append_only:
+            # The thread holds the history; only the new question goes in
+            result = graph.invoke({"messages": [question], "user": "sally"}, config=config)
+        else:
+            result = graph.invoke({"messages": messages + [question], "user": "sally"}, config=config)
+        messages = result["messages"]
+        if turn % report_every == 0:
+            elapsed = time.perf_counter() - start
+            rows.append((len(messages), elapsed * 1000 / report_every, (saver.serde.bytes - written) / 1024 / report_every))
+            start, written = time.perf_counter(), saver.serde.bytes
+    if backend == "sqlite":
+        saver.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200, help="Turns of the session, four messages each")
+    parser.add_argument("--report-every", type=int, default=50)
+    parser.add_argument("--backends", nargs="+", default=["memory", "sqlite"], choices=["memory", "sqlite"])
+    args = parser.parse_args()
+
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    agent.get_llm_with_tools = lambda model=None: StubLLM()
+
+    results = {}
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for backend in args.backends:
+                for variant in ("full copy", "append-only"):
+                    results[(backend, variant)] = run_session(variant, backend, args.turns, args.report_every, directory)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print(f"{'backend':<8} {'state':<12} {'messages':>9} {'ms/turn':>9} {'KiB/turn':>9}")
+    for (backend, variant), rows in results.items():
+        for count, ms, kib in rows:
+            print(f"{backend:<8} {variant:<12} {count:>9} {ms:>9.2f} {kib:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
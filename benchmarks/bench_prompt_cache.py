@@ -0,0 +1,106 @@
+"""
+Prompt cache hit rate and time to first token of the agent, by prompt layout.
+
+Many users each stream a few turns through the agent against a local fake OpenAI
+server that caches prompt prefixes the way OpenAI does. The old layout puts the
+user's name in the first system message, so each user starts a new prefix; the
+static layout shares the system prompt and tool definitions between all users.
+
+    python benchmarks/bench_prompt_cache.py --users 20 --turns 3 --latency 0.5
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+import uuid
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from langchain_core.messages import SystemMessage
+
+from benchmarks.fake_openai import create_app, run_server
+
+QUESTIONS = ["¿Qué incidencias críticas hay?", "¿Y cuáles están sin asignar?", "Gracias, ¿algo más urgente?"]
+
+
+def per_user_prefix(messages, user):
+    """The old layout: the user's name inside the first system message."""
+    from src.agents.prompt_assembly import conversation
+    from src.agents.prompts import SYSTEM_MESSAGE, USER_CONTEXT_MESSAGE
+
+    content = SYSTEM_MESSAGE + "\n" + USER_CONTEXT_MESSAGE.format(user=user)
+    return [SystemMessage(content=content)] + conversation(messages)
+
+
+async def run_sessions(agent, users, turns):
+    """Streams ``turns`` questions for each user, users concurrently; returns times to first token."""
+    ttfts = []
+
+    async def session(user):
+        session_id = str(uuid.uuid4())
+        for question in QUESTIONS[:turns]:
+            start = time.perf_counter()
+            first = None
+            async for event, data in agent.astream_agent(question, session_id, user):
+                if event == "token" and first is None:
+                    first = time.perf_counter() - start
+                if event == "end" and data["message"].startswith("Error"):
+                    raise RuntimeError(data["message"])
+            ttfts.append(first)
+
+    # One user first, as after a deploy, then everybody else
+    await session("user0")
+    await asyncio.gather(*(session(f"user{i}") for i in range(1, users)))
+    return ttfts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=3, choices=range(1, len(QUESTIONS) + 1))
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake upstream latency in seconds")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+
+    from src.agents import agent
+    from src.llm.usage import PROMPT_TOKENS
+
+    os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    agent.get_router().enabled = False
+    static_assemble = agent.assemble
+
+    results = {}
+    for label, assemble in (("per-user prefix", per_user_prefix), ("static prefix", static_assemble)):
+        # A new server per layout: its prompt cache starts empty
+        with run_server(create_app(latency=args.latency, prompt_cache=True)) as url:
+            os.environ["OPENAI_BASE_URL"] = f"{url}/v1"
+            agent.get_llm_with_tools.cache_clear()
+            agent._http_clients.cache_clear()
+            agent.assemble = assemble
+            hits = PROMPT_TOKENS.value(endpoint="agent", cache="hit")
+            misses = PROMPT_TOKENS.value(endpoint="agent", cache="miss")
+            stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+            try:
+                ttfts = asyncio.run(run_sessions(agent, args.users, args.turns))
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+            hits = PROMPT_TOKENS.value(endpoint="agent", cache="hit") - hits
+            misses = PROMPT_TOKENS.value(endpoint="agent", cache="miss") - misses
+            results[label] = (hits / max(hits + misses, 1), ttfts)
+
+    print(f"prompt prefix {agent.PROMPT_PREFIX}, {args.users} users x {args.turns} turns")
+    for label, (hit_rate, ttfts) in results.items():
+        print(f"{label:<16} cached prompt tokens {hit_rate:6.1%}  time to first token "
+              f"p50 {np.percentile(ttfts, 50) * 1000:6.1f} ms  p95 {np.percentile(ttfts, 95) * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Redmine client against a local fake Redmine: paginated reads and tool request counts.
+
+Compares reading every issue one page at a time with concurrent page fetching,
+shows time to the first streamed issue, and checks that the tool functions make
+no per-issue requests when backed by the live source.
+
+    python benchmarks/bench_redmine_client.py --issues 5000 --latency 0.02
+"""
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fake_redmine import fake_redmine, generate_data
+from src.agents import memo, tools
+from src.redmine.client import RedmineClient
+from src.redmine.source import RedmineSource
+
+
+def read_all(url, concurrency):
+    client = RedmineClient(url, max_concurrency=concurrency)
+    try:
+        start = time.perf_counter()
+        issues = client.iter_issues()
+        next(issues)
+        first = time.perf_counter() - start
+        count = 1 + sum(1 for _ in issues)
+        return count, first, time.perf_counter() - start
+    finally:
+        client.close()
+
+
+def tool_requests(url, app):
+    """Runs the tool functions on the live source and returns the requests each one made."""
+    source = RedmineSource(RedmineClient(url))
+    tools.STORE = source
+    calls = [
+        ("get_user_name", lambda: tools.get_user_name("sally")),
+        ("get_projects_for_user", lambda: tools.get_projects_for_user(1)),
+        ("get_my_assigned_issues", lambda: tools.get_my_assigned_issues(1, "Open")),
+        ("get_issues_for_project", lambda: tools.get_issues_for_project("Project 1", "Open", "High")),
+        ("get_all_projects", lambda: tools.get_all_projects()),
+    ]
+    results = []
+    for name, call in calls:
+        app.state.requests.clear()
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            result = call()
+        size = len(result) if isinstance(result, list) else result
+        results.append((name, size, sum(app.state.requests.values())))
+    source.client.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--issues", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated Redmine latency per request")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    # Keep the shared tool cache from answering instead of the server
+    memo.SHARED_CACHE.get = lambda key, default=None: default
+
+    data = generate_data(issues=args.issues)
+    with fake_redmine(data, latency=args.latency) as (url, app):
+        print(f"{args.issues} issues, {args.latency * 1000:.0f} ms per request")
+        baseline = None
+        for concurrency in args.concurrency:
+            count, first, total = read_all(url, concurrency)
+            baseline = baseline or total
+            print(f"concurrency {concurrency:<3} {count} issues  first after {first * 1000:6.1f} ms  "
+                  f"all after {total * 1000:8.1f} ms  speedup {baseline / total:.1f}x")
+
+        print("\nrequests per tool call (no per-issue lookups)")
+        for name, size, requests in tool_requests(url, app):
+            print(f"{name:<24} result size {size!s:<6} requests {requests}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Replica sync against a fake Redmine with many issues, and tool queries on the replica.
+
+Runs a full sync, edits some issues in the fake Redmine, runs an incremental
+sync, then compares a typical tool query on the replica with the same query
+answered by live Redmine.
+
+    python benchmarks/bench_redmine_sync.py --issues 500000 --updates 1000 --latency 0.005
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fake_redmine import fake_redmine, generate_data, touch_issues
+from src.agents import memo, tools
+from src.redmine.client import RedmineClient
+from src.redmine.replica import RedmineReplica
+from src.redmine.source import RedmineSource
+from src.redmine.sync import SYNC_LAG, RedmineSync
+
+
+def timed(func, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def tool_latency(store, repeat):
+    tools.STORE = store
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        result, seconds = timed(lambda: tools.get_my_assigned_issues(1, "Open"), repeat)
+    return len(result), seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--issues", type=int, default=500000)
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.005, help="Simulated Redmine latency per request")
+    parser.add_argument("--concurrency", type=int, default=8, help="Pages fetched in parallel")
+    args = parser.parse_args()
+
+    # Measure the stores, not the shared tool cache
+    memo.SHARED_CACHE.get = lambda key, default=None: default
+
+    data, seconds = timed(lambda: generate_data(issues=args.issues, users=200))
+    print(f"generated {args.issues} issues in {seconds:.1f}s")
+
+    with fake_redmine(data, latency=args.latency) as (url, app), tempfile.TemporaryDirectory() as tmp:
+        replica = RedmineReplica(os.path.join(tmp, "replica.sqlite"))
+        sync = RedmineSync(RedmineClient(url, max_concurrency=args.concurrency), replica)
+
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            written, seconds = timed(lambda: sync.sync_once(full=True))
+        print(f"full sync         {written} issues in {seconds:6.1f}s  ({written / seconds:,.0f} issues/s)")
+
+        touch_issues(app, range(1, args.issues + 1, max(args.issues // args.updates, 1)), status={"id": 5, "name": "Closed"})
+        app.state.requests.clear()
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            written, seconds = timed(lambda: sync.sync_once(full=False))
+        print(f"incremental sync  {written} issues in {seconds:6.2f}s  ({sum(app.state.requests.values())} requests)")
+
+        closed = sum(1 for issue in replica.issues_assigned_to(1, "Closed") if issue["updated_on"] > "2025")
+        print(f"edited issues visible in the replica: {closed > 0}")
+
+        live = RedmineSource(RedmineClient(url, max_concurrency=args.concurrency))
+        count, replica_seconds = tool_latency(replica, 20)
+        _, live_seconds = tool_latency(live, 3)
+        print(f"get_my_assigned_issues ({count} issues): replica {replica_seconds * 1000:.1f} ms, "
+              f"live {live_seconds * 1000:.1f} ms")
+
+        sync.update_lag()
+        print(f"redmine_sync_lag_seconds {SYNC_LAG.value()}")
+        live.client.close()
+        sync.close()
+        replica.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Repeated Redmine questions through call_agent with and without the response cache.
+
+The LLM is replaced by a stub that sleeps for --latency seconds per call, so the
+numbers show how many model round trips the cache saves. The last step updates an
+issue in the store and checks that the next question is answered fresh again.
+
+    python benchmarks/bench_response_cache.py --requests 200 --latency 0.05
+"""
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+import uuid
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.messages import AIMessage
+
+from src.agents import agent
+from src.agents.database import STORE
+from src.utils.cache import CACHE_REQUESTS, HashingEmbedder, ResponseCache, SemanticCache
+
+# Each question comes with a few ways users actually phrase it
+QUESTIONS = [
+    ["¿Cuáles son mis tareas abiertas?", "cuales son mis tareas abiertas", "¿Cuáles son mis tareas abiertas ahora?"],
+    ["¿En qué proyectos participo?", "en que proyectos participo?", "¿En qué proyectos participo yo?"],
+    ["¿Qué issues críticas tiene Website Redesign?", "que issues criticas tiene website redesign",
+     "¿Qué issues críticas tiene el proyecto Website Redesign?"],
+    ["Lista todos los proyectos", "lista todos los proyectos.", "Lista todos los proyectos por favor"],
+]
+USERS = ["sally", "bob", "alice"]
+
+
+class SlowStubLLM:
+    """Answers after a fixed delay and counts the calls it receives."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def invoke(self, messages, *args, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        return AIMessage(content=f"Respuesta a: {messages[-1].content}")
+
+
+def quiet():
+    """Silences the per-node prints so the table stays readable."""
+    return contextlib.redirect_stdout(open(os.devnull, "w"))
+
+
+def workload(requests, seed=7):
+    rng = random.Random(seed)
+    return [(rng.choice(USERS), rng.choice(rng.choice(QUESTIONS))) for _ in range(requests)]
+
+
+def run(label, cache, requests, latency):
+    llm = SlowStubLLM(latency)
+    agent.get_llm_with_tools = lambda model=None: llm
+    agent.get_response_cache = lambda: cache
+    start = time.perf_counter()
+    with quiet():
+        for user, question in requests:
+            agent.call_agent(question, str(uuid.uuid4()), user)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<16} {len(requests)} requests  {llm.calls:4d} LLM calls  "
+          f"{elapsed * 1000 / len(requests):8.2f} ms/request")
+    return llm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated LLM latency in seconds")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Semantic similarity threshold")
+    args = parser.parse_args()
+
+    # ChatOpenAI refuses to build without a key; no request is ever sent
+    os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+    # Keep remote tracing out of the measurement
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    # The router would answer these questions from templates without reaching the (stub) LLM
+    os.environ["AGENT_ROUTER_ENABLED"] = "false"
+    agent._agent_config = lambda session_id: {"configurable": {"thread_id": session_id}}
+
+    requests = workload(args.requests)
+    semantic = SemanticCache(HashingEmbedder(), threshold=args.threshold, path=None)
+    run("no cache", None, requests, args.latency)
+    run("exact", ResponseCache(), requests, args.latency)
+    run("exact+semantic", ResponseCache(semantic=semantic), requests, args.latency)
+
+    # Invalidation: after a write to the store the same question must reach the LLM again
+    llm = SlowStubLLM(0)
+    agent.get_llm_with_tools = lambda model=None: llm
+    with quiet():
+        agent.call_agent(QUESTIONS[0][0], str(uuid.uuid4()), "sally")
+        agent.call_agent(QUESTIONS[0][0], str(uuid.uuid4()), "sally")
+        before_write = llm.calls
+        STORE.update_issue(next(iter(STORE.issues)), status="Closed")
+        agent.call_agent(QUESTIONS[0][0], str(uuid.uuid4()), "sally")
+    print(f"repeat before the write served from cache: {before_write <= 1}")
+    print(f"repeat after the write reached the LLM again: {llm.calls == before_write + 1}")
+    for tier in ("exact", "semantic"):
+        hits = CACHE_REQUESTS.value(scope="agent", tier=tier, result="hit")
+        misses = CACHE_REQUESTS.value(scope="agent", tier=tier, result="miss")
+        print(f"{tier:<9} tier: {hits:.0f} hits / {misses:.0f} misses")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Agent latency and LLM cost per route, with the query router off and on.
+
+A mix of greetings, simple lookups, short questions and long ones is sent to the
+agent against a local fake OpenAI server in which the small model answers faster
+than the full one. With the router on, greetings and lookups skip the model and
+short questions use the small model.
+
+    python benchmarks/bench_router.py --rounds 5 --latency 0.8 --small-latency 0.3
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+import uuid
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from benchmarks.fake_openai import create_app, run_server
+
+# Roughly the mix seen in chat logs: many greetings and "what's on my plate" questions
+QUERIES = [
+    "Hola",
+    "¡Gracias!",
+    "mis proyectos",
+    "mis incidencias abiertas",
+    "¿Cuántas incidencias tengo?",
+    "incidencias de Mobile App Q3",
+    "qué proyectos hay",
+    "¿quién trabaja en el crash de iOS?",
+    "busca incidencias sobre el login",
+    "mis incidencias sobre TestFlight",
+    "compara las incidencias de Project Phoenix y Mobile App Q3",
+    "Dame un resumen de todas las incidencias críticas de mis proyectos y cómo priorizarlas esta semana",
+]
+
+
+async def run_mix(agent, router, rounds, concurrency):
+    """Sends every query ``rounds`` times in new sessions; returns {route: [seconds]}."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = {}
+
+    async def one(query):
+        route = router.classify(query)[0]
+        async with semaphore:
+            start = time.perf_counter()
+            reply = await agent.acall_agent(query, str(uuid.uuid4()), "sally")
+            latencies.setdefault(route, []).append(time.perf_counter() - start)
+        if reply["message"].startswith("Error"):
+            raise RuntimeError(reply["message"])
+
+    await asyncio.gather(*(one(query) for _ in range(rounds) for query in QUERIES))
+    return latencies
+
+
+def usage(router_module) -> dict:
+    """Current totals of the route metrics: {route: (tokens, cost)}."""
+    return {
+        route: (
+            router_module.ROUTE_TOKENS.value(route=route, kind="prompt")
+            + router_module.ROUTE_TOKENS.value(route=route, kind="completion"),
+            router_module.ROUTE_COST.value(route=route)
+        )
+        for route in router_module.ROUTES
+    }
+
+
+def report(label, latencies, before, after, upstream_calls):
+    print(f"{label}: {upstream_calls} LLM calls")
+    print(f"  {'route':<9}{'queries':>8}{'p50 ms':>9}{'p95 ms':>9}{'tokens':>9}{'cost $':>11}")
+    total_cost = 0.0
+    for route, samples in sorted(latencies.items(), key=lambda item: item[0]):
+        tokens = after[route][0] - before[route][0]
+        cost = after[route][1] - before[route][1]
+        total_cost += cost
+        print(f"  {route:<9}{len(samples):>8}{np.percentile(samples, 50) * 1000:>9.1f}"
+              f"{np.percentile(samples, 95) * 1000:>9.1f}{tokens:>9.0f}{cost:>11.5f}")
+    every = [s for samples in latencies.values() for s in samples]
+    print(f"  {'all':<9}{len(every):>8}{np.percentile(every, 50) * 1000:>9.1f}"
+          f"{np.percentile(every, 95) * 1000:>9.1f}{'':>9}{total_cost:>11.5f}")
+    return total_cost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5, help="Times each query of the mix is sent")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.8, help="Fake latency of the full model in seconds")
+    parser.add_argument("--small-latency", type=float, default=0.3, help="Fake latency of the small model")
+    args = parser.parse_args()
+
+    # The tools and agent print every call; keep the report readable
+    logging.disable(logging.WARNING)
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+
+    fake = create_app(latency=args.latency)
+    with run_server(fake) as url:
+        from src.agents import agent
+        from src.agents import router as router_module
+        from src.llm.resilience import get_resilient_llm
+
+        os.environ["OPENAI_BASE_URL"] = f"{url}/v1"
+        os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+        os.environ["LANGCHAIN_TRACING_V2"] = "false"
+        fake.state.model_latency[get_resilient_llm("agent_small").model] = args.small_latency
+        router = router_module.get_router()
+
+        async def run_all():
+            results = {}
+            for label, enabled in (("router off", False), ("router on", True)):
+                router.enabled = enabled
+                before, calls = usage(router_module), fake.state.requests
+                stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+                try:
+                    latencies = await run_mix(agent, router, args.rounds, args.concurrency)
+                finally:
+                    sys.stdout.close()
+                    sys.stdout = stdout
+                results[label] = (latencies, before, usage(router_module), fake.state.requests - calls)
+            return results
+
+        results = asyncio.run(run_all())
+
+    costs = {label: report(label, *result) for label, result in results.items()}
+    if costs["router off"]:
+        print(f"LLM cost with the router: {costs['router on'] / costs['router off']:.0%} of the cost without it")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Throughput of the API with 1..N uvicorn worker processes.
+
+Starts the fake LLM server and then the API (``uvicorn app:app --workers N``) as
+separate processes, keeps a fixed number of concurrent /chat requests in flight
+for a while, and reports requests per second and latency percentiles per worker
+count. Requests are CPU bound in the API (agent graph, tool calls, JSON), so
+throughput should grow with workers up to the number of cores; on a single core
+extra workers only add context switches.
+
+    python benchmarks/bench_server_workers.py --workers 1 2 4 --concurrency 32 --duration 15
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+import numpy as np
+
+from benchmarks.fake_openai import _free_port
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def start(args, env, url):
+    """Starts a process and waits until ``url`` answers."""
+    process = subprocess.Popen(args, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{' '.join(args)} did not start")
+
+
+def stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def load(base_url, payload, concurrency, duration):
+    """Keeps ``concurrency`` requests in flight for ``duration`` seconds; returns latencies and errors."""
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(n):
+            nonlocal errors
+            i = 0
+            while time.perf_counter() < deadline:
+                body = dict(payload, session_id=f"load-{n}-{i}")
+                i += 1
+                start_time = time.perf_counter()
+                try:
+                    response = await client.post("/chat", json=body)
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start_time)
+                except httpx.HTTPError:
+                    errors += 1
+
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15, help="Seconds of load per worker count")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake upstream latency in seconds")
+    parser.add_argument("--scenario", choices=["llm", "agent"], default="agent")
+    args = parser.parse_args()
+    payload = {"query": "hola"} if args.scenario == "llm" else {"query": "hola", "user": "sally"}
+
+    openai_port = _free_port()
+    fake = start(
+        [sys.executable, "benchmarks/fake_openai.py", "--port", str(openai_port), "--latency", str(args.latency)],
+        dict(os.environ), f"http://127.0.0.1:{openai_port}/docs"
+    )
+    env = dict(
+        os.environ,
+        OPENAI_BASE_URL=f"http://127.0.0.1:{openai_port}/v1",
+        OPENAI_API_KEY="sk-benchmark",
+        LANGCHAIN_TRACING_V2="false",
+        RESPONSE_CACHE_ENABLED="false",  # every request must reach the LLM
+        REDMINE_SYNC_ENABLED="false",
+    )
+    print(f"{os.cpu_count()} CPU cores, {args.concurrency} concurrent /chat ({args.scenario}), "
+          f"upstream latency {args.latency * 1000:.0f} ms")
+    try:
+        baseline = None
+        for workers in args.workers:
+            port = _free_port()
+            server = start(
+                [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+                 "--workers", str(workers), "--log-level", "warning"],
+                env, f"http://127.0.0.1:{port}/health"
+            )
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                # Warm-up: every worker builds its clients and graph on first use
+                asyncio.run(load(base_url, payload, args.concurrency, 2))
+                latencies, errors = asyncio.run(load(base_url, payload, args.concurrency, args.duration))
+            finally:
+                stop(server)
+            throughput = len(latencies) / args.duration
+            baseline = baseline or throughput
+            p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99]) if latencies else (0, 0, 0)
+            print(f"{workers:>2} workers  {throughput:7.1f} req/s ({throughput / baseline:4.2f}x)  "
+                  f"p50 {p50:6.0f} ms  p95 {p95:6.0f} ms  p99 {p99:6.0f} ms  errors {errors}")
+    finally:
+        stop(fake)
+
+
+if __name__ == "__main__":
+    main()
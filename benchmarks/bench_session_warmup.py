@@ -0,0 +1,104 @@
+"""
+LLM iterations and latency of the first agent turn, with and without the session warmup.
+
+The LLM is a scripted stub that behaves like the model on the common path: it
+looks up the user, then their projects and assigned issues, then answers, skipping
+any lookup whose result is already in the conversation. Each step sleeps for the
+given latency, so the time saved per skipped iteration is visible.
+
+    python benchmarks/bench_session_warmup.py --sessions 50 --latency 0.3
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from langchain_core.messages import AIMessage
+
+from src.agents import agent
+
+QUESTION = "¿Cuáles de mis incidencias debería atender primero?"
+
+
+class ScriptedLLM:
+    """Answers like the agent model would, after the lookups it needs; counts its calls."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    def _respond(self, messages):
+        done = {tool_call["name"] for msg in messages if isinstance(msg, AIMessage) for tool_call in msg.tool_calls}
+        if "get_user_name" not in done:
+            return _tool_calls(("get_user_name", {"username": "sally"}))
+        if "get_my_assigned_issues" not in done:
+            return _tool_calls(("get_projects_for_user", {"user_id": 101}), ("get_my_assigned_issues", {"username": "sally"}))
+        return AIMessage(content="Empieza por #5: es crítica y sigue abierta.")
+
+    def invoke(self, messages, *args, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self._respond(messages)
+
+
+def _tool_calls(*calls):
+    return AIMessage(content="", tool_calls=[
+        {"id": f"call_{uuid.uuid4().hex[:8]}", "name": name, "args": args} for name, args in calls
+    ])
+
+
+async def run(stub, sessions):
+    latencies = []
+    for _ in range(sessions):
+        start = time.perf_counter()
+        reply = await agent.acall_agent(QUESTION, str(uuid.uuid4()), "sally")
+        latencies.append(time.perf_counter() - start)
+        assert not reply["message"].startswith("Error"), reply["message"]
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.3, help="Stub LLM latency per call in seconds")
+    args = parser.parse_args()
+
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    # The question has to reach the model
+    agent.get_router().enabled = False
+
+    results = {}
+    for label, enabled in (("no warmup", False), ("warmup", True)):
+        stub = ScriptedLLM(args.latency)
+        agent.get_llm_with_tools = lambda model=None: stub
+        agent.PREFETCH_ENABLED = enabled
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            latencies = asyncio.run(run(stub, args.sessions))
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        results[label] = (stub.calls / args.sessions, latencies)
+
+    for label, (calls, latencies) in results.items():
+        print(f"{label:<10} {calls:.1f} LLM calls/turn  p50 {np.percentile(latencies, 50) * 1000:7.1f} ms  "
+              f"p95 {np.percentile(latencies, 95) * 1000:7.1f} ms")
+    saved = results["no warmup"][0] - results["warmup"][0]
+    print(f"The warmup saves {saved:.1f} LLM iterations per opening turn")
+    sys.exit(0 if saved >= 1 else 1)
+
+
+if __name__ == "__main__":
+    main()
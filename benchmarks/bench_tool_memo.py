@@ -0,0 +1,94 @@
+"""
+Tool calls of repeated agent runs with and without memoization.
+
+Store lookups are slowed down by --latency seconds to stand in for a remote Redmine.
+Every run repeats the tool pattern the model typically produces: look the user up,
+then list the user's issues (which looks the user up again) and all projects.
+
+    python benchmarks/bench_tool_memo.py --runs 50 --latency 0.02
+"""
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.messages import AIMessage
+
+from src.agents import agent, memo
+from src.agents.database import STORE
+from src.agents.memo import TOOL_CACHE_REQUESTS, request_scope
+
+TOOL_CALLS = [
+    {"id": "a", "name": "get_user_name", "args": {"username": "sally"}},
+    {"id": "b", "name": "get_my_assigned_issues", "args": {"username": "sally"}},
+    {"id": "c", "name": "get_all_projects", "args": {}},
+    {"id": "d", "name": "get_issues_for_project", "args": {"project_name": "Project Phoenix", "status": "Open"}},
+    {"id": "e", "name": "get_issues_for_project", "args": {"project_name": "project phoenix", "status": "open"}},
+]
+LOOKUPS = ["find_user_id", "projects_for_member", "find_project", "all_projects",
+           "issues_for_project", "issues_assigned_to"]
+
+
+def slow_store(latency):
+    """Wraps the store lookups with a fixed delay and counts them."""
+    counter = {"calls": 0}
+
+    def slowed(method):
+        def wrapper(*args, **kwargs):
+            counter["calls"] += 1
+            time.sleep(latency)
+            return method(*args, **kwargs)
+        return wrapper
+
+    for name in LOOKUPS:
+        setattr(STORE, name, slowed(getattr(STORE, name)))
+    return counter
+
+
+def run(label, runs, counter, memoize):
+    counter["calls"] = 0
+    memo.SHARED_CACHE.clear()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        for _ in range(runs):
+            with (request_scope() if memoize else no_memo()):
+                agent.node_tools({"messages": [AIMessage(content="", tool_calls=TOOL_CALLS)]})
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {runs} runs  {counter['calls']:5d} store lookups  {elapsed * 1000 / runs:8.2f} ms/run")
+    return elapsed
+
+
+@contextlib.contextmanager
+def no_memo():
+    """Makes every shared-cache lookup miss; without a request scope nothing is deduplicated."""
+    get = memo.SHARED_CACHE.get
+    memo.SHARED_CACHE.get = lambda key, default=None: default
+    try:
+        yield
+    finally:
+        memo.SHARED_CACHE.get = get
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated store latency in seconds")
+    args = parser.parse_args()
+
+    counter = slow_store(args.latency)
+    names = list(dict.fromkeys(call["name"] for call in TOOL_CALLS))
+    before = run("no memo", args.runs, counter, memoize=False)
+    baseline = {(n, r): TOOL_CACHE_REQUESTS.value(tool=n, result=r) for n in names for r in ("miss", "dedup", "hit")}
+    after = run("memo", args.runs, counter, memoize=True)
+    print(f"speedup    {before / after:.1f}x")
+    for name in names:
+        counts = {r: int(TOOL_CACHE_REQUESTS.value(tool=name, result=r) - baseline[name, r]) for r in ("miss", "dedup", "hit")}
+        print(f"{name:<24} {counts}")
+
+
+if __name__ == "__main__":
+    main()
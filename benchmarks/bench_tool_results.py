@@ -0,0 +1,65 @@
+"""
+Prompt tokens of tool results: the old str() output vs the compact encoder.
+
+Builds issue lists shaped like get_issues_for_project results and counts the
+tokens of each serialization.
+
+    python benchmarks/bench_tool_results.py --rows 5 20 50 200 1000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agents.encoding import encode_result, next_page
+from src.utils.history import count_tokens
+
+SUBJECTS = ["Fix login button", "Update documentation", "Deploy to TestFlight", "Setup CI/CD pipeline",
+            "Fix crash on iOS 17", "Improve search performance", "Translate onboarding screens"]
+
+
+def issues(rows, seed=7):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "subject": f"{rng.choice(SUBJECTS)} #{i}",
+            "status": "Open",  # As returned for a status=Open query
+            "priority": rng.choice(["Low", "Normal", "High", "Critical"]),
+            "assignee": rng.choice(["dave", "sally", "Unassigned"]),
+        }
+        for i in range(1, rows + 1)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[5, 20, 50, 200, 1000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>6} {'str() tokens':>13} {'encoded tokens':>15} {'saving':>8} {'encode ms':>10}")
+    for rows in args.rows:
+        result = issues(rows)
+        before = count_tokens(str(result))
+        start = time.perf_counter()
+        encoded = encode_result("get_issues_for_project", result)
+        elapsed = time.perf_counter() - start
+        after = count_tokens(encoded)
+        print(f"{rows:>6} {before:>13} {after:>15} {1 - after / before:>7.0%} {elapsed * 1000:>10.2f}")
+
+    # Paging: every row is still reachable through the continuation cursors
+    # The cursor holds the call, which next_page repeats
+    pages, text = 1, encode_result("get_issues_for_project", issues(120), max_rows=50, args={"project_name": "Demo"})
+    while "cursor=" in text:
+        text = next_page(text.rsplit("cursor=", 1)[1].split(" ")[0], lambda name, args: issues(120))
+        pages += 1
+    print(f"\n120 rows at 50 per result: {pages} pages, last starts with '{text.splitlines()[0]}'")
+    print("\nexample:\n" + encode_result("get_issues_for_project", issues(4)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Tool-call scheduling with artificially slow tools.
+
+Runs one AI message worth of tool calls through ToolScheduler (sync and async) and
+checks wall time, result order and timeout handling.
+
+    python benchmarks/bench_tool_scheduler.py --calls 5 --delay 0.2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add the project root to the Python path to enable imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.messages import ToolMessage
+
+from src.agents.scheduler import ToolScheduler
+
+
+def slow_handler(delay):
+    def handler(tool_call):
+        time.sleep(tool_call["args"].get("delay", delay))
+        return ToolMessage(content=f"result-{tool_call['id']}", tool_call_id=tool_call["id"])
+    return handler
+
+
+def make_calls(count, name="slow_tool"):
+    return [{"id": f"call_{i}", "name": name, "args": {}} for i in range(count)]
+
+
+def check_order(calls, results):
+    assert [m.tool_call_id for m in results] == [c["id"] for c in calls], "ToolMessage order not preserved"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=5)
+    parser.add_argument("--delay", type=float, default=0.2, help="Seconds each slow tool takes")
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    scheduler = ToolScheduler(max_concurrency=args.max_concurrency, default_timeout=10)
+    handler = slow_handler(args.delay)
+    calls = make_calls(args.calls)
+    waves = -(-args.calls // args.max_concurrency)
+
+    # Sequential baseline: what the old for-loop in node_tools paid
+    start = time.perf_counter()
+    for call in calls:
+        handler(call)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = scheduler.run(calls, handler)
+    threaded = time.perf_counter() - start
+    check_order(calls, results)
+
+    start = time.perf_counter()
+    results = asyncio.run(scheduler.arun(calls, handler))
+    asynchronous = time.perf_counter() - start
+    check_order(calls, results)
+
+    print(f"{args.calls} tools x {args.delay:.2f}s, max concurrency {args.max_concurrency} "
+          f"(expected ~{waves * args.delay:.2f}s)")
+    print(f"sequential {sequential:.2f}s   run() {threaded:.2f}s   arun() {asynchronous:.2f}s")
+
+    # One call hangs past its per-tool timeout; the others must still come back in order
+    scheduler = ToolScheduler(max_concurrency=args.max_concurrency, default_timeout=10, timeouts={"hanging_tool": 0.3})
+    calls = make_calls(2) + [{"id": "call_hang", "name": "hanging_tool", "args": {"delay": 2}}]
+    for label, runner in (("run()", lambda: scheduler.run(calls, handler)),
+                          ("arun()", lambda: asyncio.run(scheduler.arun(calls, handler)))):
+        start = time.perf_counter()
+        results = runner()
+        elapsed = time.perf_counter() - start
+        check_order(calls, results)
+        assert results[-1].status == "error" and "timed out" in results[-1].content
+        assert elapsed < 1.0, f"{label} waited for the hanging tool ({elapsed:.2f}s)"
+        print(f"timeout {label:<7} {elapsed:.2f}s -> {results[-1].content}")
+    scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    main()
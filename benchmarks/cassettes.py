@@ -0,0 +1,110 @@
+"""
+Record and replay of OpenAI chat completions for benchmarks.
+
+A cassette is a JSON Lines file with one recorded completion per line. Completions
+are keyed by the request's messages and tool names, leaving out the model (the
+fallback or small model may answer) and the tool call ids (new on every run), so
+a conversation replays as long as the prompts the service sends do not change.
+
+``create_recorder`` is a proxy to a real OpenAI-compatible API that appends every
+completion it forwards; ``fake_openai.create_app(cassette=...)`` replays them.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.fake_openai import stream_completion
+
+
+def request_key(body: dict) -> str:
+    """Identifies a completion request by its conversation and tools."""
+    messages = [
+        {
+            "role": message.get("role"),
+            "content": message.get("content"),
+            "tool_calls": [
+                [call["function"]["name"], call["function"]["arguments"]] for call in message.get("tool_calls") or []
+            ],
+        }
+        for message in body.get("messages", [])
+    ]
+    tools = [tool.get("function", {}).get("name") for tool in body.get("tools") or []]
+    text = json.dumps({"messages": messages, "tools": tools}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class Cassette:
+    """Recorded completions by request key, loaded from and appended to a JSON Lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, body: dict):
+        """The recorded ``{"response", "latency"}`` for the request, or None."""
+        return self.entries.get(request_key(body))
+
+    def record(self, body: dict, response: dict, latency: float):
+        messages = body.get("messages") or [{}]
+        entry = {
+            "key": request_key(body),
+            "model": body.get("model"),
+            # Only to make the file readable; replay goes by key
+            "last_message": str(messages[-1].get("content"))[:200],
+            "latency": round(latency, 4),
+            "response": response,
+        }
+        with self._lock:
+            self.entries[entry["key"]] = entry
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def create_recorder(cassette: Cassette, upstream: str = "https://api.openai.com/v1", api_key: str = None) -> FastAPI:
+    """OpenAI-compatible proxy recording each completion into ``cassette``.
+
+    Streaming requests are forwarded unstreamed and streamed back from the
+    recorded completion, so every request can be replayed either way.
+    """
+    app = FastAPI()
+    app.state.requests = 0
+    headers = {"Authorization": f"Bearer {api_key or os.environ.get('OPENAI_API_KEY', '')}"}
+    client = httpx.AsyncClient(base_url=upstream.rstrip("/"), headers=headers, timeout=120)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        forwarded = {k: v for k, v in body.items() if k not in ("stream", "stream_options")}
+        start = time.perf_counter()
+        response = await client.post("/chat/completions", json=forwarded)
+        latency = time.perf_counter() - start
+        if response.status_code != 200:
+            retry_after = response.headers.get("retry-after")
+            return JSONResponse(response.json(), status_code=response.status_code,
+                                headers={"retry-after": retry_after} if retry_after else None)
+        completion = response.json()
+        cassette.record(body, completion, latency)
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            return StreamingResponse(stream_completion(completion, include_usage), media_type="text/event-stream")
+        return completion
+
+    return app
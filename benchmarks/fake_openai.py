@@ -0,0 +1,355 @@
+"""
+Local OpenAI-compatible server for benchmarks.
+
+Serves ``POST /v1/chat/completions`` with a fixed reply after a configurable delay,
+so latency-sensitive code paths can be measured without calling OpenAI. Streaming
+requests get the reply word by word as ``chat.completion.chunk`` events. With a
+requests-per-minute limit, requests over it get OpenAI's 429 with Retry-After.
+
+Faults can be injected, and changed while the server runs through ``app.state``:
+``error_rate`` (fraction of requests answered 503), ``slow_rate`` and
+``slow_latency`` (a fraction of requests taking much longer, a latency tail) and
+``failing_models`` (models that always answer 503). ``model_latency`` gives some
+models their own latency, e.g. a faster small model.
+
+With ``prompt_cache``, prompts are cached like OpenAI does: the longest prefix
+(in 128-token blocks, at least 1024 tokens) seen in an earlier request is
+reported as ``cached_tokens`` and makes the request proportionally faster. The
+prompt is rendered as the first system message, the tool definitions, then the
+other messages.
+
+A ``script`` makes the model call tools when the request offers any: step ``i``
+answers the request with ``i`` assistant messages after the last user message,
+either with tool calls (a list of ``(name, args)``) or with a text; after the
+last step comes ``reply``.
+``token_rate`` adds generation time (completion tokens per second). With a
+``cassette`` (see cassettes.py) recorded completions are replayed instead, with
+their recorded latency; requests that were not recorded get a 404.
+
+The Batch API is served too (``/v1/files`` and ``/v1/batches``): a batch is
+answered ``batch_latency`` seconds after it was created, each request like a
+chat completion.
+"""
+import asyncio
+import email.parser
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+
+
+def _error(status: int, message: str, kind: str, headers: dict = None) -> JSONResponse:
+    return JSONResponse({"error": {"message": message, "type": kind, "code": kind}}, status_code=status, headers=headers)
+
+
+# Tokens are approximated as 4 characters; OpenAI caches prefixes in 128-token blocks from 1024 tokens on
+CHARS_PER_TOKEN = 4
+CACHE_BLOCK_TOKENS = 128
+CACHE_MIN_TOKENS = 1024
+
+
+def _prompt_text(body: dict) -> str:
+    messages = body.get("messages", [])
+    head = messages[:1] if messages and messages[0].get("role") == "system" else []
+    return json.dumps(head) + json.dumps(body.get("tools") or []) + json.dumps(messages[len(head):])
+
+
+def _cached_tokens(text: str, seen: set) -> int:
+    """Tokens of the longest block-aligned prefix of ``text`` seen before; remembers the prefixes of ``text``."""
+    block = CACHE_BLOCK_TOKENS * CHARS_PER_TOKEN
+    digest = hashlib.blake2b()
+    cached = 0
+    for end in range(block, len(text) + 1, block):
+        digest.update(text[end - block:end].encode("utf-8"))
+        key = digest.copy().hexdigest()
+        if key in seen and cached == end - block:
+            cached = end
+        seen.add(key)
+    cached //= CHARS_PER_TOKEN
+    return cached if cached >= CACHE_MIN_TOKENS else 0
+
+
+def _last_turn_step(body: dict) -> int:
+    """Assistant messages since the last user message: the model's iteration within the turn."""
+    step = 0
+    for message in reversed(body.get("messages", [])):
+        if message.get("role") == "user":
+            break
+        step += message.get("role") == "assistant"
+    return step
+
+
+def _scripted_message(body: dict, script, reply: str) -> dict:
+    step = _last_turn_step(body)
+    action = script[step] if script and body.get("tools") and step < len(script) else reply
+    if isinstance(action, str):
+        return {"role": "assistant", "content": action}
+    return {"role": "assistant", "content": None, "tool_calls": [
+        {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+         "function": {"name": name, "arguments": json.dumps(args, ensure_ascii=False)}}
+        for name, args in action
+    ]}
+
+
+def _completion_tokens(message: dict) -> int:
+    text = (message.get("content") or "") + "".join(
+        call["function"]["name"] + call["function"]["arguments"] for call in message.get("tool_calls") or []
+    )
+    return max(len(text) // CHARS_PER_TOKEN, 1)
+
+
+def _form_fields(content_type: str, body: bytes) -> dict:
+    """Fields of a multipart/form-data body (the file upload of the Batch API) as bytes."""
+    message = email.parser.BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    return {part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+            for part in message.get_payload()}
+
+
+def create_app(latency: float = 0.5, reply: str = "Respuesta de prueba", rpm: float = 0, error_rate: float = 0,
+               slow_rate: float = 0, slow_latency: float = 5, failing_models=(), prompt_cache: bool = False,
+               script=None, token_rate: float = 0, cassette=None, batch_latency: float = 1) -> FastAPI:
+    """Builds the fake server; every completion waits ``latency`` seconds.
+
+    ``rpm`` limits requests per minute (0 = unlimited), enforced per second like OpenAI does.
+    """
+    app = FastAPI()
+    app.state.requests = 0
+    app.state.rate_limited = 0
+    app.state.by_model = {}
+    app.state.error_rate = error_rate
+    app.state.slow_rate = slow_rate
+    app.state.slow_latency = slow_latency
+    app.state.failing_models = set(failing_models)
+    app.state.model_latency = {}
+    app.state.prompt_cache = prompt_cache
+    app.state.prefixes = set()
+    app.state.script = script
+    app.state.token_rate = token_rate
+    app.state.cassette = cassette
+    app.state.replay_misses = 0
+    app.state.tokens = {"prompt": 0, "completion": 0}
+    app.state.files = {}
+    app.state.batches = {}
+    app.state.batch_requests = 0
+    window = {"second": 0, "count": 0}
+
+    def build_completion(body: dict) -> dict:
+        model = body.get("model", "fake")
+        text = _prompt_text(body)
+        prompt_tokens = len(text) // CHARS_PER_TOKEN
+        cached_tokens = _cached_tokens(text, app.state.prefixes) if app.state.prompt_cache else 0
+        message = _scripted_message(body, app.state.script, reply)
+        completion_tokens = _completion_tokens(message)
+        app.state.tokens["prompt"] += prompt_tokens
+        app.state.tokens["completion"] += completion_tokens
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        try:
+            body = await request.json()
+        except ClientDisconnect:
+            # The client gave up (a cancelled hedged request, a timeout)
+            return Response(status_code=499)
+        app.state.requests += 1
+        model = body.get("model", "fake")
+        app.state.by_model[model] = app.state.by_model.get(model, 0) + 1
+        if model in app.state.failing_models or random.random() < app.state.error_rate:
+            await asyncio.sleep(latency / 5)
+            return _error(503, "The server is overloaded", "server_error")
+        if rpm:
+            second = int(time.monotonic())
+            if window["second"] != second:
+                window["second"], window["count"] = second, 0
+            window["count"] += 1
+            if window["count"] > max(rpm / 60, 1):
+                app.state.rate_limited += 1
+                return _error(429, "Rate limit reached", "rate_limit_exceeded", {"retry-after": "1"})
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+        if app.state.cassette is not None:
+            recorded = app.state.cassette.get(body)
+            if recorded is None:
+                app.state.replay_misses += 1
+                return _error(404, "No recorded completion for this request", "cassette_miss")
+            await asyncio.sleep(recorded["latency"])
+            if body.get("stream"):
+                return StreamingResponse(stream_completion(recorded["response"], include_usage),
+                                         media_type="text/event-stream")
+            return recorded["response"]
+        completion = build_completion(body)
+        usage = completion["usage"]
+        completion_tokens = usage["completion_tokens"]
+        slow = random.random() < app.state.slow_rate
+        delay = app.state.slow_latency if slow else app.state.model_latency.get(model, latency)
+        # Cached prompt tokens are not processed again; assume prompt processing is half the latency
+        delay *= 1 - 0.5 * usage["prompt_tokens_details"]["cached_tokens"] / max(usage["prompt_tokens"], 1)
+        if body.get("stream"):
+            # Tokens are generated while streaming; the delay until the first one is the prompt processing
+            await asyncio.sleep(delay)
+            return StreamingResponse(stream_completion(completion, include_usage, app.state.token_rate),
+                                     media_type="text/event-stream")
+        await asyncio.sleep(delay + (completion_tokens / app.state.token_rate if app.state.token_rate else 0))
+        return completion
+
+    # --- Batch API ---
+    def new_file(content: bytes, filename: str, purpose: str) -> dict:
+        file = {"id": f"file-{uuid.uuid4().hex[:24]}", "object": "file", "bytes": len(content),
+                "created_at": int(time.time()), "filename": filename, "purpose": purpose, "status": "processed"}
+        app.state.files[file["id"]] = (file, content)
+        return file
+
+    @app.post("/v1/files")
+    async def upload_file(request: Request):
+        fields = _form_fields(request.headers["content-type"], await request.body())
+        return new_file(fields["file"], "batch.jsonl", fields.get("purpose", b"batch").decode())
+
+    @app.get("/v1/files/{file_id}/content")
+    async def file_content(file_id: str):
+        if file_id not in app.state.files:
+            return _error(404, f"No such file: {file_id}", "not_found")
+        return Response(app.state.files[file_id][1], media_type="application/octet-stream")
+
+    async def process_batch(batch: dict):
+        await asyncio.sleep(batch_latency)
+        lines = app.state.files[batch["input_file_id"]][1].decode("utf-8").splitlines()
+        output = []
+        for line in filter(None, lines):
+            request = json.loads(line)
+            app.state.requests += 1
+            app.state.batch_requests += 1
+            output.append(json.dumps({
+                "id": f"batch_req_{uuid.uuid4().hex[:24]}",
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": build_completion(request["body"])},
+                "error": None,
+            }))
+        batch["output_file_id"] = new_file("\n".join(output).encode("utf-8"), "batch_output.jsonl", "batch_output")["id"]
+        batch["request_counts"] = {"total": len(output), "completed": len(output), "failed": 0}
+        batch["status"], batch["completed_at"] = "completed", int(time.time())
+
+    @app.post("/v1/batches")
+    async def create_batch(request: Request):
+        body = await request.json()
+        if body["input_file_id"] not in app.state.files:
+            return _error(404, f"No such file: {body['input_file_id']}", "not_found")
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex[:24]}", "object": "batch", "endpoint": body["endpoint"],
+            "input_file_id": body["input_file_id"], "completion_window": body["completion_window"],
+            "status": "in_progress", "created_at": int(time.time()),
+            "request_counts": {"total": len(app.state.files[body["input_file_id"]][1].splitlines()), "completed": 0,
+                               "failed": 0},
+        }
+        app.state.batches[batch["id"]] = batch
+        asyncio.get_running_loop().create_task(process_batch(batch))
+        return batch
+
+    @app.get("/v1/batches/{batch_id}")
+    async def retrieve_batch(batch_id: str):
+        if batch_id not in app.state.batches:
+            return _error(404, f"No such batch: {batch_id}", "not_found")
+        return app.state.batches[batch_id]
+
+    return app
+
+
+async def stream_completion(completion: dict, include_usage: bool = False, token_rate: float = 0):
+    """Server-sent ``chat.completion.chunk`` events of a completion: its text word by word, then its tool calls."""
+    choice = completion["choices"][0]
+    message = choice["message"]
+    base = {"id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"],
+            "model": completion["model"]}
+    deltas = []
+    if message.get("content"):
+        words = message["content"].split(" ")
+        deltas += [{"content": word if i == 0 else " " + word} for i, word in enumerate(words)]
+    deltas += [
+        {"tool_calls": [dict(call, index=i)]} for i, call in enumerate(message.get("tool_calls") or [])
+    ]
+    deltas = deltas or [{"content": ""}]
+    deltas[0] = dict(deltas[0], role="assistant")
+    for i, delta in enumerate(deltas):
+        last = i == len(deltas) - 1
+        chunk = dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": choice["finish_reason"] if last else None}])
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(1 / token_rate if token_rate else 0)
+    if include_usage and completion.get("usage"):
+        # Like OpenAI: a last chunk without choices carries the usage
+        yield f"data: {json.dumps(dict(base, choices=[], usage=completion['usage']))}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def run_server(app: FastAPI):
+    """Runs an ASGI app on a free local port in a background thread; yields its base URL."""
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+@contextmanager
+def fake_openai(latency: float = 0.5, reply: str = "Respuesta de prueba", rpm: float = 0):
+    """Starts the fake server and yields the ``base_url`` to give the OpenAI client."""
+    with run_server(create_app(latency, reply, rpm)) as url:
+        yield f"{url}/v1"
+
+
+if __name__ == "__main__":
+    # Standalone server, e.g. for load tests against API processes
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible server for benchmarks")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--token-rate", type=float, default=0, help="Completion tokens per second, 0 = instant")
+    parser.add_argument("--cassette", help="Replay the completions recorded in this cassette")
+    parser.add_argument("--batch-latency", type=float, default=1, help="Seconds until a Batch API batch is done")
+    args = parser.parse_args()
+    cassette = None
+    if args.cassette:
+        import os
+        import sys
+        sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+        from benchmarks.cassettes import Cassette
+        cassette = Cassette(args.cassette)
+    uvicorn.run(create_app(args.latency, token_rate=args.token_rate, cassette=cassette,
+                           batch_latency=args.batch_latency),
+                host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,210 @@
+"""
+Local Redmine REST API stand-in for benchmarks.
+
+Serves the read endpoints the client uses (issues, projects, users, memberships,
+statuses and priorities) from synthetic data, with offset/limit pagination, the
+usual filters (including ``updated_on=>=...``, ``subject=~...``, ``issue_id`` lists
+and ``|``-separated status and priority ids), the id/priority/updated_on sorts, a
+simple /search.json and an optional per-request delay.
+``app.state.requests`` counts requests per path and ``touch_issues`` simulates
+edits made in Redmine. Issue selections are cached per filter, so paging through
+hundreds of thousands of issues stays cheap.
+"""
+import asyncio
+import json
+import random
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI, HTTPException, Request, Response
+
+from benchmarks.fake_openai import run_server
+
+STATUSES = [{"id": 1, "name": "Open"}, {"id": 2, "name": "In Progress"}, {"id": 5, "name": "Closed"}]
+# Words the issue descriptions are made of
+SYMPTOMS = ["Crash", "Timeout", "Wrong total", "Blank screen", "Slow response", "Login failure", "Broken link"]
+COMPONENTS = ["checkout", "search page", "sync job", "settings screen", "PDF export", "notifications", "API"]
+PLATFORMS = ["iOS 17", "Android 14", "Safari", "Chrome", "the desktop app", "the staging server"]
+PRIORITIES = [{"id": 1, "name": "Low"}, {"id": 2, "name": "Normal"}, {"id": 3, "name": "High"}, {"id": 4, "name": "Critical"}]
+
+
+def generate_data(issues: int = 1000, projects: int = 20, users: int = 50, seed: int = 7) -> dict:
+    """Synthetic Redmine content; user 1 is ``sally`` and belongs to every project."""
+    rng = random.Random(seed)
+    user_list = [{"id": 1, "login": "sally", "firstname": "Sally", "lastname": "Smith"}] + [
+        {"id": i, "login": f"user{i}", "firstname": f"User{i}", "lastname": "Test"} for i in range(2, users + 1)
+    ]
+    project_list = [{"id": i, "name": f"Project {i}", "identifier": f"project-{i}"} for i in range(1, projects + 1)]
+    memberships = {user["id"]: set() for user in user_list}
+    for project in project_list:
+        memberships[1].add(project["id"])
+        for user in rng.sample(user_list, min(5, len(user_list))):
+            memberships[user["id"]].add(project["id"])
+    # Nested objects are shared between issues to keep large datasets small in memory
+    project_refs = [{"id": p["id"], "name": p["name"]} for p in project_list]
+    assignee_refs = [{"id": u["id"], "name": f"{u['firstname']} {u['lastname']}"} for u in user_list]
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    issue_list = []
+    for i in range(1, issues + 1):
+        project = rng.choice(project_refs)
+        issue_list.append({
+            "id": i,
+            "project": project,
+            "subject": f"Issue {i} in {project['name']}",
+            "description": f"{rng.choice(SYMPTOMS)} in the {rng.choice(COMPONENTS)} on {rng.choice(PLATFORMS)}",
+            "status": rng.choice(STATUSES),
+            "priority": rng.choice(PRIORITIES),
+            "assigned_to": rng.choice(assignee_refs),
+            # Ascending, so the list is already sorted by updated_on
+            "updated_on": _timestamp(start + timedelta(seconds=i)),
+        })
+    return {"users": user_list, "projects": project_list, "memberships": memberships, "issues": issue_list}
+
+
+def _timestamp(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def touch_issues(app: FastAPI, issue_ids, **changes):
+    """Simulates edits in Redmine: applies ``changes`` and moves updated_on to now."""
+    data = app.state.data
+    ids = set(issue_ids)
+    now = _timestamp(datetime.now(timezone.utc))
+    touched = [{**issue, **changes, "updated_on": now} for issue in data["issues"] if issue["id"] in ids]
+    data["issues"] = [issue for issue in data["issues"] if issue["id"] not in ids] + touched
+    app.state.selections.clear()
+    return len(touched)
+
+
+def _descending(timestamp: str) -> tuple:
+    return tuple(-ord(ch) for ch in timestamp)
+
+
+def create_app(data: dict = None, latency: float = 0.0) -> FastAPI:
+    """Builds the fake server; every request waits ``latency`` seconds."""
+    data = data or generate_data()
+    app = FastAPI()
+    app.state.data = data
+    app.state.requests = Counter()
+    app.state.selections = {}  # filters -> matching issues, cleared by touch_issues
+    projects_by_id = {project["id"]: project for project in data["projects"]}
+
+    @app.middleware("http")
+    async def count_and_delay(request: Request, call_next):
+        app.state.requests[request.url.path] += 1
+        if latency:
+            await asyncio.sleep(latency)
+        return await call_next(request)
+
+    def page(key: str, records: list, offset: int, limit: int) -> Response:
+        limit = min(limit, 100)
+        body = {key: records[offset:offset + limit], "total_count": len(records), "offset": offset, "limit": limit}
+        # Skip FastAPI's per-field encoding; it would dominate the benchmarks
+        return Response(json.dumps(body), media_type="application/json")
+
+    def select_issues(filters: tuple) -> list:
+        selection = app.state.selections.get(filters)
+        if selection is not None:
+            return selection
+        project_id, assigned_to_id, status_id, priority_id, updated_on, subject, issue_id, sort = filters
+        closed = {status["id"] for status in STATUSES if status["name"] == "Closed"}
+        since = updated_on[2:] if updated_on and updated_on.startswith(">=") else None
+        contains = subject[1:].lower() if subject and subject.startswith("~") else None
+        status_ids = {int(i) for i in status_id.split("|") if i.isdigit()}
+        priority_ids = {int(i) for i in priority_id.split("|")} if priority_id else None
+        issue_ids = {int(i) for i in issue_id.split(",")} if issue_id else None
+        selection = [
+            issue for issue in data["issues"]
+            if (project_id is None or issue["project"]["id"] == project_id)
+            and (assigned_to_id is None or issue["assigned_to"]["id"] == assigned_to_id)
+            and (priority_ids is None or issue["priority"]["id"] in priority_ids)
+            and (since is None or issue["updated_on"] >= since)
+            and (contains is None or contains in issue["subject"].lower())
+            and (issue_ids is None or issue["id"] in issue_ids)
+            and (status_id == "*"
+                 or (status_id == "open" and issue["status"]["id"] not in closed)
+                 or (status_id == "closed" and issue["status"]["id"] in closed)
+                 or issue["status"]["id"] in status_ids)
+        ]
+        # Priority ids follow the importance order, as with Redmine's defaults
+        if sort == "priority:desc,id":
+            selection.sort(key=lambda issue: (-issue["priority"]["id"], issue["id"]))
+        elif sort == "updated_on:desc,id":
+            selection.sort(key=lambda issue: (_descending(issue["updated_on"]), issue["id"]))
+        elif sort != "updated_on":
+            selection.sort(key=lambda issue: issue["id"])
+        app.state.selections[filters] = selection
+        return selection
+
+    @app.get("/issues.json")
+    async def issues(project_id: int = None, assigned_to_id: int = None, status_id: str = "open",
+                     priority_id: str = None, updated_on: str = None, subject: str = None, issue_id: str = None,
+                     sort: str = "id", offset: int = 0, limit: int = 25):
+        filters = (project_id, assigned_to_id, status_id, priority_id, updated_on, subject, issue_id, sort)
+        return page("issues", select_issues(filters), offset, limit)
+
+    @app.get("/search.json")
+    async def search(q: str, offset: int = 0, limit: int = 25):
+        # Issues containing every word of the query, newest first like Redmine
+        words = q.lower().split()
+        results = [
+            {"id": issue["id"], "type": "issue", "title": f"Issue #{issue['id']}: {issue['subject']}"}
+            for issue in reversed(data["issues"])
+            if all(word in f"{issue['subject']} {issue['description']}".lower() for word in words)
+        ]
+        return page("results", results, offset, limit)
+
+    @app.get("/projects.json")
+    async def projects(offset: int = 0, limit: int = 25):
+        return page("projects", data["projects"], offset, limit)
+
+    @app.get("/users.json")
+    async def users(name: str = None, offset: int = 0, limit: int = 25):
+        needle = (name or "").lower()
+        selected = [
+            user for user in data["users"]
+            if not needle or needle in (user["login"].lower(), user["firstname"].lower(), user["lastname"].lower())
+        ]
+        return page("users", selected, offset, limit)
+
+    @app.get("/users/{user_id}.json")
+    async def user(user_id: int, include: str = None):
+        found = next((u for u in data["users"] if u["id"] == user_id), None)
+        if found is None:
+            raise HTTPException(status_code=404)
+        result = dict(found)
+        if include and "memberships" in include:
+            result["memberships"] = [
+                {"project": {"id": pid, "name": projects_by_id[pid]["name"]}, "roles": [{"id": 4, "name": "Developer"}]}
+                for pid in sorted(data["memberships"].get(user_id, ()))
+            ]
+        return {"user": result}
+
+    @app.get("/projects/{project_id}/memberships.json")
+    async def memberships(project_id: int, offset: int = 0, limit: int = 25):
+        users_by_id = {u["id"]: u for u in data["users"]}
+        records = [
+            {"project": {"id": project_id, "name": projects_by_id[project_id]["name"]},
+             "user": {"id": uid, "name": f"{users_by_id[uid]['firstname']} {users_by_id[uid]['lastname']}"}}
+            for uid, pids in sorted(data["memberships"].items()) if project_id in pids
+        ]
+        return page("memberships", records, offset, limit)
+
+    @app.get("/issue_statuses.json")
+    async def issue_statuses():
+        return {"issue_statuses": [{**status, "is_closed": status["name"] == "Closed"} for status in STATUSES]}
+
+    @app.get("/enumerations/issue_priorities.json")
+    async def issue_priorities():
+        return {"issue_priorities": PRIORITIES}
+
+    return app
+
+
+@contextmanager
+def fake_redmine(data: dict = None, latency: float = 0.0):
+    """Starts the fake server and yields ``(base_url, app)``."""
+    app = create_app(data, latency)
+    with run_server(app) as url:
+        yield url, app
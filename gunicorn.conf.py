@@ -0,0 +1,24 @@
+# Production server: gunicorn managing uvicorn workers
+#   gunicorn -c gunicorn.conf.py app:app
+import multiprocessing
+import os
+
+# One worker per core; Cloud Run sets the cores per instance
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# The workers read the count they run with (src/utils/config.worker_count)
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+
+# Seconds a worker gets to finish in-flight chats and streams after SIGTERM
+graceful_timeout = int(float(os.environ.get("GRACEFUL_SHUTDOWN_SECONDS", 30)))
+# Agent turns with several tool calls can take a while
+timeout = 120
+keepalive = 5
+
+# Every worker opens its own SQLite connections and HTTP pools in the lifespan
+# handler; loading the app before forking would share them between processes
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
@@ -1,43 +1,145 @@
+import asyncio
 import os
-from typing import Annotated, Literal, TypedDict
+import time
+from functools import lru_cache, partial
+import httpx
+from typing import Literal
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage, BaseMessage, AIMessage
-from langchain_core.tools import Tool
-from langgraph.graph import StateGraph, MessagesState
-from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.memory import MemorySaver
-from src.agents.tools import get_user_name, get_projects_for_user, get_issues_for_project, get_my_assigned_issues, get_all_projects
-from langchain.callbacks.tracers import LangChainTracer
+from langchain_core.tools import StructuredTool
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import StateGraph
+from src.agents.tools import get_user_name, get_projects_for_user, get_issues_for_project, get_my_assigned_issues, get_all_projects, get_more_results, search_issues, staleness_note
+from src.agents.encoding import encode_result
+from src.agents.schemas import (
+    AssignedIssuesArgs, MoreResultsArgs, NoArgs, ProjectIssuesArgs, ProjectsForUserArgs, SearchIssuesArgs, UserNameArgs
+)
+from pydantic import ValidationError
+from openai import RateLimitError
 from src.agents.states import StatusMessagesState
-from langchain.schema import HumanMessage, SystemMessage, AIMessage
+from src.agents.scheduler import get_tool_scheduler
+from src.agents.memo import request_scope
+from src.agents.router import get_router, llm_endpoint, record_llm_usage
+from src.agents.prefetch import PREFETCH_ENABLED, is_session_start, seed_messages, warmup_calls
+from src.agents.checkpointers import create_checkpointer
+from src.agents.database import STORE
+from src.agents.prompt_assembly import assemble, conversation, prefix_fingerprint
+from src.utils.history import compact_history, get_policy
+from src.llm.resilience import get_resilient_llm, no_hedging
+from src.llm.usage import TIME_TO_FIRST_TOKEN, record_token_usage
+from src.utils.tracing import annotate, span, traced, traced_request
+from src.utils.cache import get_response_cache, is_cacheable
 
-# For LangChain Community (newer versions):
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 
-# For OpenAI-style messages:
-from openai.types.chat import ChatCompletionMessage
-from src.agents.database import MOCK_DB
-from src.agents.prompts import SYSTEM_MESSAGE
+def get_assigned_issues_for_username(username: str, **filters):
+    """get_my_assigned_issues for a username; the model knows the user by name, not ID."""
+    return get_my_assigned_issues(get_user_name(username), **filters)
 
-# Set your OpenAI API key
-os.environ["OPENAI_API_KEY"] = ""
-os.environ["LANGCHAIN_API_KEY"] = ""
-## add langsmith
-os.environ["LANGCHAIN_TRACING_V2"] = "true"
-os.environ["LANGCHAIN_PROJECT"] = "redmine"
 
+def run_tool(name: str, args: dict):
+    """Result of tool ``name`` for ``args``, validated against its schema; repeats the call behind a cursor."""
+    structured_tool = TOOLS_BY_NAME.get(name)
+    if structured_tool is None or name == "get_more_results":
+        raise ValueError(f"cursor names an unknown tool '{name}'")
+    return structured_tool.func(**structured_tool.args_schema.model_validate(args or {}).model_dump())
+
+
+# Tools exposed to the LLM; they never change, so build them once.
+# The args schemas are sent to the model and validate its arguments.
+TOOLS = [
+    StructuredTool.from_function(
+        name="get_user_name",
+        func=get_user_name,
+        args_schema=UserNameArgs,
+        description="Finds the Redmine user ID for a given username. Use this when you need to look up a user. The result is the user ID."
+    ),
+    StructuredTool.from_function(
+        name="get_projects_for_user",
+        func=get_projects_for_user,
+        args_schema=ProjectsForUserArgs,
+        description="Gets a list of project names for a given user ID. Use this to see what projects a user is involved in."
+    ),
+    StructuredTool.from_function(
+        name="get_issues_for_project",
+        func=get_issues_for_project,
+        args_schema=ProjectIssuesArgs,
+        description="Fetches issues from a specific project. Filter by statuses, priorities and subject text, sort, "
+                    "page with limit/offset, or set count_only to just count them."
+    ),
+    StructuredTool.from_function(
+        name="get_all_projects",
+        func=get_all_projects,
+        args_schema=NoArgs,
+        description="Gets a list of project names. Use this to see what projects are available."
+    ),
+    StructuredTool.from_function(
+        name="get_my_assigned_issues",
+        func=get_assigned_issues_for_username,
+        args_schema=AssignedIssuesArgs,
+        description="Gets the issues assigned to a user. Takes the same filters, sorting, paging and count_only as get_issues_for_project."
+    ),
+    StructuredTool.from_function(
+        name="search_issues",
+        func=search_issues,
+        args_schema=SearchIssuesArgs,
+        description="Finds issues by what they are about, searching subjects and descriptions (e.g. 'the iOS crash'). "
+                    "Use this instead of listing every project's issues when looking for a specific issue."
+    ),
+    StructuredTool.from_function(
+        name="get_more_results",
+        func=partial(get_more_results, run=run_tool),
+        args_schema=MoreResultsArgs,
+        description="Gets the next rows of a long tool result. Pass the cursor given at the end of that result."
+    )
+]
+TOOLS_BY_NAME = {tool.name: tool for tool in TOOLS}
+
+
+# Identifies the static prompt prefix; it only changes when the system prompt or the tools do
+PROMPT_PREFIX = prefix_fingerprint(TOOLS)
+
+# Connection pool limits shared by every LLM call in this process
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", 20))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("LLM_MAX_KEEPALIVE_CONNECTIONS", 10))
+
+
+@lru_cache(maxsize=1)
+def _http_clients():
+    """Pooled HTTP clients shared by the chat models of every model name."""
+    limits = httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS
+    )
+    return httpx.Client(limits=limits), httpx.AsyncClient(limits=limits)
 
-def chatbot(state: StatusMessagesState):
-    """Main chatbot node that processes user input and decides whether to use tools."""
-    print("🤖 Chatbot node: Processing messages...")
 
-    # Initialize the LLM
+def _build_llm_with_tools(model: str = None):
+    """Creates the chat model with a pooled HTTP client and binds the tools to it."""
+    policy = get_resilient_llm("agent")
+    http_client, http_async_client = _http_clients()
     llm = ChatOpenAI(
-        model="gpt-4.1",  # Using a more stable model
+        model=model or policy.model,
         temperature=0,
-        max_tokens=1000
+        max_tokens=1000,
+        # Timeouts and retries are handled by the resilience policy
+        timeout=policy.timeout,
+        max_retries=0,
+        # Token usage of streamed replies too, for the per-route cost
+        stream_usage=True,
+        http_client=http_client,
+        http_async_client=http_async_client
     )
+    return llm.bind_tools(TOOLS)
+
+
+@lru_cache(maxsize=None)
+def get_llm_with_tools(model: str = None):
+    """Returns the process-wide LLM with tools bound for ``model``, building it on first use."""
+    return _build_llm_with_tools(model)
+
 
+def _prepare_messages(state: StatusMessagesState) -> list[BaseMessage]:
+    """Returns the prompt for the state: the static system prompt, the user context, then the conversation."""
     # Get user string from state or use default
     user_str = "default_user"
     try:
@@ -45,56 +147,45 @@ def chatbot(state: StatusMessagesState):
             user_str = state["user"]
     except Exception as e:
         print(f"Error accessing user from state: {e}")
-        
-    # Clean up the messages to ensure proper structure
-    # We need to make sure tool messages are always preceded by messages with tool_calls
-    messages = state["messages"]
 
-    # Create tools
-    tools = [
-        Tool(
-            name="get_user_name", 
-            func=get_user_name, 
-            description="Finds the Redmine user ID for a given username. Use this when you need to look up a user. The result is the user ID."
-        ),
-        Tool(
-            name="get_projects_for_user", 
-            func=get_projects_for_user, 
-            description="Gets a list of project names for a given user ID. Use this to see what projects a user is involved in."
-        ),
-        Tool(
-            name="get_issues_for_project", 
-            func=get_issues_for_project, 
-            description="Fetches issues from a specific project. Can optionally filter by status (Open, In Progress, Closed) and/or priority (Low, Normal, High, Critical)."
-        ),
-        Tool(
-            name="get_all_projects", 
-            func=get_all_projects, 
-            description="Gets a list of project names. Use this to see what projects are available."
-        ),
-        Tool(
-            name="get_my_assigned_issues", 
-            func=get_my_assigned_issues, 
-            description="Gets all issues assigned to a specific user. Can optionally filter by status."
-        )
-    ]
+    print(f"Prompt for user {user_str}, prefix {PROMPT_PREFIX}")
+    return assemble(state["messages"], user_str)
 
-    # Bind tools to the LLM
-    llm_with_tools = llm.bind_tools(tools)
 
-    # Define the system message with user name
-    system_message_content = SYSTEM_MESSAGE.replace("USER_NAME", user_str)
+@traced("node", "chatbot")
+def chatbot(state: StatusMessagesState):
+    """Main chatbot node that processes user input and decides whether to use tools."""
+    print("🤖 Chatbot node: Processing messages...")
 
-    print(f"System message content: {system_message_content}")
-    # Add system message if not present
-    messages = state["messages"]
-    if not any(isinstance(msg, SystemMessage) for msg in messages):
-        messages = [SystemMessage(content=system_message_content)] + messages
+    # Only the prompt is compacted; the state keeps the full history
+    prompt = compact_history(_prepare_messages(state), get_policy("agent"))
     
-    # Get response from LLM
-    print(f"Messages: {messages}")
-    response = llm_with_tools.invoke(messages)
-    return {"messages": messages + [response]}
+    # Get response from the shared LLM with the tools already bound, retried on transient errors;
+    # the router may have picked the small model for this request
+    print(f"Messages: {len(prompt)} in the prompt")
+    endpoint = llm_endpoint()
+    with span("llm", endpoint) as llm_span:
+        response = get_resilient_llm(endpoint).call(lambda model: get_llm_with_tools(model).invoke(prompt))
+        llm_span.set(**(record_token_usage(endpoint, response) or {}))
+    record_llm_usage(response)
+    # The system prompt is assembled for every call; the reducer appends the reply to the conversation
+    return {"messages": [response]}
+
+
+@traced("node", "chatbot")
+async def achatbot(state: StatusMessagesState):
+    """Async chatbot node used by ainvoke; awaits the LLM instead of blocking a thread."""
+    print("🤖 Chatbot node: Processing messages...")
+
+    prompt = compact_history(_prepare_messages(state), get_policy("agent"))
+
+    print(f"Messages: {len(prompt)} in the prompt")
+    endpoint = llm_endpoint()
+    with span("llm", endpoint) as llm_span:
+        response = await get_resilient_llm(endpoint).acall(lambda model: get_llm_with_tools(model).ainvoke(prompt))
+        llm_span.set(**(record_token_usage(endpoint, response) or {}))
+    record_llm_usage(response)
+    return {"messages": [response]}
 
 
 def should_continue(state: StatusMessagesState) -> Literal["tools", "__end__"]:
@@ -109,58 +200,100 @@ def should_continue(state: StatusMessagesState) -> Literal["tools", "__end__"]:
     print("✅ Conversation complete")
     return "__end__"
 
-def node_tools(state: StatusMessagesState):
-    """Calls the tool based on the last message's tool call."""
+def execute_tool_call(tool) -> ToolMessage:
+    """Runs a single tool call from an AI message and wraps the result in a ToolMessage."""
+    tool_call_id = tool['id']  # Get the tool call ID
+    print(f"Processing tool call: {tool['name']}")
     
-    messages = state["messages"]
-    last_message = messages[-1]
+    # Every tool call needs an answer, otherwise the next LLM request is rejected
+    structured_tool = TOOLS_BY_NAME.get(tool['name'])
+    # Names made up by the model share one label
+    with span("tool", tool['name'] if structured_tool is not None else "unknown") as tool_span:
+        if structured_tool is None:
+            tool_span.set(outcome="unknown_tool")
+            return ToolMessage(content=f"Error: unknown tool '{tool['name']}'", tool_call_id=tool_call_id, status="error")
+        
+        # Validate the arguments against the tool's schema; mistakes go back to the model
+        try:
+            validated = structured_tool.args_schema.model_validate(tool['args'] or {})
+            result = structured_tool.func(**validated.model_dump())
+        except (ValidationError, ValueError) as e:
+            print(f"❌ Invalid arguments for {tool['name']}: {e}")
+            tool_span.set(outcome="invalid_arguments")
+            return ToolMessage(content=f"Error: invalid arguments for {tool['name']}: {e}", tool_call_id=tool_call_id, status="error")
+        
+        # get_more_results already returns an encoded page; a cursor repeats the call, so it only needs the arguments given
+        content = result if tool['name'] == "get_more_results" else encode_result(
+            tool['name'], result, args=validated.model_dump(exclude_defaults=True)
+        )
+    return ToolMessage(content=content, tool_call_id=tool_call_id)
+
+
+def with_staleness_note(tool_messages: list[ToolMessage]) -> list[ToolMessage]:
+    """Tells the model when the tool results come from an out-of-date replica."""
+    note = staleness_note()
+    if not note:
+        return tool_messages
+    return [msg.model_copy(update={"content": f"{msg.content}{note}"}) for msg in tool_messages]
+
+
+@traced("node", "node_tools")
+def node_tools(state: StatusMessagesState):
+    """Runs the tool calls of the last message concurrently and appends their results."""
     
-    # Keep track of all previous messages
-    previous_messages = messages[:-1]  # All messages except the last one with tool calls
+    last_message = state["messages"][-1]
     
     print(f"Processing {len(last_message.tool_calls)} tool calls")
     
-    # Create a list to store all tool messages
-    tool_messages = []
+    # Run all tool calls on the shared scheduler; results keep the tool call order
+    tool_messages = with_staleness_note(get_tool_scheduler().run(last_message.tool_calls, execute_tool_call))
     
-    # Process all tool calls
-    for tool in last_message.tool_calls:
-        tool_call_id = tool['id']  # Get the tool call ID
-        print(f"Processing tool call: {tool['name']}")
-        
-        if tool['name'] == "get_user_name":
-            username = tool['args']['__arg1']
-            user_id = get_user_name(username)
-            tool_messages.append(ToolMessage(content=str(user_id), tool_call_id=tool_call_id))
-            
-        elif tool['name'] == "get_projects_for_user":
-            user_id = tool['args']['__arg1']
-            result = get_projects_for_user(user_id)
-            tool_messages.append(ToolMessage(content=str(result), tool_call_id=tool_call_id))
-            
-        elif tool['name'] == "get_issues_for_project":
-            project_name = tool['args']['__arg1']
-            status = tool['args'].get("status")
-            priority = tool['args'].get("priority")
-            result = get_issues_for_project(project_name, status, priority)
-            tool_messages.append(ToolMessage(content=str(result), tool_call_id=tool_call_id))
-            
-        elif tool['name'] == "get_my_assigned_issues":
-            username = tool['args']['__arg1']
-            user_id = get_user_name(username)
-            status = tool['args'].get("status")
-            result = get_my_assigned_issues(user_id, status)
-            tool_messages.append(ToolMessage(content=str(result), tool_call_id=tool_call_id))
-            
-        elif tool['name'] == "get_all_projects":
-            result = get_all_projects()
-            tool_messages.append(ToolMessage(content=str(result), tool_call_id=tool_call_id))
+    # Only the results: the reducer appends them after the message with the tool calls
+    return {"messages": tool_messages}
+
+
+@traced("node", "node_tools")
+async def anode_tools(state: StatusMessagesState):
+    """Async version of node_tools; cancelling the run cancels tool calls not yet started."""
     
-    # Return all messages: previous messages + last message with tool calls + all tool messages
-    return {
-        "messages": previous_messages + [last_message] + tool_messages,
-        "user": state.get("user", "default_user")
-    }
+    last_message = state["messages"][-1]
+    
+    print(f"Processing {len(last_message.tool_calls)} tool calls")
+    
+    tool_messages = with_staleness_note(await get_tool_scheduler().arun(last_message.tool_calls, execute_tool_call))
+    
+    return {"messages": tool_messages}
+
+def _warm_session(messages: list[BaseMessage], user_str: str) -> list[BaseMessage]:
+    """On the first turn of a session, pre-seeds the user's id, projects and assigned issues.
+
+    Almost every session starts with these lookups; running them in parallel before
+    the first LLM call saves the model one or two tool-calling iterations.
+    """
+    if not PREFETCH_ENABLED or not is_session_start(messages):
+        return messages
+    try:
+        calls = warmup_calls(user_str)
+        tool_messages = with_staleness_note(get_tool_scheduler().run(calls, execute_tool_call)) if calls else []
+    except Exception as e:
+        print(f"⚠️ Session warmup failed: {e}")
+        return messages
+    print(f"🔥 Session warmed up with {len(tool_messages)} tool results")
+    return seed_messages(messages, calls, tool_messages)
+
+
+async def _awarm_session(messages: list[BaseMessage], user_str: str) -> list[BaseMessage]:
+    if not PREFETCH_ENABLED or not is_session_start(messages):
+        return messages
+    try:
+        calls = await asyncio.to_thread(warmup_calls, user_str)
+        tool_messages = with_staleness_note(await get_tool_scheduler().arun(calls, execute_tool_call)) if calls else []
+    except Exception as e:
+        print(f"⚠️ Session warmup failed: {e}")
+        return messages
+    print(f"🔥 Session warmed up with {len(tool_messages)} tool results")
+    return seed_messages(messages, calls, tool_messages)
+
 
 def build_graph():
     
@@ -168,8 +301,8 @@ def build_graph():
     workflow = StateGraph(StatusMessagesState)
 
     # Add nodes
-    workflow.add_node("chatbot", chatbot)
-    workflow.add_node("node_tools", node_tools)
+    workflow.add_node("chatbot", RunnableLambda(chatbot, afunc=achatbot))
+    workflow.add_node("node_tools", RunnableLambda(node_tools, afunc=anode_tools))
 
     # Set entry point
     workflow.set_entry_point("chatbot")
@@ -184,30 +317,25 @@ def build_graph():
     # After tools, always go back to chatbot
     workflow.add_edge("node_tools", "chatbot")
 
-    # Add memory for conversation history
-    memory = MemorySaver()
+    # Add memory for conversation history (backend chosen by CHECKPOINT_BACKEND)
+    memory = create_checkpointer()
 
     # Compile the graph
     app = workflow.compile(checkpointer=memory)
     return app
 
-def call_agent(
-    message: str,
-    session_id: str,
-    user_str: str,
-    chat_history: list[BaseMessage] = []
-):
-    app = build_graph()
-    tracer = LangChainTracer()
-    thread = {
-        "configurable": {
-            "thread_id": session_id,
-        }
-    }
-    
-    thread["callbacks"] = [tracer]
-    thread["tracing_v2_enabled"] = True
-    
+
+@lru_cache(maxsize=1)
+def get_graph():
+    """Returns the process-wide compiled graph.
+
+    The graph and its checkpointer are shared across calls, so the checkpointed
+    state of each thread_id survives between turns.
+    """
+    return build_graph()
+
+def _history_to_messages(message: str, chat_history: list) -> list[BaseMessage]:
+    """Converts the client-side chat history plus the new message into LangChain messages."""
     # Process the chat history to ensure proper structure
     messages = []
     tool_call_message = None  # Track the last message with tool_calls
@@ -237,55 +365,329 @@ def call_agent(
     
     # Add the current user message
     messages.append(HumanMessage(content=message))
+    return messages
+
+
+def _resume_messages(snapshot, message: str, chat_history: list):
+    """Returns the checkpointed messages plus the new message, or None if there is nothing usable."""
+    stored = snapshot.values.get("messages") if snapshot else None
+    if not stored:
+        return None
+    # A run that died between a tool call and its results cannot be resumed as is
+    if getattr(stored[-1], "tool_calls", None):
+        return None
+    if not _in_step(stored, chat_history):
+        print(f"⚠️ Checkpoint with {len(stored)} messages is behind the client's history, using the history")
+        return None
+    print(f"♻️ Resuming thread from checkpoint with {len(stored)} messages")
+    return stored + [HumanMessage(content=message)]
+
+
+def _in_step(stored: list[BaseMessage], chat_history: list) -> bool:
+    """Whether the checkpoint ends with the questions of the client's history.
+
+    The client may send only its latest turns, but a checkpoint written by
+    another worker or before a turn that failed to save lacks the newest ones.
+    Only as many stored messages are read as it takes to find those questions.
+    """
+    questions = [msg["content"].strip() for msg in chat_history if msg.get("role") == "user"]
+    if not questions:
+        return True
+    index = len(questions) - 1
+    for msg in reversed(stored):
+        if isinstance(msg, HumanMessage):
+            if msg.content.strip() != questions[index]:
+                return False
+            index -= 1
+            if index < 0:
+                return True
+    return False
+
+
+def _initial_messages(app, thread: dict, message: str, chat_history: list) -> tuple[list[BaseMessage], int]:
+    """Returns the conversation with the new message and how many of its messages the thread already holds.
+
+    Prefers the checkpointed state of the thread while it has every turn of the
+    client's history; otherwise the client history replaces what the thread holds.
+    """
+    snapshot = app.get_state(thread)
+    resumed = _resume_messages(snapshot, message, chat_history)
+    if resumed is None and snapshot and snapshot.values.get("messages"):
+        app.checkpointer.delete_thread(thread["configurable"]["thread_id"])
+    return _start_messages(resumed, message, chat_history)
+
+
+async def _ainitial_messages(app, thread: dict, message: str, chat_history: list) -> tuple[list[BaseMessage], int]:
+    snapshot = await app.aget_state(thread)
+    resumed = _resume_messages(snapshot, message, chat_history)
+    if resumed is None and snapshot and snapshot.values.get("messages"):
+        await app.checkpointer.adelete_thread(thread["configurable"]["thread_id"])
+    return _start_messages(resumed, message, chat_history)
+
+
+def _start_messages(resumed, message: str, chat_history: list) -> tuple[list[BaseMessage], int]:
+    if resumed is not None:
+        return resumed, len(resumed) - 1
+    # The thread is new or unusable; the client's history goes into it along with the message
+    return _history_to_messages(message, chat_history), 0
+
+
+def _new_messages(messages: list[BaseMessage], stored: int) -> list[BaseMessage]:
+    """What a turn appends to the thread: the messages after the checkpointed ones, without agent prompts."""
+    return conversation(messages[stored:])
+
+
+def _cache_lookup(messages: list[BaseMessage], message: str, user_str: str):
+    """Returns (cache, data_version, cached answer) for an opening question; cache is None otherwise."""
+    cache = get_response_cache()
+    # Follow-up questions depend on earlier turns, so only opening questions are cached
+    if cache is None or not is_cacheable(messages[:-1]):
+        return None, None, None
+    data_version = STORE.version
+    return cache, data_version, cache.get(message, user_str, data_version, scope="agent")
+
+
+def _cached_state(messages: list[BaseMessage], stored: int, user_str: str, answer: str) -> dict:
+    """State update that records a cached answer in the thread as if the chatbot had produced it."""
+    return {"messages": _new_messages(messages, stored) + [AIMessage(content=answer)], "user": user_str}
+
+
+def _store_answer(cache, data_version, message: str, user_str: str, reply: dict):
+    # Only final answers are cached, never errors or runs stopped on a tool call
+    if cache is None or reply.get("tool_calls") or not reply.get("message"):
+        return
+    cache.put(message, reply["message"], user_str, data_version, scope="agent")
+
+
+def _agent_config(session_id: str) -> dict:
+    # LangSmith stays opt-in: LangChain traces there by itself when LANGCHAIN_TRACING_V2 is set
+    return {
+        "configurable": {
+            "thread_id": session_id,
+        }
+    }
+
+
+def _format_result(result) -> dict:
+    """Extracts the reply (and any trailing tool calls/results) from the final graph state."""
+    print(f"📋 Final result has {len(result['messages'])} messages")
     
-    # Create initial state with messages and user
+    # Find the last AI message and check if it has tool calls
+    for msg in reversed(result["messages"]):
+        if isinstance(msg, AIMessage):
+            if hasattr(msg, 'tool_calls') and msg.tool_calls:
+                # Return both the message content and tool calls
+                tool_results = []
+                
+                # Look for any tool messages that followed this message
+                tool_call_ids = [tc['id'] for tc in msg.tool_calls]
+                for potential_tool_msg in result["messages"]:
+                    if isinstance(potential_tool_msg, ToolMessage) and hasattr(potential_tool_msg, 'tool_call_id'):
+                        if potential_tool_msg.tool_call_id in tool_call_ids:
+                            tool_results.append({
+                                'content': potential_tool_msg.content,
+                                'tool_call_id': potential_tool_msg.tool_call_id
+                            })
+                
+                return {
+                    'message': msg.content,
+                    'tool_calls': msg.tool_calls,
+                    'tool_results': tool_results
+                }
+            else:
+                # Simple message without tool calls
+                return {'message': msg.content}
+    
+    # If no suitable AI message found, return the last message content
+    if result["messages"]:
+        last_message = result["messages"][-1]
+        if hasattr(last_message, 'content') and last_message.content:
+            return {'message': last_message.content}
+
+    return {'message': 'No hay respuesta disponible'}
+
+
+@traced_request("agent")
+def call_agent(
+    message: str,
+    session_id: str,
+    user_str: str,
+    chat_history: list[BaseMessage] = [],
+    graph=None
+):
+    # The API passes the graph it compiled at startup
+    app = graph if graph is not None else get_graph()
+    thread = _agent_config(session_id)
+    annotate(session_id=session_id, user=user_str)
+    messages, stored = _initial_messages(app, thread, message, chat_history)
+    
+    cache, data_version, cached = _cache_lookup(messages, message, user_str)
+    if cached is not None:
+        print("⚡ Answer served from the response cache")
+        annotate(route="cache")
+        app.update_state(thread, _cached_state(messages, stored, user_str, cached), as_node="chatbot")
+        return {"message": cached}
+    
+    # Greetings and simple lookups are answered without the model
+    routed = get_router().route(message, user_str)
+    annotate(route=routed.route)
+    if routed.reply is not None:
+        app.update_state(thread, _cached_state(messages, stored, user_str, routed.reply), as_node="chatbot")
+        routed.finish()
+        return {"message": routed.reply}
+    
+    messages = _warm_session(messages, user_str)
+    
+    # The thread already holds the checkpointed messages; the run appends the rest
     initial_state = StatusMessagesState(
-        messages=messages,
+        messages=_new_messages(messages, stored),
         user=user_str
     )
     
     try:
         print(f"🚀 Starting conversation with {len(messages)} messages")
-        result = app.invoke(initial_state, config=thread)
-        print(f"📋 Final result has {len(result['messages'])} messages")
-        
-        # Find the last AI message and check if it has tool calls
-        for msg in reversed(result["messages"]):
-            if isinstance(msg, AIMessage):
-                if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                    # Return both the message content and tool calls
-                    tool_results = []
-                    
-                    # Look for any tool messages that followed this message
-                    tool_call_ids = [tc['id'] for tc in msg.tool_calls]
-                    for potential_tool_msg in result["messages"]:
-                        if isinstance(potential_tool_msg, ToolMessage) and hasattr(potential_tool_msg, 'tool_call_id'):
-                            if potential_tool_msg.tool_call_id in tool_call_ids:
-                                tool_results.append({
-                                    'content': potential_tool_msg.content,
-                                    'tool_call_id': potential_tool_msg.tool_call_id
-                                })
-                    
-                    return {
-                        'message': msg.content,
-                        'tool_calls': msg.tool_calls,
-                        'tool_results': tool_results
-                    }
-                else:
-                    # Simple message without tool calls
-                    return {'message': msg.content}
-        
-        # If no suitable AI message found, return the last message content
-        if result["messages"]:
-            last_message = result["messages"][-1]
-            if hasattr(last_message, 'content') and last_message.content:
-                return {'message': last_message.content}
-                
+        # Identical tool calls within this run are executed only once
+        with request_scope(), routed.scope():
+            result = app.invoke(initial_state, config=thread)
+        reply = _format_result(result)
+        _store_answer(cache, data_version, message, user_str, reply)
+        return reply
     except Exception as e:
         print(f"❌ Error invoking app: {e}")
         return {"message": f"Error: {str(e)}"}
+    finally:
+        routed.finish()
+
+
+@traced_request("agent")
+async def acall_agent(
+    message: str,
+    session_id: str,
+    user_str: str,
+    chat_history: list[BaseMessage] = [],
+    graph=None
+):
+    """Async version of call_agent for use inside the FastAPI event loop."""
+    app = graph if graph is not None else get_graph()
+    thread = _agent_config(session_id)
+    annotate(session_id=session_id, user=user_str)
+    messages, stored = await _ainitial_messages(app, thread, message, chat_history)
     
-    return {'message': 'No hay respuesta disponible'}
+    cache, data_version, cached = _cache_lookup(messages, message, user_str)
+    if cached is not None:
+        print("⚡ Answer served from the response cache")
+        annotate(route="cache")
+        await app.aupdate_state(thread, _cached_state(messages, stored, user_str, cached), as_node="chatbot")
+        return {"message": cached}
+    
+    routed = get_router().route(message, user_str)
+    annotate(route=routed.route)
+    if routed.reply is not None:
+        await app.aupdate_state(thread, _cached_state(messages, stored, user_str, routed.reply), as_node="chatbot")
+        routed.finish()
+        return {"message": routed.reply}
+    
+    messages = await _awarm_session(messages, user_str)
+    
+    initial_state = StatusMessagesState(
+        messages=_new_messages(messages, stored),
+        user=user_str
+    )
+    
+    try:
+        print(f"🚀 Starting conversation with {len(messages)} messages")
+        with request_scope(), routed.scope():
+            result = await app.ainvoke(initial_state, config=thread)
+        reply = _format_result(result)
+        _store_answer(cache, data_version, message, user_str, reply)
+        return reply
+    except RateLimitError:
+        # The API answers 503 with Retry-After instead of an error message
+        raise
+    except Exception as e:
+        print(f"❌ Error invoking app: {e}")
+        return {"message": f"Error: {str(e)}"}
+    finally:
+        routed.finish()
+
+
+@traced_request("agent")
+async def astream_agent(
+    message: str,
+    session_id: str,
+    user_str: str,
+    chat_history: list[BaseMessage] = [],
+    graph=None
+):
+    """Runs the agent and yields its progress as ``(event, data)`` pairs.
+
+    Events are ``token`` (a piece of the reply), ``tool_start`` / ``tool_end`` around
+    each tool call, and a final ``end`` carrying the same payload as call_agent.
+    """
+    app = graph if graph is not None else get_graph()
+    thread = _agent_config(session_id)
+    annotate(session_id=session_id, user=user_str)
+    messages, stored = await _ainitial_messages(app, thread, message, chat_history)
+    
+    cache, data_version, cached = _cache_lookup(messages, message, user_str)
+    if cached is not None:
+        print("⚡ Answer served from the response cache")
+        annotate(route="cache")
+        await app.aupdate_state(thread, _cached_state(messages, stored, user_str, cached), as_node="chatbot")
+        yield "token", {"content": cached}
+        yield "end", {"message": cached}
+        return
+    
+    routed = get_router().route(message, user_str)
+    annotate(route=routed.route)
+    if routed.reply is not None:
+        await app.aupdate_state(thread, _cached_state(messages, stored, user_str, routed.reply), as_node="chatbot")
+        routed.finish()
+        yield "token", {"content": routed.reply}
+        yield "end", {"message": routed.reply}
+        return
     
+    messages = await _awarm_session(messages, user_str)
+    
+    initial_state = StatusMessagesState(
+        messages=_new_messages(messages, stored),
+        user=user_str
+    )
+    
+    pending_tool_calls = {}
+    started = time.perf_counter()
+    first_token = True
+    print(f"🚀 Streaming conversation with {len(messages)} messages")
+    # A hedged duplicate LLM request would stream its tokens as well
+    try:
+        with request_scope(), no_hedging(), routed.scope():
+            async for event in app.astream_events(initial_state, config=thread, version="v2"):
+                kind = event["event"]
+                node = event.get("metadata", {}).get("langgraph_node")
+
+                if kind == "on_chat_model_stream":
+                    chunk = event["data"]["chunk"]
+                    if chunk.content:
+                        if first_token:
+                            first_token = False
+                            TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - started, endpoint=routed.llm_endpoint)
+                        yield "token", {"content": chunk.content}
+
+                elif kind == "on_chat_model_end":
+                    # The tool calls requested by the model are about to run in node_tools
+                    for tool_call in getattr(event["data"]["output"], "tool_calls", None) or []:
+                        pending_tool_calls[tool_call["id"]] = tool_call["name"]
+                        yield "tool_start", {"id": tool_call["id"], "name": tool_call["name"], "args": tool_call["args"]}
+
+                elif kind == "on_chain_end" and node == "node_tools" and event["name"] == "node_tools":
+                    for msg in event["data"]["output"].get("messages", []):
+                        if isinstance(msg, ToolMessage) and msg.tool_call_id in pending_tool_calls:
+                            name = pending_tool_calls.pop(msg.tool_call_id)
+                            yield "tool_end", {"id": msg.tool_call_id, "name": name, "content": msg.content}
 
-    
\ No newline at end of file
+                elif kind == "on_chain_end" and node is None and event["name"] == "LangGraph":
+                    reply = _format_result(event["data"]["output"])
+                    _store_answer(cache, data_version, message, user_str, reply)
+                    yield "end", reply
+    finally:
+        routed.finish()
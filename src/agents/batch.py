@@ -0,0 +1,305 @@
+import asyncio
+import contextvars
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+
+from langchain_core.messages import AIMessage, convert_to_messages, convert_to_openai_messages
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from openai import RateLimitError
+
+from src.agents.agent import (
+    TOOLS, _history_to_messages, _initial_messages, _new_messages, _warm_session, acall_agent, call_agent,
+    execute_tool_call, with_staleness_note
+)
+from src.agents.memo import request_scope
+from src.agents.prompt_assembly import assemble
+from src.agents.router import get_router
+from src.agents.scheduler import get_tool_scheduler
+from src.llm.openai import build_messages
+from src.llm.resilience import get_resilient_llm
+from src.utils.history import compact_history, get_policy
+from src.utils.metrics import REGISTRY
+
+BATCH_ITEMS = REGISTRY.counter("batch_items_total", "Batch items by mode and outcome (ok, error)", ("mode", "outcome"))
+
+# Items of one batch running at the same time; the admission controller still applies to each of them
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", 4))
+# Times an item is tried again after an admission rejection or an OpenAI 429
+BATCH_MAX_RETRIES = int(os.environ.get("BATCH_MAX_RETRIES", 3))
+# Provider batches one agent item may take: each round answers the tool calls of the previous one
+BATCH_MAX_ROUNDS = int(os.environ.get("BATCH_MAX_ROUNDS", 3))
+
+
+async def _admit(admission, item: dict):
+    """An admission ticket for one item, or a no-op without a controller."""
+    if admission is None:
+        return nullcontext()
+    from src.utils.admission import estimate_chat_cost
+    llm_calls, tokens = estimate_chat_cost(item["query"], item.get("conversation_history"), agent=bool(item.get("user")))
+    return await admission.acquire(item.get("user") or item.get("session_id"), llm_calls, tokens)
+
+
+async def _arun_item(item: dict, llm=None, graph=None, admission=None) -> dict:
+    """Answers one item like /chat would; waits and retries when the server or OpenAI is overloaded."""
+    from src.utils.admission import AdmissionRejected, upstream_retry_after
+    for attempt in range(BATCH_MAX_RETRIES + 1):
+        try:
+            async with await _admit(admission, item):
+                if item.get("user"):
+                    result = await acall_agent(
+                        item["query"],
+                        item.get("session_id") or str(uuid.uuid4()),
+                        item["user"],
+                        item.get("conversation_history") or [],
+                        graph=graph
+                    )
+                    response = result["message"]
+                else:
+                    response = await llm.get_assistant_response(item["query"], item.get("conversation_history"))
+            BATCH_ITEMS.inc(mode="concurrent", outcome="ok")
+            return {"id": item["id"], "response": response}
+        except AdmissionRejected as e:
+            error, retry_after = e, e.retry_after
+        except RateLimitError as e:
+            error, retry_after = e, upstream_retry_after(e)
+            if admission is not None:
+                admission.upstream_limited(retry_after)
+        except Exception as e:
+            print(f"❌ Batch item {item['id']} failed: {e}")
+            BATCH_ITEMS.inc(mode="concurrent", outcome="error")
+            return {"id": item["id"], "error": str(e)}
+        if attempt < BATCH_MAX_RETRIES:
+            print(f"⏳ Batch item {item['id']} held back, retrying in {retry_after}s")
+            await asyncio.sleep(retry_after)
+    BATCH_ITEMS.inc(mode="concurrent", outcome="error")
+    return {"id": item["id"], "error": str(error)}
+
+
+async def astream_batch(items: list[dict], llm=None, graph=None, concurrency: int = None, admission=None):
+    """Answers the items with a pool of ``concurrency`` workers and yields each result as it finishes.
+
+    Items are ``{"id", "query", "user", "session_id", "conversation_history"}``
+    like the /chat requests; results are ``{"id", "response"}`` or ``{"id", "error"}``.
+    All runs share one tool memo, so the lookups the items have in common
+    (the same user, the same projects) are only made once.
+    """
+    concurrency = max(1, min(concurrency or BATCH_MAX_CONCURRENCY, len(items)))
+    results = asyncio.Queue()
+    pending = iter(items)
+
+    async def worker():
+        # The workers take the next item from the shared iterator as soon as they are free
+        for item in pending:
+            await results.put(await _arun_item(item, llm, graph, admission))
+
+    print(f"📦 Running a batch of {len(items)} items, {concurrency} at a time")
+    with request_scope():
+        # Tasks copy the context, so every worker sees the batch's memo
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for _ in items:
+                yield await results.get()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+
+def run_batch(items: list[dict], concurrency: int = None):
+    """Sync version of astream_batch for scripts and offline jobs; yields results as they finish."""
+    from src.llm.openai import OpenAI
+    llm = OpenAI() if any(not item.get("user") for item in items) else None
+
+    def run_item(item):
+        try:
+            if item.get("user"):
+                result = call_agent(
+                    item["query"],
+                    item.get("session_id") or str(uuid.uuid4()),
+                    item["user"],
+                    item.get("conversation_history") or []
+                )
+                response = result["message"]
+            else:
+                response = llm.get_assistant_response(item["query"], item.get("conversation_history"))
+        except Exception as e:
+            print(f"❌ Batch item {item['id']} failed: {e}")
+            BATCH_ITEMS.inc(mode="concurrent", outcome="error")
+            return {"id": item["id"], "error": str(e)}
+        BATCH_ITEMS.inc(mode="concurrent", outcome="ok")
+        return {"id": item["id"], "response": response}
+
+    with request_scope(), ThreadPoolExecutor(max_workers=concurrency or BATCH_MAX_CONCURRENCY) as executor:
+        # One context copy per item (a context cannot run in two threads); each carries the batch's memo
+        futures = [executor.submit(contextvars.copy_context().run, run_item, item) for item in items]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _agent_request(messages: list, user: str, final: bool) -> dict:
+    """Chat completion body of one agent step; the last round may not call tools any more."""
+    prompt = compact_history(assemble(messages, user), get_policy("agent"))
+    return {
+        "model": get_resilient_llm("agent").model,
+        "messages": convert_to_openai_messages(prompt),
+        "tools": [convert_to_openai_tool(tool) for tool in TOOLS],
+        "tool_choice": "none" if final else "auto",
+        "temperature": 0,
+        "max_tokens": 1000,
+    }
+
+
+def _chat_request(item: dict) -> dict:
+    return {
+        "model": get_resilient_llm("chat").model,
+        "messages": build_messages(item["query"], item.get("conversation_history")),
+        "temperature": 0.7,
+        "max_tokens": 500,
+    }
+
+
+def _thread(graph, item: dict):
+    """Checkpoint config of the item's conversation, or None when it is not kept."""
+    if graph is None or not item.get("session_id"):
+        return None
+    return {"configurable": {"thread_id": item["session_id"]}}
+
+
+def _start_agent_item(graph, item: dict):
+    """Routes an agent item; returns (reply, None, 0) when no LLM is needed, else (None, messages, stored).
+
+    ``stored`` is the number of messages the item's thread already holds, like in call_agent.
+    """
+    routed = get_router().route(item["query"], item["user"])
+    routed.finish()
+    if routed.reply is not None:
+        return routed.reply, None, 0
+    thread = _thread(graph, item)
+    if thread is not None:
+        messages, stored = _initial_messages(graph, thread, item["query"], item.get("conversation_history") or [])
+    else:
+        messages, stored = _history_to_messages(item["query"], item.get("conversation_history") or []), 0
+    return None, _warm_session(messages, item["user"]), stored
+
+
+def _run_tools(message: AIMessage) -> list:
+    return with_staleness_note(get_tool_scheduler().run(message.tool_calls, execute_tool_call))
+
+
+async def _save_thread(graph, item: dict, messages: list, stored: int):
+    """Appends the item's turn to its thread, as if the graph had run it."""
+    thread = _thread(graph, item)
+    if thread is not None:
+        await graph.aupdate_state(thread, {"messages": _new_messages(messages, stored), "user": item["user"]},
+                                  as_node="chatbot")
+
+
+def _progress(batch, total: int, **fields) -> dict:
+    """Progress line of a provider batch; ``fields`` go after the batch id (e.g. the round)."""
+    counts = batch.request_counts
+    return {"batch": batch.id, **fields, "status": batch.status,
+            "completed": counts.completed if counts else 0, "total": counts.total if counts else total}
+
+
+async def astream_provider_batch(items: list[dict], graph=None, provider=None, max_rounds: int = None):
+    """Answers the items through the provider's Batch API; yields progress and then each result.
+
+    Plain chats take one completion. Agent items are first routed and warmed up
+    locally (the session prefetch usually holds what the model needs), then each
+    round submits one batch with the step of every open item; tool calls are run
+    here and answered in the next round, and the last round may not call tools.
+    Progress lines are ``{"batch", "round", "status", "completed", "total"}``; the
+    first line says the first round was submitted, so a client that loses the
+    stream can still fetch that round's results with astream_batch_results.
+    """
+    from src.llm.batch import OpenAIBatch
+    provider = provider or OpenAIBatch.from_env()
+    max_rounds = max_rounds or BATCH_MAX_ROUNDS
+    states = {}  # id -> conversation so far, for the agent items still open
+    stored = {}  # id -> messages of the conversation its thread already holds
+    requests = {}
+    ready = []  # Answered locally; sent after the batch id
+    try:
+        with request_scope():
+            for item in items:
+                if not item.get("user"):
+                    requests[item["id"]] = _chat_request(item)
+                    continue
+                reply, messages, stored[item["id"]] = await asyncio.to_thread(_start_agent_item, graph, item)
+                if reply is not None:
+                    BATCH_ITEMS.inc(mode="provider", outcome="ok")
+                    ready.append({"id": item["id"], "response": reply})
+                    continue
+                states[item["id"]] = messages
+                requests[item["id"]] = _agent_request(messages, item["user"], final=max_rounds == 1)
+
+            by_id = {item["id"]: item for item in items}
+            for round_number in range(1, max_rounds + 1):
+                if not requests:
+                    break
+                print(f"📦 Submitting round {round_number} of a provider batch with {len(requests)} requests")
+                batch_id = await provider.submit(requests)
+                yield {"batch": batch_id, "round": round_number, "status": "submitted", "completed": 0,
+                       "total": len(requests)}
+                for line in ready:
+                    yield line
+                ready = []
+                async for batch in provider.poll(batch_id):
+                    yield _progress(batch, len(requests), round=round_number)
+                results = await provider.results(batch)
+
+                next_requests = {}
+                for custom_id in requests:
+                    message, error = results.get(custom_id, (None, f"No result in batch {batch.id}"))
+                    if error is not None:
+                        BATCH_ITEMS.inc(mode="provider", outcome="error")
+                        yield {"id": custom_id, "error": error}
+                        continue
+                    item = by_id[custom_id]
+                    if custom_id not in states:
+                        BATCH_ITEMS.inc(mode="provider", outcome="ok")
+                        yield {"id": custom_id, "response": message.get("content") or ""}
+                        continue
+                    response = convert_to_messages([message])[0]
+                    messages = states[custom_id] = states[custom_id] + [response]
+                    if response.tool_calls and round_number < max_rounds:
+                        messages = states[custom_id] = messages + await asyncio.to_thread(_run_tools, response)
+                        next_requests[custom_id] = _agent_request(messages, item["user"], round_number + 1 == max_rounds)
+                        continue
+                    await _save_thread(graph, item, messages, stored[custom_id])
+                    BATCH_ITEMS.inc(mode="provider", outcome="ok")
+                    yield {"id": custom_id, "response": response.content}
+                requests = next_requests
+            # Every item was answered without a batch
+            for line in ready:
+                yield line
+    finally:
+        await provider.aclose()
+
+
+async def astream_batch_results(batch_id: str, provider=None):
+    """Yields the progress line of one provider batch and, once it has finished, its results.
+
+    For clients that lost the /chat/batch stream. Only the stream runs the tool
+    calls between rounds, so an agent item whose reply still asks for tools
+    comes back as an error and should be sent again; answers fetched here are
+    not added to the items' conversations.
+    """
+    from src.llm.batch import TERMINAL_STATUSES, OpenAIBatch
+    provider = provider or OpenAIBatch.from_env()
+    try:
+        batch = await provider.retrieve(batch_id)
+        yield _progress(batch, 0)
+        if batch.status not in TERMINAL_STATUSES:
+            return
+        for custom_id, (message, error) in (await provider.results(batch)).items():
+            if error is None and message.get("tool_calls"):
+                error = "The reply needs tool results that only the original stream provides; send the item again"
+            if error is not None:
+                yield {"id": custom_id, "error": error}
+            else:
+                yield {"id": custom_id, "response": message.get("content") or ""}
+    finally:
+        await provider.aclose()
@@ -0,0 +1,570 @@
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+from src.agents.states import with_ids
+from src.utils.config import checkpoint_backend
+
+# Where the SQLite backend keeps conversation state unless CHECKPOINT_SQLITE_PATH says otherwise
+DEFAULT_SQLITE_PATH = os.path.join("data", "checkpoints.sqlite")
+
+# Channels that only grow (see append_messages in states.py); they are stored as deltas
+APPEND_ONLY_CHANNELS = ("messages",)
+
+# Blob type of a delta: "delta:<serde type of the appended items>:<version it extends>"
+_DELTA_PREFIX = "delta:"
+
+
+def _message_ids(value) -> Optional[tuple]:
+    if not isinstance(value, list):
+        return None
+    ids = tuple(getattr(item, "id", None) for item in value)
+    return None if None in ids else ids
+
+
+class DeltaBlobs:
+    """Stores each version of an append-only channel as the items appended since the previous one.
+
+    Without this every step of a run serializes the whole conversation again.
+    A full copy is still written when the list did not just grow, after
+    ``max_chain`` deltas in a row (loads follow the chain back to a full copy)
+    and once the deltas add up to more than the last full copy, so full copies
+    cost about as much as the deltas overall. ``max_chain=0`` writes full copies only.
+
+    The latest value of the ``max_values`` most recent threads is also kept
+    decoded, so loading a thread to continue it only decodes what other
+    processes appended since, instead of the whole conversation.
+    """
+
+    def __init__(self, max_chain: int = 64, channels=APPEND_ONLY_CHANNELS, max_threads: int = 10000,
+                 max_values: int = 256):
+        self.max_chain = max_chain
+        self.channels = channels
+        self.max_threads = max_threads
+        self.max_values = max_values
+        # (thread id, ns, channel) -> (version, item ids, deltas since the full copy, items in them, items in the copy)
+        self._last = OrderedDict()
+        # (thread id, ns, channel) -> (version, value); values are never modified, only copied
+        self._values = OrderedDict()
+
+    def encode(self, serde, key: tuple, version, value, has_blob) -> tuple[str, bytes]:
+        """Typed blob of ``value`` for ``key`` = (thread id, ns, channel); ``has_blob(version)`` checks a base still exists."""
+        ids = _message_ids(value) if key[2] in self.channels else None
+        if ids is None:
+            return serde.dumps_typed(value)
+        self._keep_value(key, version, value)
+        last = self._last.pop(key, None)
+        if last is not None:
+            base, base_ids, links, appended, full = last
+            added = len(ids) - len(base_ids)
+            if (added >= 0 and links < self.max_chain and appended + added <= full and base != version
+                    and ids[:len(base_ids)] == base_ids and has_blob(base)):
+                inner, data = serde.dumps_typed(value[len(base_ids):])
+                self._remember(key, (version, ids, links + 1, appended + added, full))
+                return f"{_DELTA_PREFIX}{inner}:{base}", data
+        self._remember(key, (version, ids, 0, 0, len(ids)))
+        return serde.dumps_typed(value)
+
+    def _remember(self, key: tuple, last: tuple):
+        self._last[key] = last
+        while len(self._last) > self.max_threads:
+            self._last.popitem(last=False)
+
+    def _keep_value(self, key: tuple, version, value: list):
+        self._values[key] = (version, value)
+        self._values.move_to_end(key)
+        while len(self._values) > self.max_values:
+            self._values.popitem(last=False)
+
+    def decode(self, serde, key: tuple, version, typed: tuple, load):
+        """Value of ``key``'s blob ``typed`` at ``version``; ``load(version)`` returns the typed blob a delta extends."""
+        if key[2] not in self.channels:
+            return serde.loads_typed(typed)
+        kept_version, kept = self._values.get(key, (None, None))
+        if kept_version == version:
+            return list(kept)
+        tails = []
+        while typed[0].startswith(_DELTA_PREFIX):
+            inner, base = typed[0][len(_DELTA_PREFIX):].split(":", 1)
+            tails.append(serde.loads_typed((inner, typed[1])))
+            if base == kept_version:
+                value = list(kept)
+                break
+            typed = load(base)
+            if typed is None:
+                raise KeyError(f"Checkpoint blob version {base} of a delta chain is missing")
+        else:
+            value = serde.loads_typed(typed)
+            if isinstance(value, list):
+                # Full copies written before messages had ids get them here
+                with_ids(value)
+        for tail in reversed(tails):
+            value.extend(tail)
+        if isinstance(value, list):
+            self._keep_value(key, version, list(value))
+        return value
+
+    @staticmethod
+    def with_bases(referenced: set, blob_type) -> set:
+        """The (channel, version) pairs plus the versions their deltas extend; ``blob_type`` looks a type up."""
+        result = set(referenced)
+        pending = list(referenced)
+        while pending:
+            channel, version = pending.pop()
+            type_ = blob_type(channel, version) or ""
+            if type_.startswith(_DELTA_PREFIX):
+                base = (channel, type_.split(":", 2)[2])
+                if base not in result:
+                    result.add(base)
+                    pending.append(base)
+        return result
+
+    def forget(self, thread_id: str):
+        for cache in (self._last, self._values):
+            for key in [k for k in cache if k[0] == thread_id]:
+                del cache[key]
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """In-memory checkpointer that cannot grow without bound.
+
+    Threads are evicted least-recently-used once there are more than ``max_threads``
+    and after ``ttl_seconds`` without activity. Only the latest
+    ``keep_per_thread`` checkpoints of each thread are kept, together with the
+    channel blobs they still reference.
+    """
+
+    def __init__(self, max_threads: int = 1000, ttl_seconds: float = 24 * 3600, keep_per_thread: int = 5,
+                 delta_max_chain: int = 64, **kwargs):
+        super().__init__(**kwargs)
+        self.deltas = DeltaBlobs(delta_max_chain, max_threads=max_threads)
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.keep_per_thread = keep_per_thread
+        self._lock = threading.RLock()
+        self._last_used = OrderedDict()  # thread id -> monotonic time of last access
+        self._versions = {}  # (thread id, ns, checkpoint id) -> channel versions it references
+
+    def _touch(self, thread_id: str):
+        self._last_used[thread_id] = time.monotonic()
+        self._last_used.move_to_end(thread_id)
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._last_used:
+            thread_id, last_used = next(iter(self._last_used.items()))
+            if len(self._last_used) <= self.max_threads and now - last_used < self.ttl_seconds:
+                break
+            self.delete_thread(thread_id)
+
+    def _prune(self, thread_id: str, checkpoint_ns: str):
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.keep_per_thread:
+            return
+        for checkpoint_id in sorted(checkpoints)[:-self.keep_per_thread]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            self._versions.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+        # Drop the blobs no remaining checkpoint of this thread points at
+        referenced = {
+            (channel, version)
+            for checkpoint_id in checkpoints
+            for channel, version in self._versions.get((thread_id, checkpoint_ns, checkpoint_id), {}).items()
+        }
+        referenced = self.deltas.with_bases(
+            referenced, lambda channel, version: (self.blobs.get((thread_id, checkpoint_ns, channel, version)) or ("",))[0]
+        )
+        for key in [k for k in self.blobs if k[0] == thread_id and k[1] == checkpoint_ns]:
+            if (key[2], key[3]) not in referenced:
+                del self.blobs[key]
+
+    def _load_blobs(self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> dict:
+        channel_values = {}
+        for channel, version in versions.items():
+            typed = self.blobs.get((thread_id, checkpoint_ns, channel, version))
+            if typed is not None and typed[0] != "empty":
+                channel_values[channel] = self.deltas.decode(
+                    self.serde, (thread_id, checkpoint_ns, channel), version, typed,
+                    lambda base: self.blobs.get((thread_id, checkpoint_ns, channel, base))
+                )
+        return channel_values
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with self._lock:
+            thread_id = config["configurable"]["thread_id"]
+            if thread_id in self._last_used:
+                if time.monotonic() - self._last_used[thread_id] >= self.ttl_seconds:
+                    self.delete_thread(thread_id)
+                    return None
+                self._touch(thread_id)
+            elif thread_id not in self.storage:
+                # Avoid creating an empty defaultdict entry for unknown threads
+                return None
+            return super().get_tuple(config)
+
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[CheckpointTuple]:
+        with self._lock:
+            items = list(super().list(config, filter=filter, before=before, limit=limit))
+        yield from items
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        with self._lock:
+            thread_id = config["configurable"]["thread_id"]
+            checkpoint_ns = config["configurable"]["checkpoint_ns"]
+            values = checkpoint["channel_values"]
+            # Blobs first, so super().put only has to store the checkpoint itself
+            for channel, version in new_versions.items():
+                key = (thread_id, checkpoint_ns, channel, version)
+                self.blobs[key] = self.deltas.encode(
+                    self.serde, key[:3], version, values[channel],
+                    lambda base: (thread_id, checkpoint_ns, channel, base) in self.blobs
+                ) if channel in values else ("empty", b"")
+            result = super().put(config, {**checkpoint, "channel_values": {}}, metadata, {})
+            self._versions[(thread_id, checkpoint_ns, checkpoint["id"])] = dict(checkpoint["channel_versions"])
+            self._touch(thread_id)
+            self._prune(thread_id, checkpoint_ns)
+            self._evict()
+            return result
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            super().delete_thread(thread_id)
+            self.deltas.forget(thread_id)
+            self._last_used.pop(thread_id, None)
+            for key in [k for k in self._versions if k[0] == thread_id]:
+                del self._versions[key]
+
+
+class SqliteSaver(BaseCheckpointSaver):
+    """Checkpointer that persists conversation state in a SQLite database (WAL mode).
+
+    State survives restarts and can be shared by every worker on the same host.
+    Only the latest ``keep_per_thread`` checkpoints of each thread are kept.
+    """
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH, keep_per_thread: int = 5, delta_max_chain: int = 64, **kwargs):
+        super().__init__(**kwargs)
+        self.deltas = DeltaBlobs(delta_max_chain)
+        self.path = path
+        self.keep_per_thread = keep_per_thread
+        self._lock = threading.RLock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                type TEXT,
+                checkpoint BLOB,
+                metadata_type TEXT,
+                metadata BLOB,
+                channel_versions TEXT,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS blobs (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                channel TEXT NOT NULL,
+                version TEXT NOT NULL,
+                type TEXT NOT NULL,
+                blob BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT,
+                value BLOB,
+                task_path TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+            """
+        )
+        self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    # --- Reads ---
+    def _load_blob(self, thread_id: str, checkpoint_ns: str, channel: str, version) -> Optional[tuple]:
+        return self.conn.execute(
+            "SELECT type, blob FROM blobs WHERE thread_id=? AND checkpoint_ns=? AND channel=? AND version=?",
+            (thread_id, checkpoint_ns, channel, str(version)),
+        ).fetchone()
+
+    def _load_blobs(self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> dict:
+        channel_values = {}
+        for channel, version in versions.items():
+            row = self._load_blob(thread_id, checkpoint_ns, channel, version)
+            if row and row[0] != "empty":
+                channel_values[channel] = self.deltas.decode(
+                    self.serde, (thread_id, checkpoint_ns, channel), str(version), row,
+                    lambda base: self._load_blob(thread_id, checkpoint_ns, channel, base)
+                )
+        return channel_values
+
+    def _to_tuple(self, thread_id, checkpoint_ns, row) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint_b, metadata_type, metadata_b = row
+        checkpoint = self.serde.loads_typed((type_, checkpoint_b))
+        writes = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id=? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_blobs(thread_id, checkpoint_ns, checkpoint["channel_versions"]),
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata_b)),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id=?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id=? AND checkpoint_ns=? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._to_tuple(thread_id, checkpoint_ns, row) if row else None
+
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[CheckpointTuple]:
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints"
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id=?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns=?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id=?")
+                params.append(checkpoint_id)
+        if before and (before_checkpoint_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id<?")
+            params.append(before_checkpoint_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            results = []
+            for thread_id, checkpoint_ns, *row in self.conn.execute(query, params).fetchall():
+                if limit is not None and len(results) >= limit:
+                    break
+                item = self._to_tuple(thread_id, checkpoint_ns, row)
+                if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(item)
+        yield from results
+
+    # --- Writes ---
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        c = checkpoint.copy()
+        values = c.pop("channel_values")
+        type_, checkpoint_b = self.serde.dumps_typed(c)
+        metadata_type, metadata_b = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, version, type, blob) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (thread_id, checkpoint_ns, channel, str(version),
+                     *(self.deltas.encode(
+                         self.serde, (thread_id, checkpoint_ns, channel), str(version), values[channel],
+                         lambda base: self._load_blob(thread_id, checkpoint_ns, channel, base) is not None
+                     ) if channel in values else ("empty", None)))
+                    for channel, version in new_versions.items()
+                ],
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 type_, checkpoint_b, metadata_type, metadata_b,
+                 json.dumps({k: str(v) for k, v in checkpoint["channel_versions"].items()})),
+            )
+            self._prune(thread_id, checkpoint_ns)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        special, regular = [], []
+        for idx, (channel, value) in enumerate(writes):
+            row = (
+                thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                channel, *self.serde.dumps_typed(value), task_path,
+            )
+            (special if channel in WRITES_IDX_MAP else regular).append(row)
+        with self._lock, self.conn:
+            # Special writes (errors, interrupts) overwrite; regular ones are written once
+            self.conn.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", special)
+            self.conn.executemany("INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", regular)
+
+    def _prune(self, thread_id: str, checkpoint_ns: str):
+        """Keeps the latest checkpoints of a thread and the blobs they reference."""
+        stale = self.conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id=? AND checkpoint_ns=? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_per_thread),
+        ).fetchall()
+        if not stale:
+            return
+        for (checkpoint_id,) in stale:
+            self.conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id=?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+            self.conn.execute(
+                "DELETE FROM writes WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id=?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+        referenced = set()
+        for (versions,) in self.conn.execute(
+            "SELECT channel_versions FROM checkpoints WHERE thread_id=? AND checkpoint_ns=?",
+            (thread_id, checkpoint_ns),
+        ):
+            referenced.update(json.loads(versions).items())
+        types = {
+            (channel, version): type_
+            for channel, version, type_ in self.conn.execute(
+                "SELECT channel, version, type FROM blobs WHERE thread_id=? AND checkpoint_ns=?",
+                (thread_id, checkpoint_ns),
+            )
+        }
+        # Deltas need the versions they extend
+        referenced = self.deltas.with_bases(referenced, lambda channel, version: types.get((channel, version)))
+        for channel, version in types:
+            if (channel, version) not in referenced:
+                self.conn.execute(
+                    "DELETE FROM blobs WHERE thread_id=? AND checkpoint_ns=? AND channel=? AND version=?",
+                    (thread_id, checkpoint_ns, channel, version),
+                )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock, self.conn:
+            self.deltas.forget(thread_id)
+            for table in ("checkpoints", "blobs", "writes"):
+                self.conn.execute(f"DELETE FROM {table} WHERE thread_id=?", (thread_id,))
+
+    # --- Async API: SQLite calls are short, but keep them off the event loop ---
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+def create_checkpointer() -> BaseCheckpointSaver:
+    """Builds the checkpointer selected by CHECKPOINT_BACKEND ("memory" or "sqlite", see checkpoint_backend)."""
+    backend = checkpoint_backend()
+    keep_per_thread = int(os.environ.get("CHECKPOINT_KEEP_PER_THREAD", 5))
+    delta_max_chain = int(os.environ.get("CHECKPOINT_DELTA_MAX_CHAIN", 64))
+    if backend == "sqlite":
+        return SqliteSaver(
+            path=os.environ.get("CHECKPOINT_SQLITE_PATH", DEFAULT_SQLITE_PATH),
+            keep_per_thread=keep_per_thread,
+            delta_max_chain=delta_max_chain
+        )
+    if backend == "memory":
+        return BoundedMemorySaver(
+            max_threads=int(os.environ.get("CHECKPOINT_MAX_THREADS", 1000)),
+            ttl_seconds=float(os.environ.get("CHECKPOINT_TTL_SECONDS", 24 * 3600)),
+            keep_per_thread=keep_per_thread,
+            delta_max_chain=delta_max_chain
+        )
+    raise ValueError(f"Unknown CHECKPOINT_BACKEND: {backend!r} (expected 'memory' or 'sqlite')")
+
@@ -1,12 +1,7 @@
 import os
-from typing import Annotated, Literal, TypedDict
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
-from langchain_core.tools import Tool
-from langgraph.graph import StateGraph, MessagesState
-from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.memory import MemorySaver
+import heapq
+import threading
+from src.redmine.query import check_sort, parse_values, sort_key
 
 
 MOCK_DB = {
@@ -17,12 +12,265 @@ MOCK_DB = {
         {"id": 203, "name": "Mobile App Q3", "members": [101, 102]},
     ],
     "issues": [
-        {"id": 1, "project_id": 201, "subject": "Fix login button", "status": "Open", "priority": "High", "assigned_to": 101},
-        {"id": 2, "project_id": 201, "subject": "Update documentation", "status": "In Progress", "priority": "Normal", "assigned_to": 102},
-        {"id": 3, "project_id": 203, "subject": "Deploy to TestFlight", "status": "Open", "priority": "High", "assigned_to": 101},
-        {"id": 4, "project_id": 202, "subject": "Setup CI/CD pipeline", "status": "Closed", "priority": "Normal", "assigned_to": 101},
-        {"id": 5, "project_id": 203, "subject": "Fix crash on iOS 17", "status": "Open", "priority": "Critical", "assigned_to": 102},
+        {"id": 1, "project_id": 201, "subject": "Fix login button", "status": "Open", "priority": "High", "assigned_to": 101,
+         "description": "The login button does nothing on the first tap after the app starts."},
+        {"id": 2, "project_id": 201, "subject": "Update documentation", "status": "In Progress", "priority": "Normal", "assigned_to": 102,
+         "description": "Describe the new release process and the environment variables in the README."},
+        {"id": 3, "project_id": 203, "subject": "Deploy to TestFlight", "status": "Open", "priority": "High", "assigned_to": 101,
+         "description": "Upload the Q3 beta build so the testers can install it."},
+        {"id": 4, "project_id": 202, "subject": "Setup CI/CD pipeline", "status": "Closed", "priority": "Normal", "assigned_to": 101,
+         "description": "Run the tests and build the Docker image on every push to main."},
+        {"id": 5, "project_id": 203, "subject": "Fix crash on iOS 17", "status": "Open", "priority": "Critical", "assigned_to": 102,
+         "description": "The app crashes on launch on iPhones updated to iOS 17; the stack trace points to the keychain access."},
     ],
 }
 
-test = ''
\ No newline at end of file
+
+class RedmineStore:
+    """In-memory Redmine data with hash indexes for the lookups the tools perform.
+
+    Every index is updated incrementally by the ``upsert_*`` methods, so lookups stay
+    O(result size) instead of scanning every user, project or issue.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Primary records
+        self.users = {}      # user id -> user
+        self.projects = {}   # project id -> project
+        self.issues = {}     # issue id -> issue
+        # Secondary indexes
+        self._user_id_by_username = {}      # lowercased username -> user id
+        self._project_id_by_name = {}       # lowercased project name -> project id
+        self._project_ids_by_member = {}    # user id -> {project id}
+        self._issue_ids_by_project = {}     # project id -> {issue id}
+        self._issue_ids_by_assignee = {}    # user id -> {issue id}
+        self._issue_ids_by_status_priority = {}  # (status, priority) lowercased -> {issue id}
+        self._issue_ids_by_trigram = {}     # lowercased subject trigram -> {issue id}
+        # Called with (issues, deleted_ids) after issue writes, e.g. by the search index
+        self._issue_listeners = []
+        # Bumped on every write so caches can tell when their answers went stale
+        self.version = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RedmineStore":
+        """Builds a store from a MOCK_DB-shaped dict."""
+        store = cls()
+        for user in data.get("users", []):
+            store.upsert_user(user)
+        for project in data.get("projects", []):
+            store.upsert_project(project)
+        for issue in data.get("issues", []):
+            store.upsert_issue(issue)
+        return store
+
+    # --- Writes ---
+    def upsert_user(self, user: dict):
+        """Inserts or replaces a user, keeping the username index in sync."""
+        with self._lock:
+            old = self.users.get(user["id"])
+            if old is not None:
+                self._user_id_by_username.pop(old["username"].lower(), None)
+            self.users[user["id"]] = dict(user)
+            self._user_id_by_username[user["username"].lower()] = user["id"]
+            self.version += 1
+
+    def upsert_project(self, project: dict):
+        """Inserts or replaces a project, keeping the name and membership indexes in sync."""
+        with self._lock:
+            old = self.projects.get(project["id"])
+            if old is not None:
+                self._project_id_by_name.pop(old["name"].lower(), None)
+                for member_id in old.get("members", []):
+                    _discard(self._project_ids_by_member, member_id, old["id"])
+            self.projects[project["id"]] = dict(project)
+            self._project_id_by_name[project["name"].lower()] = project["id"]
+            for member_id in project.get("members", []):
+                self._project_ids_by_member.setdefault(member_id, set()).add(project["id"])
+            self.version += 1
+
+    def upsert_issue(self, issue: dict):
+        """Inserts or replaces an issue, moving it between index buckets if needed."""
+        with self._lock:
+            old = self.issues.get(issue["id"])
+            if old is not None:
+                self._unindex_issue(old)
+            record = dict(issue)
+            self.issues[record["id"]] = record
+            self._index_issue(record)
+            self.version += 1
+        self._notify([record], [])
+
+    def add_issue_listener(self, callback):
+        """Calls ``callback(issues, deleted_ids)`` after every issue write."""
+        self._issue_listeners.append(callback)
+
+    def _notify(self, issues: list, deleted_ids: list):
+        for callback in self._issue_listeners:
+            callback(issues, deleted_ids)
+
+    def update_issue(self, issue_id: int, **changes):
+        """Applies a partial update to an existing issue."""
+        with self._lock:
+            current = self.issues.get(issue_id)
+            if current is None:
+                raise KeyError(f"Unknown issue id: {issue_id}")
+            self.upsert_issue({**current, **changes})
+
+    def _index_issue(self, issue: dict):
+        self._issue_ids_by_project.setdefault(issue["project_id"], set()).add(issue["id"])
+        self._issue_ids_by_assignee.setdefault(issue.get("assigned_to"), set()).add(issue["id"])
+        self._issue_ids_by_status_priority.setdefault(_status_priority_key(issue), set()).add(issue["id"])
+        for trigram in _trigrams(issue.get("subject", "")):
+            self._issue_ids_by_trigram.setdefault(trigram, set()).add(issue["id"])
+
+    def _unindex_issue(self, issue: dict):
+        _discard(self._issue_ids_by_project, issue["project_id"], issue["id"])
+        _discard(self._issue_ids_by_assignee, issue.get("assigned_to"), issue["id"])
+        _discard(self._issue_ids_by_status_priority, _status_priority_key(issue), issue["id"])
+        for trigram in _trigrams(issue.get("subject", "")):
+            _discard(self._issue_ids_by_trigram, trigram, issue["id"])
+
+    # --- Reads ---
+    def find_user_id(self, username: str):
+        """Returns the user id for a username (case-insensitive), or None."""
+        return self._user_id_by_username.get(username.lower())
+
+    def get_username(self, user_id, default=None):
+        user = self.users.get(user_id)
+        return user["username"] if user else default
+
+    def find_project(self, name: str):
+        """Returns the project with the given name (case-insensitive), or None."""
+        project_id = self._project_id_by_name.get(name.lower())
+        return self.projects.get(project_id) if project_id is not None else None
+
+    def get_project_name(self, project_id, default=None):
+        project = self.projects.get(project_id)
+        return project["name"] if project else default
+
+    def all_projects(self) -> list[dict]:
+        with self._lock:
+            return list(self.projects.values())
+
+    def projects_for_member(self, user_id: int) -> list[dict]:
+        """Returns the projects a user is a member of, in project id order."""
+        with self._lock:
+            project_ids = sorted(self._project_ids_by_member.get(user_id, ()))
+            return [self.projects[pid] for pid in project_ids]
+
+    def all_issues(self) -> list[dict]:
+        with self._lock:
+            return list(self.issues.values())
+
+    def get_issues(self, issue_ids) -> list[dict]:
+        """Returns the issues with these ids, in the same order, skipping unknown ids."""
+        return [self.issues[i] for i in issue_ids if i in self.issues]
+
+    def issues_for_project(self, project_id: int, status: str = None, priority: str = None) -> list[dict]:
+        """Returns a project's issues, optionally filtered by status and/or priority."""
+        return self.query_issues(project_id=project_id, status=status, priority=priority)
+
+    def issues_assigned_to(self, user_id: int, status: str = None, priority: str = None) -> list[dict]:
+        """Returns the issues assigned to a user, optionally filtered by status and/or priority."""
+        return self.query_issues(assigned_to=user_id, status=status, priority=priority)
+
+    def query_issues(self, project_id: int = None, assigned_to: int = None, status=None, priority=None,
+                     subject: str = None, sort: str = "id", limit: int = None, offset: int = 0,
+                     count_only: bool = False):
+        """Filters, sorts and pages issues using the indexes.
+
+        ``status`` and ``priority`` take one value or several (list or comma-separated),
+        ``subject`` is a case-insensitive substring and ``sort`` one of SORT_KEYS.
+        Returns the matching issue records, or their number when ``count_only``.
+        """
+        sort = check_sort(sort)
+        with self._lock:
+            candidate_ids = None
+            if project_id is not None:
+                candidate_ids = self._issue_ids_by_project.get(project_id, set())
+            if assigned_to is not None:
+                candidate_ids = _intersect(candidate_ids, self._issue_ids_by_assignee.get(assigned_to, set()))
+            statuses, priorities = parse_values(status), parse_values(priority)
+            if statuses or priorities:
+                # Every (status, priority) bucket compatible with the filters
+                buckets = {
+                    key: ids for key, ids in self._issue_ids_by_status_priority.items()
+                    if (not statuses or key[0] in statuses) and (not priorities or key[1] in priorities)
+                }
+                if candidate_ids is None:
+                    candidate_ids = set().union(*buckets.values())
+                else:
+                    # Intersect bucket by bucket; each costs at most the smaller side
+                    candidate_ids = set().union(*(candidate_ids & ids for ids in buckets.values()))
+            if subject:
+                candidate_ids = self._match_subject(candidate_ids, subject.lower())
+            if candidate_ids is None:
+                candidate_ids = self.issues.keys()
+
+            if count_only:
+                return len(candidate_ids)
+            issues = (self.issues[issue_id] for issue_id in candidate_ids)
+            if limit is None:
+                return sorted(issues, key=sort_key(sort))[offset:]
+            # Only the requested page has to be fully ordered
+            return heapq.nsmallest(offset + limit, issues, key=sort_key(sort))[offset:]
+
+    def _match_subject(self, candidate_ids, needle: str) -> set:
+        trigrams = _trigrams(needle)
+        if trigrams:
+            # Narrow down with the trigram index, then confirm the substring
+            buckets = sorted((self._issue_ids_by_trigram.get(t, set()) for t in trigrams), key=len)
+            for bucket in buckets:
+                candidate_ids = _intersect(candidate_ids, bucket)
+                if not candidate_ids:
+                    return set()
+        elif candidate_ids is None:
+            candidate_ids = self.issues.keys()
+        return {i for i in candidate_ids if needle in self.issues[i].get("subject", "").lower()}
+
+
+def _intersect(ids, other: set) -> set:
+    """Intersects with ``other``; None stands for "no filter yet"."""
+    return set(other) if ids is None else ids & other
+
+
+def _trigrams(text: str) -> set:
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _status_priority_key(issue: dict) -> tuple:
+    return (str(issue.get("status", "")).lower(), str(issue.get("priority", "")).lower())
+
+
+def _discard(index: dict, key, value):
+    """Removes value from index[key], dropping the bucket once it is empty."""
+    bucket = index.get(key)
+    if bucket is None:
+        return
+    bucket.discard(value)
+    if not bucket:
+        del index[key]
+
+
+def create_store():
+    """Returns the data the tools query.
+
+    Without REDMINE_URL this is the mock data. With it, the tools read the local
+    replica kept up to date by the sync job (falling back to live Redmine until the
+    first sync finished), or live Redmine only when REDMINE_REPLICA=false.
+    """
+    if os.environ.get("REDMINE_URL"):
+        # Import here so the mock setup does not need the HTTP client
+        from src.redmine.replica import DEFAULT_REPLICA_PATH, RedmineReplica
+        from src.redmine.source import RedmineSource
+        source = RedmineSource.from_env()
+        if os.environ.get("REDMINE_REPLICA", "true").lower() not in ("1", "true", "yes"):
+            return source
+        return RedmineReplica(os.environ.get("REDMINE_REPLICA_PATH", DEFAULT_REPLICA_PATH), fallback=source)
+    return RedmineStore.from_dict(MOCK_DB)
+
+
+# Shared store used by the tool functions
+STORE = create_store()
@@ -0,0 +1,99 @@
+import base64
+import binascii
+import json
+import os
+
+# Rows sent to the model per tool result; the rest is reachable with get_more_results
+MAX_ROWS = int(os.environ.get("TOOL_RESULT_MAX_ROWS", 50))
+
+# Columns sent to the model per tool, in order; other keys are dropped
+TOOL_FIELDS = {
+    "get_issues_for_project": ["id", "subject", "status", "priority", "assignee"],
+    "get_my_assigned_issues": ["id", "subject", "status", "priority", "project"],
+    "search_issues": ["id", "subject", "status", "priority", "project"],
+}
+
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    # Keep one row per line and the separator unambiguous
+    return str(value).replace("\n", " ").replace("|", "/")
+
+
+def _table(rows: list[dict], fields: list[str]) -> list[str]:
+    """Header and rows; columns with the same value in every row move to one 'all rows:' line."""
+    constant = {}
+    if len(rows) > 1:
+        constant = {f: rows[0].get(f) for f in fields if all(row.get(f) == rows[0].get(f) for row in rows)}
+    columns = [f for f in fields if f not in constant] or fields
+    lines = []
+    if constant and len(columns) < len(fields):
+        lines.append("all rows: " + ", ".join(f"{f}={_cell(v)}" for f, v in constant.items()))
+    lines.append("|".join(columns))
+    lines.extend("|".join(_cell(row.get(f)) for f in columns) for row in rows)
+    return lines
+
+
+def encode_result(tool_name: str, result, fields: list[str] = None, max_rows: int = None, args: dict = None) -> str:
+    """Serializes a tool result compactly for the model.
+
+    Lists of dicts become a ``|``-separated table with one header line, limited to
+    ``fields`` (default: TOOL_FIELDS for the tool, else every key). Only
+    ``max_rows`` rows are included; the output says how many were omitted and,
+    when the call's ``args`` are given, how to get them: a continuation cursor that
+    holds the call and the offset, so any worker can serve it, even after a restart.
+    """
+    if not isinstance(result, (list, tuple)):
+        return "not found" if result is None else str(result)
+    rows = list(result)
+    if not rows:
+        return "0 results"
+    max_rows = MAX_ROWS if max_rows is None else max_rows
+    return _encode_page(tool_name, args, rows, fields, 0, max_rows)
+
+
+def _encode_page(tool_name: str, args, rows: list, fields, start: int, max_rows: int) -> str:
+    page = rows[start:start + max_rows]
+    end = start + len(page)
+    lines = [f"{len(rows)} results" if start == 0 else f"results {start + 1}-{end} of {len(rows)}"]
+    if isinstance(rows[0], dict):
+        lines.extend(_table(page, fields or TOOL_FIELDS.get(tool_name) or list(rows[0])))
+    else:
+        lines.extend(_cell(item) for item in page)
+
+    remaining = len(rows) - end
+    if remaining > 0 and args is None:
+        lines.append(f"... {remaining} more omitted. Refine the filters.")
+    elif remaining > 0:
+        cursor = _cursor(tool_name, args, fields, end, max_rows)
+        lines.append(
+            f"... {remaining} more omitted. Refine the filters, or call get_more_results "
+            f"with cursor={cursor} for the next {min(remaining, max_rows)}."
+        )
+    return "\n".join(lines)
+
+
+def _cursor(tool_name: str, args: dict, fields, start: int, max_rows: int) -> str:
+    payload = json.dumps([tool_name, args, fields, start, max_rows], separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def next_page(cursor: str, run) -> str:
+    """Returns the rows after a continuation cursor, in the same format.
+
+    ``run(tool_name, args)`` calls the tool again (its results are memoized, so
+    usually without querying the store); the page reflects the data as it is now.
+    """
+    cursor = cursor.strip()
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        tool_name, args, fields, start, max_rows = json.loads(payload)
+    except (binascii.Error, ValueError, TypeError):
+        return f"Error: invalid cursor '{cursor}'. Run the original query again."
+    result = run(tool_name, args)
+    rows = list(result) if isinstance(result, (list, tuple)) else []
+    if start >= len(rows):
+        return f"No results after row {start}: the data changed since. Run the original query again."
+    return _encode_page(tool_name, args, rows, fields, start, max_rows)
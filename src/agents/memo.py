@@ -0,0 +1,134 @@
+import contextvars
+import functools
+import inspect
+import os
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from src.agents.database import STORE
+from src.utils.cache import TTLCache
+from src.utils.config import parse_seconds
+from src.utils.metrics import REGISTRY
+
+TOOL_CACHE_REQUESTS = REGISTRY.counter(
+    "tool_cache_requests_total",
+    "Tool calls by tool and how they were answered (hit, dedup or miss)",
+    ("tool", "result")
+)
+
+# Per-tool TTL overrides from the environment, e.g. "get_all_projects=600,get_user_name=3600"
+TOOL_CACHE_TTLS = parse_seconds(os.environ.get("TOOL_CACHE_TTLS", ""))
+
+# Results shared across requests; the data version is part of every key
+SHARED_CACHE = TTLCache(max_entries=int(os.environ.get("TOOL_CACHE_MAX_ENTRIES", 2000)))
+
+_MISS = object()
+
+# Results of the current request, so repeated calls within one agent run are only executed once
+_REQUEST_MEMO = contextvars.ContextVar("tool_request_memo", default=None)
+
+
+class RequestMemo:
+    """Tool results of one request. Concurrent identical calls wait for the first one."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def claim(self, key):
+        """Returns (future, owner); the owner must compute and set the future's result."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future, False
+            future = self._futures[key] = Future()
+            return future, True
+
+
+@contextmanager
+def request_scope():
+    """Deduplicates tool calls made inside the block (one agent run, or all runs of a batch).
+
+    Nested scopes share the outer one, so the runs of a batch reuse each other's lookups.
+    """
+    if _REQUEST_MEMO.get() is not None:
+        yield
+        return
+    token = _REQUEST_MEMO.set(RequestMemo())
+    try:
+        yield
+    finally:
+        try:
+            _REQUEST_MEMO.reset(token)
+        except ValueError:
+            # Async generators may be closed from another context; the scope dies with it
+            pass
+
+
+def normalize_arg(value):
+    """Makes equivalent arguments share a key: ' Sally ' == 'sally' and '102' == 102."""
+    if isinstance(value, str):
+        value = value.strip()
+        if value.lstrip("-").isdigit():
+            return int(value)
+        return value.lower()
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_arg(item) for item in value)
+    return value
+
+
+def memoized(ttl: float, data_version=lambda: STORE.version):
+    """Caches a tool's results per request and, for ``ttl`` seconds, across requests.
+
+    Keys are the tool name, its normalized arguments and ``data_version()``, so a
+    write to the store makes every older entry unreachable. The TTL can be
+    overridden per tool with TOOL_CACHE_TTLS. Cached results are shared between
+    callers and must not be mutated.
+    """
+    def decorator(func):
+        name = func.__name__
+        signature = inspect.signature(func)
+        ttl_seconds = TOOL_CACHE_TTLS.get(name, ttl)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (name, tuple(normalize_arg(v) for v in bound.arguments.values()), data_version())
+
+            memo = _REQUEST_MEMO.get()
+            if memo is not None:
+                future, owner = memo.claim(key)
+                if not owner:
+                    TOOL_CACHE_REQUESTS.inc(tool=name, result="dedup")
+                    print(f"♻️ Reusing result of {name} from this request")
+                    return future.result()
+            try:
+                result = _shared_lookup(key, name, ttl_seconds, func, args, kwargs)
+            except BaseException as e:
+                if memo is not None:
+                    future.set_exception(e)
+                raise
+            if memo is not None:
+                future.set_result(result)
+            return result
+
+        wrapper.cache_ttl = ttl_seconds
+        return wrapper
+    return decorator
+
+
+def _shared_lookup(key, name, ttl_seconds, func, args, kwargs):
+    if ttl_seconds > 0:
+        result = SHARED_CACHE.get(key, _MISS)
+        if result is not _MISS:
+            TOOL_CACHE_REQUESTS.inc(tool=name, result="hit")
+            print(f"♻️ Cached result for {name}")
+            return result
+    TOOL_CACHE_REQUESTS.inc(tool=name, result="miss")
+    result = func(*args, **kwargs)
+    if ttl_seconds > 0:
+        SHARED_CACHE.set(key, result, ttl_seconds=ttl_seconds)
+    return result
+
@@ -0,0 +1,50 @@
+import os
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from src.agents.tools import get_user_name
+from src.utils.metrics import REGISTRY
+
+SESSION_WARMUPS = REGISTRY.counter(
+    "agent_session_warmups_total", "Opening agent turns by warmup result (seeded, skipped, failed)", ("result",)
+)
+
+# Resolve the caller's id, projects and assigned issues before the first LLM call of a session
+PREFETCH_ENABLED = os.environ.get("AGENT_PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Marks the pre-seeded tool calls so they can be told apart from the model's own
+PREFETCH_CALL_PREFIX = "prefetch_"
+
+
+def is_session_start(messages: list[BaseMessage]) -> bool:
+    """True for the first question of a session: no user turn before the new message."""
+    return not any(isinstance(msg, HumanMessage) for msg in messages[:-1])
+
+
+def warmup_calls(username: str) -> list[dict]:
+    """Tool calls the agent makes at the start of almost every session, or [] for an unknown user.
+
+    The user id is resolved first (usually a cached lookup) because the projects
+    tool needs it; the three calls then run in parallel.
+    """
+    user_id = get_user_name(username)
+    if user_id is None:
+        return []
+    return [
+        {"id": f"{PREFETCH_CALL_PREFIX}user", "name": "get_user_name", "args": {"username": username}},
+        {"id": f"{PREFETCH_CALL_PREFIX}projects", "name": "get_projects_for_user", "args": {"user_id": user_id}},
+        {"id": f"{PREFETCH_CALL_PREFIX}issues", "name": "get_my_assigned_issues",
+         "args": {"username": username, "sort": "priority"}},
+    ]
+
+
+def seed_messages(messages: list[BaseMessage], calls: list[dict], tool_messages: list[ToolMessage]) -> list[BaseMessage]:
+    """Inserts the warmup calls and their results before the new message, as if the model had made them.
+
+    Nothing is seeded when a call failed; the model then makes the calls it needs itself.
+    """
+    if not calls or any(msg.status == "error" for msg in tool_messages):
+        SESSION_WARMUPS.inc(result="failed" if calls else "skipped")
+        return messages
+    SESSION_WARMUPS.inc(result="seeded")
+    return messages[:-1] + [AIMessage(content="", tool_calls=calls)] + tool_messages + messages[-1:]
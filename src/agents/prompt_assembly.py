@@ -0,0 +1,39 @@
+import hashlib
+import json
+
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from src.agents.prompts import SYSTEM_MESSAGE, USER_CONTEXT_MESSAGE
+
+# OpenAI caches the longest previously seen prompt prefix (tool definitions included).
+# Every prompt therefore starts with the same bytes: this message, then the tools bound
+# once per model. Anything per user or per session comes after it.
+STATIC_SYSTEM_MESSAGE = SystemMessage(content=SYSTEM_MESSAGE)
+
+# Prompts written into thread state by earlier versions start the same way, with the user's name inside
+_PROMPT_START = SYSTEM_MESSAGE.split("\n", 1)[0]
+
+
+def is_agent_prompt(message: BaseMessage) -> bool:
+    """True for the agent's own system messages, current or older per-user ones."""
+    return isinstance(message, SystemMessage) and message.content.startswith(_PROMPT_START)
+
+
+def conversation(messages: list[BaseMessage]) -> list[BaseMessage]:
+    """The messages of a thread without the agent's system prompt; this is what the state keeps."""
+    return [msg for msg in messages if not is_agent_prompt(msg)]
+
+
+def assemble(messages: list[BaseMessage], user: str) -> list[BaseMessage]:
+    """Prompt for a chatbot call: the static prefix, then the user context, then the conversation."""
+    return [STATIC_SYSTEM_MESSAGE, SystemMessage(content=USER_CONTEXT_MESSAGE.format(user=user))] + conversation(messages)
+
+
+def prefix_fingerprint(tools: list) -> str:
+    """Short hash of the static prefix (system prompt and tool definitions); equal for every user."""
+    prefix = json.dumps(
+        {"system": SYSTEM_MESSAGE, "tools": [convert_to_openai_tool(tool) for tool in tools]},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:12]
@@ -0,0 +1,352 @@
+import contextvars
+import os
+import re
+import time
+import unicodedata
+from contextlib import contextmanager
+from functools import lru_cache
+
+from src.agents.database import STORE
+from src.agents.tools import (
+    STALE_AFTER_SECONDS, data_staleness, get_all_projects, get_issues_for_project, get_my_assigned_issues,
+    get_projects_for_user, get_user_name
+)
+from src.llm.usage import token_usage
+from src.utils.metrics import REGISTRY
+
+ROUTE_REQUESTS = REGISTRY.counter("agent_route_requests_total", "Agent requests by route", ("route",))
+ROUTE_SECONDS = REGISTRY.histogram("agent_route_seconds", "Agent request latency by route", ("route",))
+ROUTE_TOKENS = REGISTRY.counter(
+    "agent_route_tokens_total", "LLM tokens used by agent requests, by route and kind (prompt, completion)",
+    ("route", "kind")
+)
+ROUTE_COST = REGISTRY.counter("agent_route_cost_usd_total", "Estimated LLM cost of agent requests by route", ("route",))
+
+# Routes, cheapest first: canned replies, template answers from the tools, the small model, the full model
+ROUTES = ("greeting", "lookup", "small", "full")
+
+# List prices in USD per million (prompt, cached prompt, completion) tokens; model names may carry a date suffix
+PRICES = {
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+}
+
+_GREETING = {"hola", "buenas", "buenos", "dias", "tardes", "noches", "hey", "hi", "hello", "saludos"}
+_THANKS = {"gracias", "muchas", "thanks", "thank", "you", "ok", "vale", "perfecto", "genial", "great"}
+_BYE = {"adios", "chao", "hasta", "luego", "pronto", "bye", "goodbye"}
+
+# Questions that need reasoning over the data go to the full model even when short
+_COMPLEX = re.compile(
+    r"\b(compar\w*|resum\w*|summar\w*|analiz\w*|analy\w*|explic\w*|explain\w*|por que|porque|why|"
+    r"recomiend\w*|recommend\w*|prioriz\w*|prioriti\w*|plan\w*|estrategi\w*|strateg\w*|riesgo\w*|risk\w*)\b"
+)
+
+_ISSUES = {"tareas", "tarea", "incidencias", "incidencia", "issues", "issue", "tickets", "ticket", "peticiones"}
+_PROJECTS = {"proyectos", "proyecto", "projects", "project"}
+# Words saying the question is about the user: "mis tareas", "en qué proyectos estoy"
+_MINE = {"mis", "my", "mi", "me", "mine", "tengo", "estoy", "participo", "i"}
+_COUNT = {"cuantas", "cuantos", "many", "numero", "count"}
+_STATUS = {
+    "abiertas": "Open", "abiertos": "Open", "open": "Open",
+    "cerradas": "Closed", "cerrados": "Closed", "closed": "Closed",
+    "progreso": "In Progress", "curso": "In Progress", "progress": "In Progress",
+}
+_PRIORITY = {
+    "criticas": "Critical,Urgent,Immediate", "urgentes": "Critical,Urgent,Immediate",
+    "critical": "Critical,Urgent,Immediate", "urgent": "Critical,Urgent,Immediate",
+}
+# Words a lookup may contain besides the ones above; any other word sends the query to a model
+_FILLER = {
+    "muestra", "muestrame", "ensename", "dame", "lista", "listar", "listado", "ver", "quiero", "cuales", "que",
+    "son", "de", "del", "la", "las", "los", "el", "en", "a", "y", "o", "con", "and", "or",
+    "todas", "todos", "asignadas", "asignados", "asignada", "por", "favor", "list", "show", "get", "give", "what",
+    "which", "are", "is", "do", "am", "have", "in", "the", "all", "to", "assigned", "please", "how",
+    "existen", "disponibles", "available", "estado", "status", "tiene", "has", "hay",
+}
+
+# (singular, plural) descriptions of the filters in the replies
+_STATUS_LABELS = {"Open": ("abierta", "abiertas"), "Closed": ("cerrada", "cerradas"), "In Progress": ("en progreso",) * 2}
+_PRIORITY_LABEL = ("crítica", "críticas")
+
+# Intent of the request being run, so the chatbot nodes know which model to use and whom to bill
+_CURRENT = contextvars.ContextVar("agent_route", default=None)
+
+
+def normalize(text: str) -> str:
+    """Lowercase words without accents or punctuation: '¿Cuántas?' -> 'cuantas'."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.findall(r"\w+", text))
+
+
+def price_for(model: str):
+    """(prompt, cached prompt, completion) USD per million tokens of ``model``, or None if unknown."""
+    # Longest name first so gpt-4.1-mini is not priced as gpt-4.1
+    for name in sorted(PRICES, key=len, reverse=True):
+        if (model or "").startswith(name):
+            return PRICES[name]
+    return None
+
+
+class RoutedRequest:
+    """One agent request and the route it takes; ``reply`` is set when no LLM is needed.
+
+    While ``scope()`` is active the LLM calls of the request report their token
+    usage here; ``finish()`` records the route's count, latency, tokens and cost.
+    """
+
+    def __init__(self, route: str, intent: str = None, reply: str = None):
+        self.route = route
+        self.intent = intent
+        self.reply = reply
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self._started = time.perf_counter()
+        self._finished = False
+
+    @property
+    def llm_endpoint(self) -> str:
+        """Resilience policy (and so the model) the chatbot nodes use for this route."""
+        return "agent_small" if self.route == "small" else "agent"
+
+    def record_usage(self, model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0):
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        price = price_for(model)
+        if price is not None:
+            uncached = prompt_tokens - cached_tokens
+            self.cost += (uncached * price[0] + cached_tokens * price[1] + completion_tokens * price[2]) / 1_000_000
+
+    @contextmanager
+    def scope(self):
+        token = _CURRENT.set(self)
+        try:
+            yield self
+        finally:
+            try:
+                _CURRENT.reset(token)
+            except ValueError:
+                # Async generators may be closed from another context
+                pass
+
+    def finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        ROUTE_REQUESTS.inc(route=self.route)
+        ROUTE_SECONDS.observe(time.perf_counter() - self._started, route=self.route)
+        ROUTE_TOKENS.inc(self.prompt_tokens, route=self.route, kind="prompt")
+        ROUTE_TOKENS.inc(self.completion_tokens, route=self.route, kind="completion")
+        ROUTE_COST.inc(self.cost, route=self.route)
+
+
+def llm_endpoint() -> str:
+    """Resilience policy for the LLM call being made: the small model on the small route."""
+    routed = _CURRENT.get()
+    return routed.llm_endpoint if routed is not None else "agent"
+
+
+def record_llm_usage(response):
+    """Adds the token usage of an LLM response to the request being routed, if any."""
+    routed = _CURRENT.get()
+    usage = token_usage(response)
+    if routed is None or usage is None:
+        return
+    routed.record_usage(usage["model"], usage["prompt"], usage["completion"], usage["cached"])
+
+
+class QueryRouter:
+    """Classifies agent queries with cheap rules and answers the simplest without a model.
+
+    Greetings get a canned reply. Lookups that the rules fully understand (every
+    word is known: "mis incidencias abiertas", "¿cuántas incidencias críticas tiene
+    Project Phoenix?") call the tool functions directly and fill a template. Other
+    short questions go to the small model and the rest to the full agent model.
+    """
+
+    def __init__(self, enabled: bool = True, small_max_words: int = 12, max_rows: int = 20):
+        self.enabled = enabled
+        self.small_max_words = small_max_words
+        self.max_rows = max_rows
+        # (data version, pattern matching any project name, normalized name -> name), rebuilt when the data changes
+        self._project_index = None
+
+    @classmethod
+    def from_env(cls) -> "QueryRouter":
+        """Reads AGENT_ROUTER_ENABLED, AGENT_ROUTER_SMALL_MAX_WORDS and AGENT_ROUTER_MAX_ROWS."""
+        return cls(
+            enabled=os.environ.get("AGENT_ROUTER_ENABLED", "true").lower() in ("1", "true", "yes"),
+            small_max_words=int(os.environ.get("AGENT_ROUTER_SMALL_MAX_WORDS", 12)),
+            max_rows=int(os.environ.get("AGENT_ROUTER_MAX_ROWS", 20))
+        )
+
+    # --- Classification ---
+    def classify(self, message: str) -> tuple:
+        """Returns (route, intent, params) for a query; only rules, no I/O except the project names."""
+        text = normalize(message)
+        words = text.split()
+        if not self.enabled or not words:
+            return "full", None, {}
+        if len(words) <= 4 and set(words) <= _GREETING | _THANKS | _BYE:
+            intent = "bye" if set(words) & _BYE else "thanks" if set(words) & _THANKS else "hello"
+            return "greeting", intent, {}
+
+        complex_query = _COMPLEX.search(text) is not None
+        if not complex_query and len(words) <= self.small_max_words:
+            lookup = self._lookup_intent(text, words)
+            if lookup is not None:
+                return ("lookup",) + lookup
+            return "small", None, {}
+        return "full", None, {}
+
+    def _lookup_intent(self, text: str, words: list):
+        params = {}
+        rest = set(words)
+        statuses = [_STATUS[word] for word in words if word in _STATUS]
+        if statuses:
+            params["status"] = ",".join(dict.fromkeys(statuses))
+        priorities = [_PRIORITY[word] for word in words if word in _PRIORITY]
+        if priorities:
+            params["priority"] = priorities[0]
+        if rest & _COUNT:
+            params["count_only"] = True
+        rest -= set(_STATUS) | set(_PRIORITY) | _COUNT | _FILLER
+
+        project = self._mentioned_project(text)
+        if project is not None:
+            rest -= set(normalize(project).split())
+        mine = bool(rest & _MINE)
+        issues = bool(rest & _ISSUES)
+        rest -= _MINE | _ISSUES | _PROJECTS
+        # A word the rules do not know may change the meaning ("mis incidencias sobre login")
+        if rest:
+            return None
+
+        if project is not None and issues and not mine:
+            return "project_issues", dict(params, project_name=project)
+        if project is not None:
+            return None
+        if issues and (mine or "assigned" in words or "asignadas" in words):
+            return "my_issues", params
+        if params or issues:
+            return None
+        if set(words) & _PROJECTS:
+            return ("my_projects" if mine else "all_projects"), {}
+        return None
+
+    def _mentioned_project(self, text: str):
+        version = STORE.version
+        index = self._project_index
+        if index is None or index[0] != version:
+            names = {normalize(name): name for name in get_all_projects()}
+            # Longest name first so "Mobile App Q3" wins over a project called "Mobile App"
+            alternatives = "|".join(re.escape(name) for name in sorted(names, key=len, reverse=True) if name)
+            pattern = re.compile(rf"\b(?:{alternatives})\b") if alternatives else None
+            index = self._project_index = (version, pattern, names)
+        _, pattern, names = index
+        matches = [match.group() for match in pattern.finditer(text)] if pattern is not None else []
+        return names[max(matches, key=len)] if matches else None
+
+    def route(self, message: str, user: str) -> RoutedRequest:
+        """Classifies ``message`` and, for greetings and lookups, builds the reply."""
+        try:
+            route, intent, params = self.classify(message)
+            reply = None
+            if route == "greeting":
+                reply = self._greeting(intent, user)
+            elif route == "lookup":
+                reply = self._lookup(intent, params, user) + _staleness_note()
+        except Exception as e:
+            # The model can still answer, and its tool calls will report the error if it persists
+            print(f"⚠️ Router lookup failed, using the full model: {e}")
+            route, intent, reply = "full", None, None
+        print(f"🧭 Route: {route}" + (f" ({intent})" if intent else ""))
+        return RoutedRequest(route, intent, reply)
+
+    # --- Templates ---
+    @staticmethod
+    def _greeting(intent: str, user: str) -> str:
+        if intent == "thanks":
+            return "¡De nada! ¿Necesitas algo más?"
+        if intent == "bye":
+            return "¡Hasta luego!"
+        return (
+            f"¡Hola, {user}! Puedo ayudarte con tus proyectos e incidencias de Redmine. "
+            "Por ejemplo: «mis proyectos», «mis incidencias abiertas» o «busca incidencias sobre el login»."
+        )
+
+    def _lookup(self, intent: str, params: dict, user: str) -> str:
+        if intent == "all_projects":
+            return _bullets("Hay {n} proyectos:", get_all_projects(), "No hay proyectos.")
+
+        if intent == "project_issues":
+            name = params.pop("project_name")
+            return self._issues(
+                lambda **kwargs: get_issues_for_project(name, **kwargs), params,
+                f"El proyecto {name}", "tiene", lambda issue: issue["assignee"]
+            )
+
+        user_id = get_user_name(user)
+        if user_id is None:
+            return f"No encontré al usuario {user} en Redmine."
+        if intent == "my_projects":
+            return _bullets("Participas en {n} proyectos:", get_projects_for_user(user_id), "No participas en ningún proyecto.")
+        return self._issues(
+            lambda **kwargs: get_my_assigned_issues(user_id, **kwargs), params,
+            "Tienes", "asignadas", lambda issue: issue["project"]
+        )
+
+    def _issues(self, fetch, params: dict, subject: str, verb: str, detail) -> str:
+        if params.pop("count_only", False):
+            count = _count(fetch(count_only=True, **params))
+            return _issues_sentence(subject, verb, count, params) + "."
+        issues = fetch(sort="priority", limit=self.max_rows + 1, **params)
+        if not issues:
+            return _issues_sentence(subject, verb, 0, params) + "."
+        shown = issues[:self.max_rows]
+        lines = [f"- #{issue['id']} {issue['subject']} ({issue['status']}, {issue['priority']}, {detail(issue)})" for issue in shown]
+        if len(issues) > len(shown):
+            count = _count(fetch(count_only=True, **params))
+            head = _issues_sentence(subject, verb, count, params) + f"; estas son las {len(shown)} más importantes:"
+            lines.append("Pídeme que las filtre para ver las demás.")
+        else:
+            head = _issues_sentence(subject, verb, len(shown), params) + ":"
+        return "\n".join([head] + lines)
+
+
+def _count(summary: str) -> int:
+    # Counting tools answer "<n> matching issues"
+    return int(summary.split()[0])
+
+
+def _issues_sentence(subject: str, verb: str, count: int, params: dict) -> str:
+    """'Tienes 1 incidencia abierta asignada', 'El proyecto X tiene 3 incidencias críticas'."""
+    form = 0 if count == 1 else 1
+    words = ["incidencia" if count == 1 else "incidencias"]
+    words += [_STATUS_LABELS.get(status, (status,) * 2)[form] for status in (params.get("status") or "").split(",") if status]
+    if params.get("priority"):
+        words.append(_PRIORITY_LABEL[form])
+    if verb == "asignadas":
+        return f"{subject} {count} {' '.join(words)} {'asignada' if count == 1 else 'asignadas'}"
+    return f"{subject} {verb} {count} {' '.join(words)}"
+
+
+def _bullets(head: str, items: list, empty: str) -> str:
+    if not items:
+        return empty
+    return "\n".join([head.format(n=len(items))] + [f"- {item}" for item in items])
+
+
+def _staleness_note() -> str:
+    staleness = data_staleness()
+    if staleness is None or staleness < STALE_AFTER_SECONDS:
+        return ""
+    return f"\n\n(Nota: los datos de Redmine se sincronizaron hace {int(staleness // 60)} minutos; puede faltar algún cambio reciente.)"
+
+
+@lru_cache(maxsize=1)
+def get_router() -> QueryRouter:
+    return QueryRouter.from_env()
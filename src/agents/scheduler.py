@@ -0,0 +1,170 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import lru_cache
+from langchain_core.messages import ToolMessage
+
+from src.utils.config import parse_seconds
+
+
+class ToolScheduler:
+    """Runs the tool calls of one AI message concurrently on a bounded thread pool.
+
+    Results come back in the same order as the tool calls. A call that fails or
+    runs past its timeout produces an error ToolMessage instead of a result; calls
+    that have not started yet when they are abandoned are cancelled. A tool thread
+    that is already running cannot be interrupted, so it finishes in the background
+    and its result is discarded.
+
+    The pool is shared by every request of the process. A call's timeout counts
+    from when a thread starts it, in run and arun alike; a call still waiting for a
+    thread ``queue_timeout`` seconds after it was submitted (every thread busy,
+    e.g. with timed-out calls that are still running) is cancelled with an error.
+    """
+
+    # How often to look for newly started calls whose timeout clock must begin
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, max_concurrency: int = 4, default_timeout: float = 30.0, timeouts: dict = None,
+                 queue_timeout: float = None):
+        self.max_concurrency = max_concurrency
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts or {}
+        self.queue_timeout = default_timeout if queue_timeout is None else queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="tool")
+
+    @classmethod
+    def from_env(cls) -> "ToolScheduler":
+        """Reads TOOL_MAX_CONCURRENCY, TOOL_TIMEOUT_SECONDS, TOOL_TIMEOUTS (name=seconds,...) and TOOL_QUEUE_TIMEOUT_SECONDS."""
+        queue_timeout = os.environ.get("TOOL_QUEUE_TIMEOUT_SECONDS")
+        return cls(
+            max_concurrency=int(os.environ.get("TOOL_MAX_CONCURRENCY", 4)),
+            default_timeout=float(os.environ.get("TOOL_TIMEOUT_SECONDS", 30)),
+            timeouts=parse_seconds(os.environ.get("TOOL_TIMEOUTS", "")),
+            queue_timeout=float(queue_timeout) if queue_timeout else None
+        )
+
+    def timeout_for(self, tool_name: str) -> float:
+        return self.timeouts.get(tool_name, self.default_timeout)
+
+    def run(self, tool_calls: list, handler) -> list[ToolMessage]:
+        """Runs handler(tool_call) for every call and returns the ToolMessages in call order."""
+        results = [None] * len(tool_calls)
+        started = {}
+
+        def job(index, tool_call):
+            started[index] = time.monotonic()
+            return handler(tool_call)
+
+        # Copy the context so per-request state (callbacks, caches) reaches the worker threads
+        futures = {
+            self._executor.submit(contextvars.copy_context().run, job, index, tool_call): index
+            for index, tool_call in enumerate(tool_calls)
+        }
+        queue_deadline = time.monotonic() + self.queue_timeout
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            deadlines = [
+                started[futures[future]] + self.timeout_for(tool_calls[futures[future]]["name"])
+                for future in pending if futures[future] in started
+            ]
+            if len(deadlines) < len(pending):
+                deadlines.append(min(queue_deadline, now + self.POLL_INTERVAL))
+            wait_time = max(min(deadlines) - now, 0)
+
+            done, pending = wait(pending, timeout=wait_time, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = futures[future]
+                results[index] = self._result_message(tool_calls[index], future)
+
+            now = time.monotonic()
+            for future in list(pending):
+                index = futures[future]
+                timeout = self.timeout_for(tool_calls[index]["name"])
+                if index in started:
+                    if now - started[index] >= timeout:
+                        future.cancel()
+                        pending.discard(future)
+                        results[index] = self._timeout_message(tool_calls[index], timeout)
+                # cancel() fails once a thread picked the call up; its own timeout applies then
+                elif now >= queue_deadline and future.cancel():
+                    pending.discard(future)
+                    results[index] = self._queued_message(tool_calls[index], self.queue_timeout)
+        return results
+
+    async def arun(self, tool_calls: list, handler) -> list[ToolMessage]:
+        """Async version of run; cancelling the awaiting task cancels calls not yet started."""
+        loop = asyncio.get_running_loop()
+
+        async def one(tool_call):
+            timeout = self.timeout_for(tool_call["name"])
+            started = loop.create_future()
+
+            def job():
+                loop.call_soon_threadsafe(lambda: started.done() or started.set_result(None))
+                return handler(tool_call)
+
+            submitted = self._executor.submit(contextvars.copy_context().run, job)
+            future = asyncio.wrap_future(submitted)
+            try:
+                await asyncio.wait_for(started, self.queue_timeout)
+            except asyncio.TimeoutError:
+                # Cancelling fails once a thread picked the call up; its own timeout applies then
+                if submitted.cancel():
+                    return self._queued_message(tool_call, self.queue_timeout)
+            except asyncio.CancelledError:
+                submitted.cancel()
+                raise
+            try:
+                return await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                return self._timeout_message(tool_call, timeout)
+            except Exception as e:
+                return self._error_message(tool_call, e)
+
+        return list(await asyncio.gather(*(one(tool_call) for tool_call in tool_calls)))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _result_message(self, tool_call, future) -> ToolMessage:
+        try:
+            return future.result()
+        except Exception as e:
+            return self._error_message(tool_call, e)
+
+    @staticmethod
+    def _error_message(tool_call, error) -> ToolMessage:
+        print(f"❌ Tool {tool_call['name']} failed: {error}")
+        return ToolMessage(
+            content=f"Error: tool '{tool_call['name']}' failed: {error}",
+            tool_call_id=tool_call["id"],
+            status="error"
+        )
+
+    @staticmethod
+    def _queued_message(tool_call, queue_timeout) -> ToolMessage:
+        print(f"⏱️ Tool {tool_call['name']} did not start within {queue_timeout}s, every tool thread is busy")
+        return ToolMessage(
+            content=f"Error: tool '{tool_call['name']}' did not start within {queue_timeout} seconds because the server is busy",
+            tool_call_id=tool_call["id"],
+            status="error"
+        )
+
+    @staticmethod
+    def _timeout_message(tool_call, timeout) -> ToolMessage:
+        print(f"⏱️ Tool {tool_call['name']} timed out after {timeout}s")
+        return ToolMessage(
+            content=f"Error: tool '{tool_call['name']}' timed out after {timeout} seconds",
+            tool_call_id=tool_call["id"],
+            status="error"
+        )
+
+
+@lru_cache(maxsize=1)
+def get_tool_scheduler() -> ToolScheduler:
+    """Returns the process-wide tool scheduler configured from the environment."""
+    return ToolScheduler.from_env()
@@ -0,0 +1,64 @@
+from typing import ClassVar, Literal, Optional
+from pydantic import BaseModel, Field, model_validator
+
+
+# Base for every tool's arguments
+class ToolArgs(BaseModel):
+    # Field that received the single string argument of the old Tool wrappers
+    legacy_arg: ClassVar[Optional[str]] = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def accept_legacy_arg(cls, data):
+        # Tool calls recorded before the structured schemas used {"__arg1": value}
+        if isinstance(data, dict) and "__arg1" in data and cls.legacy_arg:
+            data = {cls.legacy_arg: data["__arg1"], **{k: v for k, v in data.items() if k != "__arg1"}}
+        return data
+
+
+# Filters, sorting and paging shared by the issue tools
+class IssueQueryArgs(ToolArgs):
+    status: Optional[str] = Field(None, description="Comma-separated statuses to include, e.g. 'Open, In Progress'. Omit for all.")
+    priority: Optional[str] = Field(None, description="Comma-separated priorities to include (Low, Normal, High, Critical). Omit for all.")
+    subject: Optional[str] = Field(None, description="Only issues whose subject contains this text (case-insensitive).")
+    sort: Literal["id", "priority", "updated"] = Field("id", description="id (ascending), priority (most important first) or updated (most recent first).")
+    limit: Optional[int] = Field(None, ge=1, le=500, description="Return at most this many issues.")
+    offset: int = Field(0, ge=0, description="Skip this many issues first, for paging.")
+    count_only: bool = Field(False, description="Only return how many issues match. Use this to answer 'how many' questions.")
+
+
+class UserNameArgs(ToolArgs):
+    legacy_arg: ClassVar[str] = "username"
+    username: str = Field(description="Redmine username (login).")
+
+
+class ProjectsForUserArgs(ToolArgs):
+    legacy_arg: ClassVar[str] = "user_id"
+    user_id: int = Field(description="Redmine user ID, as returned by get_user_name.")
+
+
+class ProjectIssuesArgs(IssueQueryArgs):
+    legacy_arg: ClassVar[str] = "project_name"
+    project_name: str = Field(description="Exact project name.")
+
+
+class AssignedIssuesArgs(IssueQueryArgs):
+    legacy_arg: ClassVar[str] = "username"
+    username: str = Field(description="Redmine username (login) of the assignee.")
+
+
+class SearchIssuesArgs(ToolArgs):
+    legacy_arg: ClassVar[str] = "query"
+    query: str = Field(description="What the issue is about, in free text, e.g. 'iOS crash on launch'.")
+    project_name: Optional[str] = Field(None, description="Only search this project.")
+    status: Optional[str] = Field(None, description="Comma-separated statuses to include. Omit for all.")
+    limit: int = Field(10, ge=1, le=50, description="Number of issues to return, best matches first.")
+
+
+class NoArgs(ToolArgs):
+    pass
+
+
+class MoreResultsArgs(ToolArgs):
+    legacy_arg: ClassVar[str] = "cursor"
+    cursor: str = Field(description="Cursor given at the end of a truncated tool result.")
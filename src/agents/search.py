@@ -0,0 +1,228 @@
+import hashlib
+import os
+import threading
+from functools import lru_cache
+
+from src.agents.database import STORE
+from src.redmine.query import parse_values
+from src.utils.cache import HashingEmbedder
+from src.utils.search import BM25Index, VectorIndex
+
+# Issue vectors live next to the other embeddings
+DEFAULT_VECTOR_PATH = os.path.join("data", "embeddings", "issues")
+
+# Constant of reciprocal rank fusion; higher values flatten the rank weights
+RRF_K = 60
+
+
+def issue_text(issue: dict) -> str:
+    # The subject counts twice: it says what the issue is about more reliably than the description
+    subject = issue.get("subject") or ""
+    return f"{subject}\n{subject}\n{issue.get('description') or ''}"
+
+
+def text_fingerprint(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class IssueSearch:
+    """Ranked issue search over subjects and descriptions.
+
+    Keeps a BM25 index (and optionally a vector index) of the store's issues. The
+    index is built on first use and then follows the store through its issue
+    listener: changes are queued and applied before the next search, so writers
+    never wait for indexing. A replica can also be written by another worker
+    process; when its version moves, the issues updated since the newest one
+    indexed are fetched and indexed. Stores without local issues (live Redmine)
+    use Redmine's own search instead.
+
+    Only the process that writes the vector index embeds issues; the others
+    search the vectors it flushed (see VectorIndex), and take over the
+    embedding if it exits.
+    """
+
+    # Queued issue changes applied right away (instead of at the next search) past this size
+    MAX_PENDING = 5000
+
+    def __init__(self, store, vectors: VectorIndex = None, embedder=None, min_similarity: float = 0.2,
+                 batch_size: int = 5000):
+        self.store = store
+        self.local = hasattr(store, "all_issues")
+        self.bm25 = BM25Index()
+        self.vectors = vectors
+        self.embedder = embedder or (HashingEmbedder(vectors.dim) if vectors is not None else None)
+        # Vector matches below this cosine similarity are noise, not related issues
+        self.min_similarity = min_similarity
+        self.batch_size = batch_size
+        self._built = False
+        self._build_lock = threading.Lock()
+        self._apply_lock = threading.Lock()
+        self._pending = []  # (issues, deleted_ids) not indexed yet, oldest first
+        self._pending_issues = 0
+        self._version = None  # store version the index is known to cover
+        self._cursor = None   # newest updated_on indexed
+
+    # --- Maintenance ---
+    def build(self):
+        """Indexes every issue of the store once; later changes arrive through the listener."""
+        if not self.local or self._built:
+            return
+        with self._build_lock:
+            if self._built:
+                return
+            # Subscribe first: changes made while the snapshot is indexed are replayed after it
+            self.store.add_issue_listener(self._on_issues_changed)
+            print("🔎 Building the issue search index...")
+            self._version = getattr(self.store, "version", None)
+            seen = set()
+            batch = []
+            for issue in self.store.all_issues():
+                seen.add(issue["id"])
+                batch.append(issue)
+                if len(batch) >= self.batch_size:
+                    self._index(batch)
+                    batch = []
+            self._index(batch)
+            if self.vectors is not None and self.vectors.writable:
+                self._remove_deleted_vectors(seen)
+            self._built = True
+            print(f"🔎 Issue search index ready: {len(self.bm25)} issues")
+        self.apply_pending()
+
+    def _on_issues_changed(self, issues: list, deleted_ids: list):
+        with self._apply_lock:
+            self._pending.append((issues, deleted_ids))
+            self._pending_issues += len(issues) + len(deleted_ids)
+            apply_now = self._built and self._pending_issues >= self.MAX_PENDING
+        if apply_now:
+            self.apply_pending()
+
+    def apply_pending(self):
+        """Indexes the changes queued by the store listener, in order."""
+        with self._apply_lock:
+            pending, self._pending, self._pending_issues = self._pending, [], 0
+            for issues, deleted_ids in pending:
+                if issues:
+                    self._index(issues)
+                if deleted_ids:
+                    self.bm25.remove_many(deleted_ids)
+                    if self.vectors is not None and self.vectors.writable:
+                        self.vectors.remove(deleted_ids)
+            if pending and self.vectors is not None and self.vectors.writable:
+                self.vectors.flush()
+
+    def catch_up(self):
+        """Indexes issues another process wrote to the store since the index last looked."""
+        updated_since = getattr(self.store, "issues_updated_since", None)
+        if updated_since is None or not self._built or self.store.version == self._version:
+            return
+        with self._apply_lock:
+            # Read the version first so writes made during the query are caught next time
+            self._version = self.store.version
+            self._index(updated_since(self._cursor) if self._cursor else list(self.store.all_issues()))
+
+    def _index(self, issues: list):
+        if not issues:
+            return
+        newest = max((issue.get("updated_on") or "" for issue in issues), default="")
+        if newest and (self._cursor is None or newest > self._cursor):
+            self._cursor = newest
+        texts = [issue_text(issue) for issue in issues]
+        self.bm25.add_many((issue["id"], text) for issue, text in zip(issues, texts))
+        if self.vectors is not None and self.vectors.writable:
+            self._embed(issues, texts)
+
+    def _embed(self, issues: list, texts: list):
+        # Only embed issues whose text changed since their vector was stored
+        changed = []
+        for issue, text in zip(issues, texts):
+            fingerprint = text_fingerprint(text)
+            if self.vectors.fingerprint(issue["id"]) != fingerprint:
+                changed.append((issue["id"], text, fingerprint))
+        if changed:
+            ids, changed_texts, fingerprints = zip(*changed)
+            self.vectors.upsert(ids, self.embedder.embed_many(list(changed_texts)), fingerprints)
+
+    def _remove_deleted_vectors(self, seen: set):
+        # Vectors persisted for issues deleted while no process was writing them
+        self.vectors.remove([doc_id for doc_id in self.vectors.doc_ids() if doc_id not in seen])
+        self.vectors.flush()
+
+    def _take_over_vectors(self):
+        """Embeds what changed since the previous writer of the vector index last flushed."""
+        with self._apply_lock:
+            seen = set()
+            batch = []
+            for issue in self.store.all_issues():
+                seen.add(issue["id"])
+                batch.append(issue)
+                if len(batch) >= self.batch_size:
+                    self._embed(batch, [issue_text(issue) for issue in batch])
+                    batch = []
+            self._embed(batch, [issue_text(issue) for issue in batch])
+            self._remove_deleted_vectors(seen)
+
+    # --- Queries ---
+    def ranked_ids(self, query: str, k: int) -> list[int]:
+        """Best ``k`` issue ids for ``query``: BM25, fused with vector similarity when enabled."""
+        # Live Redmine (or a replica before its first sync) answers with its own search
+        search_remote = getattr(self.store, "search_issue_ids", None)
+        if search_remote is not None:
+            ranked = search_remote(query, k)
+            if ranked is not None:
+                return ranked
+        self.build()
+        self.apply_pending()
+        self.catch_up()
+        keyword = [doc_id for doc_id, _ in self.bm25.search(query, k)]
+        if self.vectors is None:
+            return keyword
+        if self.vectors.refresh():
+            self._take_over_vectors()
+        semantic = [
+            doc_id for doc_id, score in self.vectors.search(self.embedder.embed(query), k)
+            if score >= self.min_similarity
+        ]
+        # Reciprocal rank fusion: agreement between both rankings wins
+        scores = {}
+        for ranking in (keyword, semantic):
+            for rank, doc_id in enumerate(ranking):
+                scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+        return sorted(scores, key=lambda doc_id: -scores[doc_id])[:k]
+
+    def search(self, query: str, project_id: int = None, status=None, limit: int = 10) -> list[dict]:
+        """Best matching issue records, optionally restricted to a project and statuses."""
+        statuses = parse_values(status)
+        k = max(limit * 4, 40)
+        while True:
+            ranked = self.ranked_ids(query, k)
+            issues = [
+                issue for issue in self.store.get_issues(ranked)
+                if (project_id is None or issue["project_id"] == project_id)
+                and (statuses is None or issue["status"].lower() in statuses)
+            ]
+            # Filters removed too many: look further down the ranking
+            if len(issues) >= limit or len(ranked) < k or k >= 5000:
+                return issues[:limit]
+            k *= 4
+
+
+def create_issue_search(store=None) -> IssueSearch:
+    """Issue search over ``store`` (default: the tools' store), configured from the environment."""
+    vectors = None
+    if os.environ.get("ISSUE_SEARCH_VECTORS", "false").lower() in ("1", "true", "yes"):
+        vectors = VectorIndex(
+            dim=int(os.environ.get("ISSUE_SEARCH_VECTOR_DIM", 256)),
+            path=os.environ.get("ISSUE_SEARCH_VECTOR_PATH", DEFAULT_VECTOR_PATH)
+        )
+    return IssueSearch(
+        STORE if store is None else store,
+        vectors,
+        min_similarity=float(os.environ.get("ISSUE_SEARCH_MIN_SIMILARITY", 0.2))
+    )
+
+
+@lru_cache(maxsize=1)
+def get_issue_search() -> IssueSearch:
+    """Process-wide issue search used by the search_issues tool."""
+    return create_issue_search()
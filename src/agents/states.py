@@ -1,17 +1,39 @@
-import os
-from typing import Annotated, Literal, TypedDict
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage, BaseMessage
-from langchain_core.tools import Tool
-from langgraph.graph import StateGraph, MessagesState
-from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.memory import MemorySaver
-from src.agents.tools import get_user_name, get_projects_for_user, get_issues_for_project, get_my_assigned_issues
-from langchain.callbacks.tracers import LangChainTracer
-from typing import Annotated, List, TypedDict, Literal
-from pydantic import BaseModel, Field
-import operator
+import uuid
+from typing import Annotated, TypedDict
+from langchain_core.messages import BaseMessage
+
+# Latest messages an update is checked against for repeats; nodes only ever re-send recent ones
+RECENT_MESSAGES = 32
+
+
+def with_ids(messages: list[BaseMessage]) -> list[BaseMessage]:
+    """Gives each message without an id a new one; done once, when messages are created or loaded."""
+    for message in messages:
+        if message.id is None:
+            message.id = str(uuid.uuid4())
+    return messages
+
+
+def append_messages(left: list[BaseMessage], right) -> list[BaseMessage]:
+    """Reducer of the message history: appends what a node returns, skipping messages already there.
+
+    Nodes return only the messages they add, and a message is never replaced
+    or removed, so the history only grows and the checkpointers can store just
+    what was appended since the last step. Only the messages of the update and
+    the latest ones of the history are looked at. The result is a new list (a
+    pointer copy): the checkpointer may still be writing the previous one.
+    """
+    if not isinstance(right, list):
+        right = [right]
+    with_ids(right)
+    known = {message.id for message in left[-(len(right) + RECENT_MESSAGES):]}
+    added = []
+    for message in right:
+        if message.id not in known:
+            known.add(message.id)
+            added.append(message)
+    return left + added if added else left
 
 class StatusMessagesState(TypedDict):
-    messages: list[BaseMessage] # List of messages
+    messages: Annotated[list[BaseMessage], append_messages] # Conversation, append-only
     user: str # User name
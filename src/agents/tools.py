@@ -1,41 +1,20 @@
 import os
-from typing import Annotated, Literal, TypedDict
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
-from langchain_core.tools import Tool
-from langgraph.graph import StateGraph, MessagesState
-from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.memory import MemorySaver
-from src.agents.database import MOCK_DB
-## DATABASE
-
-MOCK_DB = {
-    "users": [{"id": 101, "username": "dave"}, {"id": 102, "username": "sally"}],
-    "projects": [
-        {"id": 201, "name": "Project Phoenix", "members": [101, 102]},
-        {"id": 202, "name": "Internal Tools", "members": [101]},
-        {"id": 203, "name": "Mobile App Q3", "members": [101, 102]},
-    ],
-    "issues": [
-        {"id": 1, "project_id": 201, "subject": "Fix login button", "status": "Open", "priority": "High", "assigned_to": 101},
-        {"id": 2, "project_id": 201, "subject": "Update documentation", "status": "In Progress", "priority": "Normal", "assigned_to": 102},
-        {"id": 3, "project_id": 203, "subject": "Deploy to TestFlight", "status": "Open", "priority": "High", "assigned_to": 101},
-        {"id": 4, "project_id": 202, "subject": "Setup CI/CD pipeline", "status": "Closed", "priority": "Normal", "assigned_to": 101},
-        {"id": 5, "project_id": 203, "subject": "Fix crash on iOS 17", "status": "Open", "priority": "Critical", "assigned_to": 102},
-    ],
-}
+from src.agents.database import STORE
+from src.agents.memo import memoized
+from src.agents.encoding import next_page
+from src.agents.search import get_issue_search
 
 
 # --- 2. TOOL FUNCTIONS ---
+# Results are memoized per request and shared across requests for the given TTL (seconds);
+# any write to the store invalidates them
+@memoized(ttl=3600)
 def get_user_name(username: str) -> int:
     """Finds the Redmine username for a given username. The result is the user ID."""
     print(f"🔍 Calling Tool: get_user_name(username='{username}')")
-    for user in MOCK_DB["users"]:
-        if user["username"].lower() == username.lower():
-            return user["id"]
-    return None
+    return STORE.find_user_id(username)
 
+@memoized(ttl=600)
 def get_projects_for_user(user_id) -> list[str]:
     """Gets a list of project names for a given user ID."""
     print(f"📁 Calling Tool: get_projects_for_user(user_id={user_id})")
@@ -47,73 +26,120 @@ def get_projects_for_user(user_id) -> list[str]:
         print(f"❌ Cannot convert user_id to integer: {user_id}")
         return []
     
-    project_names = []
-    for project in MOCK_DB["projects"]:
-        if user_id_int in project["members"]:
-            project_names.append(project["name"])
-    
-    return project_names
+    return [project["name"] for project in STORE.projects_for_member(user_id_int)]
 
-def get_issues_for_project(project_name: str, status: str = None, priority: str = None) -> list[dict]:
-    """Fetches issues from a specific project. Optionally filter by status and/or priority."""
-    print(f"🎫 Calling Tool: get_issues_for_project(project_name='{project_name}', status='{status}', priority='{priority}')")
+@memoized(ttl=60)
+def get_issues_for_project(project_name: str, status: str = None, priority: str = None, subject: str = None,
+                           sort: str = "id", limit: int = None, offset: int = 0, count_only: bool = False):
+    """Fetches issues from a specific project. Optionally filter by status, priority and subject text,
+    sort them, page through them, or only count them."""
+    print(f"🎫 Calling Tool: get_issues_for_project(project_name='{project_name}', status='{status}', priority='{priority}', "
+          f"subject='{subject}', sort='{sort}', limit={limit}, offset={offset}, count_only={count_only})")
     
-    project = next((p for p in MOCK_DB["projects"] if p["name"].lower() == project_name.lower()), None)
+    project = STORE.find_project(project_name)
     if not project:
-        return []
-    
-    issues = []
-    for issue in MOCK_DB["issues"]:
-        if issue["project_id"] == project["id"]:
-            # Apply filters if provided
-            if status and issue["status"].lower() != status.lower():
-                continue
-            if priority and issue["priority"].lower() != priority.lower():
-                continue
-            
-            # Get assignee username
-            assignee = next((u["username"] for u in MOCK_DB["users"] if u["id"] == issue["assigned_to"]), "Unassigned")
-            
-            issues.append({
-                "id": issue["id"],
-                "subject": issue["subject"],
-                "status": issue["status"],
-                "priority": issue["priority"],
-                "assignee": assignee
-            })
+        return count_summary(0) if count_only else []
     
-    return issues
+    issues = STORE.query_issues(
+        project_id=project["id"], status=status, priority=priority, subject=subject,
+        sort=sort, limit=limit, offset=offset, count_only=count_only
+    )
+    if count_only:
+        return count_summary(issues)
+    return [
+        {
+            "id": issue["id"],
+            "subject": issue["subject"],
+            "status": issue["status"],
+            "priority": issue["priority"],
+            "assignee": STORE.get_username(issue["assigned_to"], "Unassigned")
+        }
+        for issue in issues
+    ]
 
-def get_my_assigned_issues(user_id_intd: str, status: str = None) -> list[dict]:
-    """Gets all issues assigned to a specific user, optionally filtered by status."""
-    print(f"👤 Calling Tool: get_my_assigned_issues(user_id='{user_id_intd}', status='{status}')")
+@memoized(ttl=60)
+def get_my_assigned_issues(user_id_intd: str, status: str = None, priority: str = None, subject: str = None,
+                           sort: str = "id", limit: int = None, offset: int = 0, count_only: bool = False):
+    """Gets the issues assigned to a specific user, with the same filters as get_issues_for_project."""
+    print(f"👤 Calling Tool: get_my_assigned_issues(user_id='{user_id_intd}', status='{status}', priority='{priority}', "
+          f"subject='{subject}', sort='{sort}', limit={limit}, offset={offset}, count_only={count_only})")
     
     if not user_id_intd:
-        return []
+        return count_summary(0) if count_only else []
     
     user_id_intd = int(user_id_intd)
-    issues = []
-    for issue in MOCK_DB["issues"]:
-        if issue["assigned_to"] == user_id_intd:
-            # Apply status filter if provided
-            if status and issue["status"].lower() != status.lower():
-                continue
-                
-            # Get project name
-            project = next((p["name"] for p in MOCK_DB["projects"] if p["id"] == issue["project_id"]), "Unknown Project")
-            
-            issues.append({
-                "id": issue["id"],
-                "subject": issue["subject"],
-                "status": issue["status"],
-                "priority": issue["priority"],
-                "project": project
-            })
+    issues = STORE.query_issues(
+        assigned_to=user_id_intd, status=status, priority=priority, subject=subject,
+        sort=sort, limit=limit, offset=offset, count_only=count_only
+    )
+    if count_only:
+        return count_summary(issues)
+    return [
+        {
+            "id": issue["id"],
+            "subject": issue["subject"],
+            "status": issue["status"],
+            "priority": issue["priority"],
+            "project": STORE.get_project_name(issue["project_id"], "Unknown Project")
+        }
+        for issue in issues
+    ]
+
+
+@memoized(ttl=60)
+def search_issues(query: str, project_name: str = None, status: str = None, limit: int = 10) -> list[dict]:
+    """Finds the issues whose subject or description best match a free-text query, best first."""
+    print(f"🔎 Calling Tool: search_issues(query='{query}', project_name='{project_name}', status='{status}', limit={limit})")
+    
+    project_id = None
+    if project_name:
+        project = STORE.find_project(project_name)
+        if not project:
+            return []
+        project_id = project["id"]
     
-    return issues
+    return [
+        {
+            "id": issue["id"],
+            "subject": issue["subject"],
+            "status": issue["status"],
+            "priority": issue["priority"],
+            "project": STORE.get_project_name(issue["project_id"], "Unknown Project")
+        }
+        for issue in get_issue_search().search(query, project_id=project_id, status=status, limit=limit)
+    ]
+
+
+def count_summary(count: int) -> str:
+    return f"{count} matching issues"
 
 
+@memoized(ttl=600)
 def get_all_projects() -> list[str]:
     """Gets a list of project names."""
     print("📁 Calling Tool: get_all_projects()")
-    return [p["name"] for p in MOCK_DB["projects"]]
+    return [p["name"] for p in STORE.all_projects()]
+
+
+def get_more_results(cursor: str, run) -> str:
+    """Returns the next rows of a truncated tool result; ``run(tool_name, args)`` repeats the call behind the cursor."""
+    print(f"📄 Calling Tool: get_more_results(cursor='{cursor}')")
+    return next_page(cursor, run)
+
+
+# Tool results from a replica older than this many seconds say so
+STALE_AFTER_SECONDS = float(os.environ.get("REDMINE_STALE_AFTER_SECONDS", 300))
+
+
+def data_staleness():
+    """Seconds since the tools' data was synced from Redmine; None for live or mock data."""
+    staleness_seconds = getattr(STORE, "staleness_seconds", None)
+    return staleness_seconds() if staleness_seconds else None
+
+
+def staleness_note() -> str:
+    """Note appended to tool results when the replica is out of date, otherwise ''."""
+    staleness = data_staleness()
+    if staleness is None or staleness < STALE_AFTER_SECONDS:
+        return ""
+    return f"\n(Note: Redmine data last synced {int(staleness // 60)} minutes ago; recent changes may be missing.)"
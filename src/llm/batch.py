@@ -0,0 +1,87 @@
+import asyncio
+import io
+import json
+import logging
+import os
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+# Batches in one of these states will not change any more
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class OpenAIBatch:
+    """Chat completions through OpenAI's Batch API: half the price, answered within the completion window.
+
+    ``submit`` uploads the requests as a JSON Lines file and creates the batch,
+    ``poll`` yields its status until it is done and ``results`` downloads the
+    replies as ``{custom_id: (message, error)}``.
+    """
+
+    def __init__(self, poll_seconds: float = 30, completion_window: str = "24h", client=None):
+        self.poll_seconds = poll_seconds
+        self.completion_window = completion_window
+        self.client = client or openai.AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+
+    @classmethod
+    def from_env(cls) -> "OpenAIBatch":
+        """Reads BATCH_POLL_SECONDS and BATCH_COMPLETION_WINDOW (OpenAI only accepts 24h for now)."""
+        return cls(
+            poll_seconds=float(os.environ.get("BATCH_POLL_SECONDS", 30)),
+            completion_window=os.environ.get("BATCH_COMPLETION_WINDOW", "24h")
+        )
+
+    async def aclose(self):
+        await self.client.close()
+
+    async def submit(self, requests: dict) -> str:
+        """Creates a batch of chat completions from ``{custom_id: request body}``; returns its id."""
+        lines = [
+            json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body},
+                       ensure_ascii=False)
+            for custom_id, body in requests.items()
+        ]
+        upload = io.BytesIO("\n".join(lines).encode("utf-8"))
+        upload.name = "batch.jsonl"
+        file = await self.client.files.create(file=upload, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=file.id, endpoint="/v1/chat/completions", completion_window=self.completion_window
+        )
+        logger.info(f"Submitted batch {batch.id} with {len(lines)} requests")
+        return batch.id
+
+    async def retrieve(self, batch_id: str):
+        """The batch's current state: status, request counts and result files."""
+        return await self.client.batches.retrieve(batch_id)
+
+    async def poll(self, batch_id: str):
+        """Yields the batch every ``poll_seconds`` until it reaches a terminal status."""
+        while True:
+            batch = await self.retrieve(batch_id)
+            yield batch
+            if batch.status in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(self.poll_seconds)
+
+    async def results(self, batch) -> dict:
+        """``{custom_id: (message, error)}`` of a finished batch; message is the completion's message dict."""
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                if record.get("error") or response.get("status_code") != 200:
+                    error = record.get("error") or (response.get("body") or {}).get("error") or {}
+                    results[record["custom_id"]] = (None, error.get("message") or "Batch request failed")
+                else:
+                    results[record["custom_id"]] = (response["body"]["choices"][0]["message"], None)
+        if batch.status != "completed":
+            logger.warning(f"Batch {batch.id} ended as {batch.status}")
+        return results
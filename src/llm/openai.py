@@ -1,7 +1,13 @@
 import os
+import time
 import openai
 from dotenv import load_dotenv
 import logging
+from src.utils.history import compact_history, get_policy
+from src.utils.cache import get_response_cache, is_cacheable
+from src.llm.resilience import get_resilient_llm, no_hedging
+from src.llm.usage import TIME_TO_FIRST_TOKEN, record_token_usage
+from src.utils.tracing import span
 
 # Configure logging
 logging.basicConfig(
@@ -13,10 +19,50 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# Kept first and identical for every request so OpenAI can reuse the cached prompt prefix
+SYSTEM_PROMPT = """You are a helpful Redmine project management assistant. 
+                You can help with tickets, projects, users, and other Redmine-related queries. 
+                Provide concise, accurate information about Redmine functionality and best practices.
+                If you don't know something, admit it rather than making up information."""
+
+
+def build_messages(user_query, conversation_history=None):
+    """Builds the chat completion messages: system prompt, compacted history and the new query."""
+    # Add system message to set context
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    
+    # Add conversation history if provided
+    if conversation_history:
+        messages.extend(conversation_history)
+    
+    # Add the current user query
+    messages.append({"role": "user", "content": user_query})
+    
+    # Keep the prompt within the chat endpoint's token budget
+    return compact_history(messages, get_policy("chat"))
+
+
+def cached_response(user_query, conversation_history=None):
+    """Returns the cached answer for an opening question, or None."""
+    cache = get_response_cache()
+    if cache is None or not is_cacheable(conversation_history):
+        return None
+    return cache.get(user_query, scope="chat")
+
+
+def cache_response(user_query, conversation_history, response):
+    """Stores a successful answer to an opening question."""
+    cache = get_response_cache()
+    if cache is not None and response and is_cacheable(conversation_history):
+        cache.put(user_query, response, scope="chat")
+
+
 class OpenAI:
 
     def __init__(self):
-        self.client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        # Models, timeouts and retries come from the resilience policy (LLM_CHAT_*)
+        self.llm = get_resilient_llm("chat")
+        self.client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"), timeout=self.llm.timeout, max_retries=0)
 
     def get_assistant_response(self, user_query, conversation_history=None):
         """
@@ -34,36 +80,127 @@ class OpenAI:
             if not self.client:
                 return "OpenAI API key not configured. Please set the OPENAI_API_KEY environment variable."
             
+            # Repeated opening questions are answered from the cache
+            cached = cached_response(user_query, conversation_history)
+            if cached is not None:
+                return cached
+            
             # Prepare conversation history
-            messages = []
+            messages = build_messages(user_query, conversation_history)
             
-            # Add system message to set context
-            messages.append({
-                "role": "system",
-                "content": """You are a helpful Redmine project management assistant. 
-                You can help with tickets, projects, users, and other Redmine-related queries. 
-                Provide concise, accurate information about Redmine functionality and best practices.
-                If you don't know something, admit it rather than making up information."""
-            })
+            # Call OpenAI API, retrying transient errors and falling back to the secondary model
+            with span("llm", "chat") as llm_span:
+                response = self.llm.call(lambda model: self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=500,
+                    temperature=0.7
+                ))
+                llm_span.set(**(record_token_usage("chat", response) or {}))
+            
+            # Extract, cache and return the response text
+            answer = response.choices[0].message.content
+            cache_response(user_query, conversation_history, answer)
+            return answer
+        
+        except Exception as e:
+            logger.error(f"Error calling OpenAI API: {str(e)}")
+            return f"I'm sorry, but I encountered an error: {str(e)}"
+
+
+class AsyncOpenAI:
+    """Async counterpart of OpenAI, safe to await from the FastAPI event loop."""
+
+    def __init__(self):
+        self.llm = get_resilient_llm("chat")
+        self.client = openai.AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"), timeout=self.llm.timeout, max_retries=0)
+
+    async def aclose(self):
+        """Closes the pooled HTTP connections; called when the API shuts down."""
+        await self.client.close()
+
+    async def get_assistant_response(self, user_query, conversation_history=None):
+        """
+        Get a response from the OpenAI model without blocking the event loop.
+        
+        Args:
+            user_query (str): The user's question or request
+            conversation_history (list, optional): Previous messages, same format as
+                                                OpenAI.get_assistant_response
+        
+        Returns:
+            str: The assistant's response
+        """
+        try:
+            if not self.client:
+                return "OpenAI API key not configured. Please set the OPENAI_API_KEY environment variable."
             
-            # Add conversation history if provided
-            if conversation_history:
-                messages.extend(conversation_history)
+            cached = cached_response(user_query, conversation_history)
+            if cached is not None:
+                return cached
             
-            # Add the current user query
-            messages.append({"role": "user", "content": user_query})
+            messages = build_messages(user_query, conversation_history)
             
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",  # You can change to a different model if needed
-                messages=messages,
-                max_tokens=500,
-                temperature=0.7
-            )
+            with span("llm", "chat") as llm_span:
+                response = await self.llm.acall(lambda model: self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=500,
+                    temperature=0.7
+                ))
+                llm_span.set(**(record_token_usage("chat", response) or {}))
             
-            # Extract and return the response text
-            return response.choices[0].message.content
+            answer = response.choices[0].message.content
+            cache_response(user_query, conversation_history, answer)
+            return answer
         
+        except openai.RateLimitError:
+            # The API answers 503 with Retry-After instead of an apology
+            raise
         except Exception as e:
             logger.error(f"Error calling OpenAI API: {str(e)}")
             return f"I'm sorry, but I encountered an error: {str(e)}"
+
+    async def stream_assistant_response(self, user_query, conversation_history=None):
+        """
+        Stream the model's reply token by token.
+        
+        Args:
+            user_query (str): The user's question or request
+            conversation_history (list, optional): Previous messages, same format as
+                                                OpenAI.get_assistant_response
+        
+        Yields:
+            str: Pieces of the assistant's response as they are generated
+        """
+        cached = cached_response(user_query, conversation_history)
+        if cached is not None:
+            yield cached
+            return
+        
+        messages = build_messages(user_query, conversation_history)
+        
+        # Retried until the stream opens; a hedged duplicate would open a second stream
+        started = time.perf_counter()
+        parts = []
+        # The span lasts until the last chunk
+        with span("llm", "chat") as llm_span:
+            with no_hedging():
+                stream = await self.llm.acall(lambda model: self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=500,
+                    temperature=0.7,
+                    stream=True,
+                    # The last chunk carries the usage, cached prompt tokens included
+                    stream_options={"include_usage": True}
+                ))
+            async for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    llm_span.set(**record_token_usage("chat", chunk))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if not parts:
+                        TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - started, endpoint="chat")
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        cache_response(user_query, conversation_history, "".join(parts))
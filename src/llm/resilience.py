@@ -0,0 +1,232 @@
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+import openai
+
+from src.utils.admission import upstream_retry_after
+from src.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+ATTEMPTS = REGISTRY.counter(
+    "llm_call_attempts_total", "LLM call attempts by endpoint, model and outcome", ("endpoint", "model", "outcome")
+)
+ATTEMPT_SECONDS = REGISTRY.histogram(
+    "llm_attempt_seconds", "Latency of single LLM attempts by endpoint, model and outcome", ("endpoint", "model", "outcome")
+)
+HEDGES = REGISTRY.counter("llm_hedged_requests_total", "Duplicate LLM requests sent for slow calls", ("endpoint",))
+FALLBACKS = REGISTRY.counter(
+    "llm_fallback_calls_total", "LLM attempts sent to the fallback model", ("endpoint",)
+)
+
+# Hedging is off inside streaming runs: a duplicate request would stream its tokens too
+_HEDGING_ALLOWED = contextvars.ContextVar("llm_hedging_allowed", default=True)
+
+
+@contextmanager
+def no_hedging():
+    """Disables hedged requests for the LLM calls made inside the block."""
+    token = _HEDGING_ALLOWED.set(False)
+    try:
+        yield
+    finally:
+        try:
+            _HEDGING_ALLOWED.reset(token)
+        except ValueError:
+            # Async generators may be closed from another context
+            pass
+
+
+def is_retryable(error: Exception) -> bool:
+    """429s, 5xx, connection errors and attempt timeouts are worth another try; 4xx are not."""
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+class ResilientLLM:
+    """Runs LLM calls with per-attempt timeouts, jittered retries, hedging and a fallback model.
+
+    ``call(model)`` performs one request with the given model name. Failed
+    attempts that are worth retrying wait an exponentially growing, fully jittered
+    delay (at least the upstream Retry-After) before the next one; after
+    ``fallback_after`` failures the remaining attempts go to the fallback model.
+    When most recent calls to the primary model failed, it is considered degraded
+    and calls start on the fallback model for ``cooldown_seconds``.
+
+    With ``hedge`` enabled, an async attempt still running after the
+    ``hedge_quantile`` of recent latencies gets a duplicate request, and whichever
+    answers first wins. Sync calls cannot cancel the loser, so they never hedge.
+    """
+
+    def __init__(self, endpoint: str, model: str, fallback_model: str = None, timeout: float = 30,
+                 max_attempts: int = 3, backoff_base: float = 0.5, backoff_max: float = 8,
+                 fallback_after: int = 2, hedge: bool = False, hedge_quantile: float = 0.95,
+                 cooldown_seconds: float = 30):
+        self.endpoint = endpoint
+        self.model = model
+        self.fallback_model = fallback_model
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.fallback_after = fallback_after
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.cooldown_seconds = cooldown_seconds
+        self._latencies = deque(maxlen=200)  # seconds of recent successful primary attempts
+        self._outcomes = deque(maxlen=20)    # True/False for recent primary attempts
+        self._degraded_until = 0.0
+
+    @classmethod
+    def from_env(cls, endpoint: str, **defaults) -> "ResilientLLM":
+        """Reads LLM_<ENDPOINT>_MODEL, _FALLBACK_MODEL, _TIMEOUT_SECONDS, _MAX_ATTEMPTS and _HEDGE."""
+        prefix = f"LLM_{endpoint.upper()}_"
+        llm = cls(endpoint, **defaults)
+        llm.model = os.environ.get(prefix + "MODEL", llm.model)
+        llm.fallback_model = os.environ.get(prefix + "FALLBACK_MODEL", llm.fallback_model) or None
+        llm.timeout = float(os.environ.get(prefix + "TIMEOUT_SECONDS", llm.timeout))
+        llm.max_attempts = int(os.environ.get(prefix + "MAX_ATTEMPTS", llm.max_attempts))
+        llm.hedge = os.environ.get(prefix + "HEDGE", str(llm.hedge)).lower() in ("1", "true", "yes")
+        return llm
+
+    # --- Policy ---
+    def models(self) -> list[str]:
+        """Models that calls may use, primary first."""
+        return [self.model] + ([self.fallback_model] if self.fallback_model else [])
+
+    @property
+    def degraded(self) -> bool:
+        return time.monotonic() < self._degraded_until
+
+    def _model_for(self, attempt: int) -> str:
+        if self.fallback_model and (self.degraded or attempt >= self.fallback_after):
+            return self.fallback_model
+        return self.model
+
+    def hedge_delay(self):
+        """Seconds after which a duplicate request is sent, or None (disabled or too few samples)."""
+        if not self.hedge or not _HEDGING_ALLOWED.get() or len(self._latencies) < 20:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(int(len(ordered) * self.hedge_quantile), len(ordered) - 1)]
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        # Full jitter: retries of many callers spread out instead of arriving together
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if isinstance(error, openai.RateLimitError):
+            delay = max(delay, upstream_retry_after(error, 0))
+        return delay
+
+    def _record(self, model: str, outcome: str, seconds: float):
+        ATTEMPTS.inc(endpoint=self.endpoint, model=model, outcome=outcome)
+        ATTEMPT_SECONDS.observe(seconds, endpoint=self.endpoint, model=model, outcome=outcome)
+        if model != self.model:
+            return
+        if outcome == "ok":
+            self._latencies.append(seconds)
+        self._outcomes.append(outcome == "ok")
+        failures = self._outcomes.count(False)
+        if self.fallback_model and len(self._outcomes) >= 10 and failures * 2 >= len(self._outcomes):
+            if not self.degraded:
+                logger.warning(f"{self.model} is failing ({failures}/{len(self._outcomes)}), "
+                               f"using {self.fallback_model} for {self.cooldown_seconds:.0f}s")
+            self._degraded_until = time.monotonic() + self.cooldown_seconds
+            # Give the primary a clean slate when the cooldown ends
+            self._outcomes.clear()
+
+    def _give_up(self, attempt: int, error: Exception) -> bool:
+        if not is_retryable(error) or attempt + 1 >= self.max_attempts:
+            return True
+        # Waiting longer than the backoff cap belongs to the caller (503 + Retry-After)
+        return isinstance(error, openai.RateLimitError) and upstream_retry_after(error, 0) > self.backoff_max
+
+    @staticmethod
+    def _outcome(error: Exception) -> str:
+        if isinstance(error, asyncio.TimeoutError):
+            return "timeout"
+        return "rate_limited" if isinstance(error, openai.RateLimitError) else "error"
+
+    # --- Calls ---
+    def call(self, call):
+        """Runs ``call(model)`` with retries and fallback; the client enforces the attempt timeout."""
+        for attempt in range(self.max_attempts):
+            model = self._model_for(attempt)
+            if model != self.model:
+                FALLBACKS.inc(endpoint=self.endpoint)
+            start = time.monotonic()
+            try:
+                result = call(model)
+            except Exception as e:
+                self._record(model, self._outcome(e), time.monotonic() - start)
+                if self._give_up(attempt, e):
+                    raise
+                delay = self._backoff(attempt, e)
+                logger.warning(f"LLM call to {model} failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            self._record(model, "ok", time.monotonic() - start)
+            return result
+
+    async def acall(self, call):
+        """Async version of call: ``call(model)`` returns an awaitable; attempts may be hedged."""
+        for attempt in range(self.max_attempts):
+            model = self._model_for(attempt)
+            if model != self.model:
+                FALLBACKS.inc(endpoint=self.endpoint)
+            start = time.monotonic()
+            try:
+                result = await self._attempt(call, model)
+            except Exception as e:
+                self._record(model, self._outcome(e), time.monotonic() - start)
+                if self._give_up(attempt, e):
+                    raise
+                delay = self._backoff(attempt, e)
+                logger.warning(f"LLM call to {model} failed ({e!r}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            self._record(model, "ok", time.monotonic() - start)
+            return result
+
+    async def _attempt(self, call, model: str):
+        hedge_delay = self.hedge_delay() if model == self.model else None
+        first = asyncio.ensure_future(asyncio.wait_for(call(model), self.timeout))
+        if hedge_delay is None:
+            return await first
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done:
+                HEDGES.inc(endpoint=self.endpoint)
+                tasks.add(asyncio.ensure_future(asyncio.wait_for(call(model), self.timeout)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+# Defaults per endpoint: the plain chat, the tool-using agent and the agent's small-model route
+_DEFAULTS = {
+    "chat": {"model": "gpt-3.5-turbo", "fallback_model": "gpt-4o-mini", "timeout": 30},
+    "agent": {"model": "gpt-4.1", "fallback_model": "gpt-4.1-mini", "timeout": 60},
+    "agent_small": {"model": "gpt-4.1-mini", "fallback_model": "gpt-4.1", "timeout": 30},
+}
+
+
+@lru_cache(maxsize=None)
+def get_resilient_llm(endpoint: str) -> ResilientLLM:
+    return ResilientLLM.from_env(endpoint, **_DEFAULTS.get(endpoint, {}))
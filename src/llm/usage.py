@@ -0,0 +1,58 @@
+from src.utils.metrics import REGISTRY
+
+PROMPT_TOKENS = REGISTRY.counter(
+    "llm_prompt_tokens_total",
+    "Prompt tokens by endpoint and whether OpenAI served them from its prompt cache (hit, miss)",
+    ("endpoint", "cache")
+)
+CALL_TOKENS = REGISTRY.histogram(
+    "llm_call_tokens", "Tokens per LLM call by endpoint and kind (prompt, cached, completion)", ("endpoint", "kind"),
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+)
+TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    "llm_time_to_first_token_seconds", "Time from sending a streamed LLM request to its first token", ("endpoint",)
+)
+
+
+def token_usage(response):
+    """{"model", "prompt", "cached", "completion"} token counts of an LLM response, or None if not reported.
+
+    Accepts LangChain messages (``usage_metadata``) as well as OpenAI completions
+    and stream chunks (``usage``).
+    """
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata:
+        return {
+            "model": (getattr(response, "response_metadata", None) or {}).get("model_name"),
+            "prompt": metadata.get("input_tokens", 0),
+            "cached": (metadata.get("input_token_details") or {}).get("cache_read", 0) or 0,
+            "completion": metadata.get("output_tokens", 0),
+        }
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "model": getattr(response, "model", None),
+        "prompt": usage.prompt_tokens,
+        "cached": (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0,
+        "completion": usage.completion_tokens,
+    }
+
+
+def record_token_usage(endpoint: str, response):
+    """Records the tokens of an LLM response (cache hits and misses, per-call sizes); returns its token_usage."""
+    usage = token_usage(response)
+    if usage is not None:
+        PROMPT_TOKENS.inc(usage["cached"], endpoint=endpoint, cache="hit")
+        PROMPT_TOKENS.inc(usage["prompt"] - usage["cached"], endpoint=endpoint, cache="miss")
+        for kind in ("prompt", "cached", "completion"):
+            CALL_TOKENS.observe(usage[kind], endpoint=endpoint, kind=kind)
+    return usage
+
+
+def cache_hit_rate(endpoint: str) -> float:
+    """Share of the endpoint's prompt tokens served from OpenAI's prompt cache so far."""
+    hits = PROMPT_TOKENS.value(endpoint=endpoint, cache="hit")
+    total = hits + PROMPT_TOKENS.value(endpoint=endpoint, cache="miss")
+    return hits / total if total else 0.0
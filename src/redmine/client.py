@@ -0,0 +1,170 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+
+class RedmineError(Exception):
+    """Raised when the Redmine API answers with an error status."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Redmine API error {status_code}: {message}")
+        self.status_code = status_code
+
+
+class RedmineClient:
+    """Thin client for the Redmine REST API.
+
+    All requests share one keep-alive connection pool. List endpoints are read
+    with offset/limit pagination: the first page reports ``total_count`` and the
+    remaining pages are fetched concurrently, at most ``max_concurrency`` ahead of
+    the consumer, while records are yielded in order. A large project is never
+    held in memory at once.
+    """
+
+    def __init__(self, base_url: str, api_key: str = None, page_size: int = 100,
+                 max_concurrency: int = 4, timeout: float = 10.0, max_connections: int = 10):
+        self.base_url = base_url.rstrip("/")
+        self.page_size = min(page_size, 100)  # Redmine caps limit at 100
+        self.max_concurrency = max_concurrency
+        headers = {"Accept": "application/json"}
+        if api_key:
+            headers["X-Redmine-API-Key"] = api_key
+        self._http = httpx.Client(
+            base_url=self.base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="redmine")
+        self._lock = threading.Lock()
+        self._enumerations = {}
+
+    @classmethod
+    def from_env(cls) -> "RedmineClient":
+        """Reads REDMINE_URL, REDMINE_API_KEY, REDMINE_PAGE_SIZE and REDMINE_MAX_CONCURRENCY."""
+        return cls(
+            base_url=os.environ["REDMINE_URL"],
+            api_key=os.environ.get("REDMINE_API_KEY"),
+            page_size=int(os.environ.get("REDMINE_PAGE_SIZE", 100)),
+            max_concurrency=int(os.environ.get("REDMINE_MAX_CONCURRENCY", 4)),
+            timeout=float(os.environ.get("REDMINE_TIMEOUT_SECONDS", 10))
+        )
+
+    def get(self, path: str, params: dict = None) -> dict:
+        """GETs one JSON resource, e.g. ``client.get("/users/5.json", {"include": "memberships"})``."""
+        response = self._http.get(path, params={k: v for k, v in (params or {}).items() if v is not None})
+        if response.status_code >= 400:
+            raise RedmineError(response.status_code, response.text[:200])
+        return response.json()
+
+    def iter_pages(self, path: str, key: str, params: dict = None, offset: int = 0, limit: int = None):
+        """Yields the records under ``key`` from every page of a paginated list endpoint.
+
+        ``offset`` and ``limit`` select a window of the full list; only the pages
+        covering it are requested.
+        """
+        params = dict(params or {})
+        page_size = self.page_size if limit is None else max(min(self.page_size, limit), 1)
+        first = self.get(path, {**params, "offset": offset, "limit": page_size})
+        records = first.get(key, [])
+        yield from records if limit is None else records[:limit]
+
+        total = first.get("total_count", 0)
+        end = total if limit is None else min(total, offset + limit)
+        offsets = deque(range(offset + page_size, end, page_size))
+        pending = deque()
+        try:
+            while offsets or pending:
+                # Keep up to max_concurrency pages in flight ahead of the consumer
+                while offsets and len(pending) < self.max_concurrency:
+                    page_offset = offsets.popleft()
+                    page_params = {**params, "offset": page_offset, "limit": min(page_size, end - page_offset)}
+                    pending.append(self._executor.submit(self.get, path, page_params))
+                yield from pending.popleft().result().get(key, [])
+        finally:
+            # The consumer stopped early: drop the pages nobody will read
+            for future in pending:
+                future.cancel()
+
+    def count(self, path: str, params: dict = None) -> int:
+        """Number of records a list endpoint would return, from a one-record request."""
+        return self.get(path, {**(params or {}), "offset": 0, "limit": 1}).get("total_count", 0)
+
+    def iter_issues(self, project_id=None, assigned_to_id=None, status_id="*", priority_id=None,
+                    updated_on: str = None, subject: str = None, sort: str = "id", include: str = None,
+                    offset: int = 0, limit: int = None):
+        """Streams issues; filters map to the /issues.json query parameters.
+
+        ``status_id`` and ``priority_id`` accept several ids joined with ``|``.
+        ``updated_on`` and ``subject`` take Redmine's operator syntax, e.g.
+        ``">=2024-05-01T10:00:00Z"`` or ``"~login"`` (contains).
+        """
+        return self.iter_pages("/issues.json", "issues", self._issue_params(
+            project_id, assigned_to_id, status_id, priority_id, updated_on, subject, sort, include
+        ), offset=offset, limit=limit)
+
+    def count_issues(self, project_id=None, assigned_to_id=None, status_id="*", priority_id=None,
+                     updated_on: str = None, subject: str = None) -> int:
+        return self.count("/issues.json", self._issue_params(
+            project_id, assigned_to_id, status_id, priority_id, updated_on, subject, None, None
+        ))
+
+    @staticmethod
+    def _issue_params(project_id, assigned_to_id, status_id, priority_id, updated_on, subject, sort, include) -> dict:
+        return {
+            "project_id": project_id,
+            "assigned_to_id": assigned_to_id,
+            "status_id": status_id,
+            "priority_id": priority_id,
+            "updated_on": updated_on,
+            "subject": subject,
+            "sort": sort,
+            "include": include,
+        }
+
+    def get_issues(self, issue_ids) -> list[dict]:
+        """Issues by id (any status), using the issue_id list filter."""
+        issue_ids = list(issue_ids)
+        if not issue_ids:
+            return []
+        params = {"issue_id": ",".join(str(i) for i in issue_ids), "status_id": "*"}
+        return list(self.iter_pages("/issues.json", "issues", params))
+
+    def search_issues(self, query: str, limit: int = 25) -> list[int]:
+        """Ids of the issues Redmine's full-text search ranks first for ``query``."""
+        params = {"q": query, "issues": 1, "scope": "all"}
+        return [result["id"] for result in self.iter_pages("/search.json", "results", params, limit=limit)]
+
+    def iter_projects(self, include: str = None):
+        return self.iter_pages("/projects.json", "projects", {"include": include})
+
+    def iter_users(self, name: str = None):
+        return self.iter_pages("/users.json", "users", {"name": name})
+
+    def iter_memberships(self, project_id):
+        return self.iter_pages(f"/projects/{project_id}/memberships.json", "memberships")
+
+    def get_user(self, user_id, include: str = "memberships") -> dict:
+        """One user with the projects they belong to, resolved in a single request."""
+        return self.get(f"/users/{user_id}.json", {"include": include})["user"]
+
+    def issue_statuses(self) -> dict:
+        """Maps lowercased status names to ids (fetched once)."""
+        return self._enumeration("/issue_statuses.json", "issue_statuses")
+
+    def issue_priorities(self) -> dict:
+        """Maps lowercased priority names to ids (fetched once)."""
+        return self._enumeration("/enumerations/issue_priorities.json", "issue_priorities")
+
+    def _enumeration(self, path: str, key: str) -> dict:
+        with self._lock:
+            if key not in self._enumerations:
+                self._enumerations[key] = {item["name"].lower(): item["id"] for item in self.get(path)[key]}
+            return self._enumerations[key]
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._http.close()
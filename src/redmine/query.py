@@ -0,0 +1,49 @@
+# Redmine's default priorities (plus the mock data's "Critical"), lowest first
+PRIORITY_RANK = {"low": 1, "normal": 2, "high": 3, "urgent": 4, "critical": 4, "immediate": 5}
+
+# Supported sort orders: ascending id, most important first, most recently updated first
+SORT_KEYS = ("id", "priority", "updated")
+
+
+def priority_rank(priority) -> int:
+    return PRIORITY_RANK.get(str(priority or "").lower(), 0)
+
+
+def parse_values(value):
+    """Turns 'Open, In Progress' or ['Open', 'In Progress'] into ('open', 'in progress'); None for no filter."""
+    if value is None:
+        return None
+    items = value.split(",") if isinstance(value, str) else value
+    values = tuple(dict.fromkeys(str(item).strip().lower() for item in items if str(item).strip()))
+    return values or None
+
+
+def check_sort(sort: str) -> str:
+    sort = (sort or "id").lower()
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort '{sort}'; use one of {', '.join(SORT_KEYS)}")
+    return sort
+
+
+def sort_key(sort: str):
+    """Key function ordering issue records for ``sort`` (see SORT_KEYS)."""
+    if sort == "priority":
+        return lambda issue: (-priority_rank(issue.get("priority")), issue["id"])
+    if sort == "updated":
+        # ISO timestamps sort as strings; newest first, then by id
+        return lambda issue: (_Descending(issue.get("updated_on") or ""), issue["id"])
+    return lambda issue: issue["id"]
+
+
+class _Descending:
+    """Wraps a value so that it sorts in reverse order inside a key tuple."""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+    def __eq__(self, other):
+        return self.value == other.value
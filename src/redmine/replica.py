@@ -0,0 +1,392 @@
+import os
+import sqlite3
+import threading
+import time
+
+from src.redmine.query import check_sort, parse_values, priority_rank
+
+# Where the replica lives unless REDMINE_REPLICA_PATH says otherwise
+DEFAULT_REPLICA_PATH = os.path.join("data", "redmine_replica.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    login TEXT,
+    login_lower TEXT,
+    name TEXT
+);
+CREATE INDEX IF NOT EXISTS users_login ON users (login_lower);
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_lower TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS projects_name ON projects (name_lower);
+CREATE TABLE IF NOT EXISTS memberships (
+    user_id INTEGER NOT NULL,
+    project_id INTEGER NOT NULL,
+    PRIMARY KEY (user_id, project_id)
+);
+CREATE TABLE IF NOT EXISTS issues (
+    id INTEGER PRIMARY KEY,
+    project_id INTEGER NOT NULL,
+    subject TEXT,
+    status TEXT,
+    status_lower TEXT,
+    priority TEXT,
+    priority_lower TEXT,
+    assigned_to INTEGER,
+    updated_on TEXT,
+    priority_rank INTEGER NOT NULL DEFAULT 0,
+    description TEXT
+);
+CREATE INDEX IF NOT EXISTS issues_project ON issues (project_id, status_lower, priority_lower);
+CREATE INDEX IF NOT EXISTS issues_assignee ON issues (assigned_to, status_lower, priority_lower);
+CREATE INDEX IF NOT EXISTS issues_status ON issues (status_lower, priority_rank);
+CREATE INDEX IF NOT EXISTS issues_updated ON issues (updated_on);
+-- Trigram index so subject substring searches do not scan every issue
+CREATE VIRTUAL TABLE IF NOT EXISTS issues_subject USING fts5(subject, tokenize='trigram');
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+ISSUE_COLUMNS = "id, project_id, subject, status, priority, assigned_to, updated_on"
+# Every stored issue column, in the order of the rows written by RedmineReplica.write
+STORED_ISSUE_COLUMNS = ("id, project_id, subject, status, status_lower, priority, priority_lower, assigned_to, "
+                        "updated_on, priority_rank, description")
+# Ids per "IN (...)" query; older SQLite builds allow at most 999 parameters
+ID_CHUNK = 500
+# Issue records with their description, as used by the search index
+FULL_ISSUE_COLUMNS = ISSUE_COLUMNS + ", description"
+
+ORDER_BY = {
+    "id": "id",
+    "priority": "priority_rank DESC, id",
+    "updated": "updated_on DESC, id",
+}
+
+
+class RedmineReplica:
+    """Local SQLite (WAL) copy of the Redmine users, projects and issues.
+
+    Exposes the same query methods as RedmineStore, each answered with one
+    indexed query. Readers use one connection per thread so they never wait for
+    the sync job; writes go through a single connection under a lock. Until the
+    first sync has finished, queries are passed to ``fallback`` (the live source)
+    when one is given.
+    """
+
+    def __init__(self, path: str = DEFAULT_REPLICA_PATH, fallback=None):
+        self.path = path
+        self.fallback = fallback
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Called with (issues, deleted_ids) after issue writes, e.g. by the search index
+        self._issue_listeners = []
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def _migrate(self):
+        # Replicas created by older versions lack some issue columns; resync them
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(issues)")}
+        if columns and not {"priority_rank", "description"} <= columns:
+            self.conn.executescript("DROP TABLE issues; DELETE FROM sync_state;")
+
+    def _reader(self) -> sqlite3.Connection:
+        if self.path == ":memory:":
+            return self.conn  # An in-memory database exists only on its own connection
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, check_same_thread=False)
+        return conn
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        if self.path == ":memory:":
+            with self._lock:
+                return self.conn.execute(sql, params).fetchall()
+        return self._reader().execute(sql, params).fetchall()
+
+    # --- Sync state ---
+    def get_state(self, key: str, default=None):
+        rows = self._query("SELECT value FROM sync_state WHERE key = ?", (key,))
+        return rows[0][0] if rows else default
+
+    def _set_state(self, key: str, value):
+        self.conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def version(self) -> int:
+        """Bumped by every sync that changed data; shared by all processes using the file."""
+        return int(self.get_state("version", 0))
+
+    @property
+    def last_synced_at(self):
+        """Unix time of the last successful sync, or None if the replica was never synced."""
+        value = self.get_state("last_synced_at")
+        return float(value) if value is not None else None
+
+    def staleness_seconds(self):
+        """Seconds since the last successful sync, or None if the replica was never synced."""
+        last = self.last_synced_at
+        return None if last is None else max(time.time() - last, 0.0)
+
+    def _live(self):
+        # Before the first sync the replica is empty; answer from Redmine directly
+        return self.fallback if self.fallback is not None and self.last_synced_at is None else None
+
+    # --- Writes (used by the sync job) ---
+    def write(self, users=(), projects=(), memberships=None, issues=(), state: dict = None,
+              bump_version: bool = False) -> int:
+        """Upserts one batch in a single transaction and returns the number of issues written.
+
+        ``memberships`` maps a project id to its member ids and replaces the stored
+        members of those projects. Issues already stored exactly as given are
+        skipped and not counted, so a sync that found nothing new writes nothing.
+        """
+        # An issue edited while the sync pages through Redmine can come twice; the last copy wins
+        issues = list({i["id"]: i for i in issues}.values())
+        issue_rows = [
+            (i["id"], i["project_id"], i["subject"], i["status"], i["status"].lower(),
+             i["priority"], i["priority"].lower(), i["assigned_to"], i["updated_on"], priority_rank(i["priority"]),
+             i.get("description") or "")
+            for i in issues
+        ]
+        with self._lock, self.conn:
+            stored = self._stored_issue_rows([row[0] for row in issue_rows])
+            changed = [row[0] for row in issue_rows if stored.get(row[0]) != row]
+            if len(changed) < len(issue_rows):
+                changed_ids = set(changed)
+                issues = [i for i in issues if i["id"] in changed_ids]
+                issue_rows = [row for row in issue_rows if row[0] in changed_ids]
+            self.conn.executemany(
+                "INSERT INTO users (id, login, login_lower, name) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET login = COALESCE(excluded.login, login), "
+                "login_lower = COALESCE(excluded.login_lower, login_lower), name = excluded.name",
+                [(u["id"], u.get("login"), (u.get("login") or "").lower() or None, u.get("name")) for u in users]
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO projects (id, name, name_lower) VALUES (?, ?, ?)",
+                [(p["id"], p["name"], p["name"].lower()) for p in projects]
+            )
+            for project_id, member_ids in (memberships or {}).items():
+                self.conn.execute("DELETE FROM memberships WHERE project_id = ?", (project_id,))
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO memberships (user_id, project_id) VALUES (?, ?)",
+                    [(user_id, project_id) for user_id in member_ids]
+                )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO issues (id, project_id, subject, status, status_lower, priority, "
+                "priority_lower, assigned_to, updated_on, priority_rank, description) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                issue_rows
+            )
+            self.conn.executemany("DELETE FROM issues_subject WHERE rowid = ?", [(row[0],) for row in issue_rows])
+            self.conn.executemany(
+                "INSERT INTO issues_subject (rowid, subject) VALUES (?, ?)",
+                [(row[0], row[2] or "") for row in issue_rows]
+            )
+            for key, value in (state or {}).items():
+                self._set_state(key, value)
+            if bump_version:
+                self.conn.execute(
+                    "INSERT INTO sync_state (key, value) VALUES ('version', '1') "
+                    "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+                )
+        if issue_rows and self._issue_listeners:
+            self._notify(issues, [])
+        return len(issue_rows)
+
+    def _stored_issue_rows(self, issue_ids: list) -> dict:
+        rows = {}
+        for start in range(0, len(issue_ids), ID_CHUNK):
+            chunk = issue_ids[start:start + ID_CHUNK]
+            query = (f"SELECT {STORED_ISSUE_COLUMNS} FROM issues "
+                     f"WHERE id IN ({', '.join('?' * len(chunk))})")
+            rows.update((row[0], row) for row in self.conn.execute(query, chunk))
+        return rows
+
+    def add_issue_listener(self, callback):
+        """Calls ``callback(issues, deleted_ids)`` after every committed issue write in this process."""
+        self._issue_listeners.append(callback)
+
+    def _notify(self, issues: list, deleted_ids: list):
+        for callback in self._issue_listeners:
+            callback(issues, deleted_ids)
+
+    def _mark_seen(self, seen_ids) -> list:
+        """Loads ``seen_ids`` into a temp table and returns the stored issue ids missing from it."""
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen_issues (id INTEGER PRIMARY KEY)")
+        self.conn.execute("DELETE FROM seen_issues")
+        self.conn.executemany("INSERT OR IGNORE INTO seen_issues (id) VALUES (?)", ((i,) for i in seen_ids))
+        return [row[0] for row in self.conn.execute("SELECT id FROM issues WHERE id NOT IN (SELECT id FROM seen_issues)")]
+
+    def issue_ids_not_in(self, seen_ids) -> list:
+        """Stored issue ids missing from ``seen_ids``: deleted in Redmine, or missed by the sync."""
+        with self._lock, self.conn:
+            unseen = self._mark_seen(seen_ids)
+            self.conn.execute("DELETE FROM seen_issues")
+        return unseen
+
+    def delete_issues_not_in(self, seen_ids) -> int:
+        """Removes issues that no longer exist in Redmine (used after a full sync)."""
+        with self._lock, self.conn:
+            deleted = self._mark_seen(seen_ids)
+            self.conn.execute("DELETE FROM issues WHERE id NOT IN (SELECT id FROM seen_issues)")
+            self.conn.execute("DELETE FROM issues_subject WHERE rowid NOT IN (SELECT id FROM seen_issues)")
+            self.conn.execute("DELETE FROM seen_issues")
+        if deleted:
+            self._notify([], deleted)
+        return len(deleted)
+
+    # --- Reads (same interface as RedmineStore) ---
+    def find_user_id(self, username: str):
+        live = self._live()
+        if live:
+            return live.find_user_id(username)
+        rows = self._query("SELECT id FROM users WHERE login_lower = ? LIMIT 1", (username.lower(),))
+        return rows[0][0] if rows else None
+
+    def get_username(self, user_id, default=None):
+        live = self._live()
+        if live:
+            return live.get_username(user_id, default)
+        rows = self._query("SELECT COALESCE(login, name) FROM users WHERE id = ?", (user_id,))
+        return rows[0][0] if rows and rows[0][0] else default
+
+    def find_project(self, name: str):
+        live = self._live()
+        if live:
+            return live.find_project(name)
+        rows = self._query("SELECT id, name FROM projects WHERE name_lower = ? LIMIT 1", (name.lower(),))
+        return {"id": rows[0][0], "name": rows[0][1]} if rows else None
+
+    def get_project_name(self, project_id, default=None):
+        live = self._live()
+        if live:
+            return live.get_project_name(project_id, default)
+        rows = self._query("SELECT name FROM projects WHERE id = ?", (project_id,))
+        return rows[0][0] if rows else default
+
+    def all_projects(self) -> list[dict]:
+        live = self._live()
+        if live:
+            return live.all_projects()
+        return [{"id": pid, "name": name} for pid, name in self._query("SELECT id, name FROM projects ORDER BY id")]
+
+    def projects_for_member(self, user_id: int) -> list[dict]:
+        live = self._live()
+        if live:
+            return live.projects_for_member(user_id)
+        rows = self._query(
+            "SELECT p.id, p.name FROM memberships m JOIN projects p ON p.id = m.project_id "
+            "WHERE m.user_id = ? ORDER BY p.id",
+            (user_id,)
+        )
+        return [{"id": pid, "name": name} for pid, name in rows]
+
+    def issues_for_project(self, project_id: int, status: str = None, priority: str = None) -> list[dict]:
+        live = self._live()
+        if live:
+            return live.issues_for_project(project_id, status, priority)
+        return self.query_issues(project_id=project_id, status=status, priority=priority)
+
+    def issues_assigned_to(self, user_id: int, status: str = None, priority: str = None) -> list[dict]:
+        live = self._live()
+        if live:
+            return live.issues_assigned_to(user_id, status, priority)
+        return self.query_issues(assigned_to=user_id, status=status, priority=priority)
+
+    def query_issues(self, project_id: int = None, assigned_to: int = None, status=None, priority=None,
+                     subject: str = None, sort: str = "id", limit: int = None, offset: int = 0,
+                     count_only: bool = False):
+        """Same contract as RedmineStore.query_issues, as a single indexed SQL query."""
+        live = self._live()
+        if live:
+            return live.query_issues(project_id, assigned_to, status, priority, subject, sort, limit, offset, count_only)
+        sort = check_sort(sort)
+        where, params = [], []
+        if project_id is not None:
+            where.append("project_id = ?")
+            params.append(project_id)
+        if assigned_to is not None:
+            where.append("assigned_to = ?")
+            params.append(assigned_to)
+        for column, values in (("status_lower", parse_values(status)), ("priority_lower", parse_values(priority))):
+            if values:
+                where.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        if subject:
+            if len(subject) >= 3 and not any(ch in subject for ch in "%_"):
+                where.append("id IN (SELECT rowid FROM issues_subject WHERE subject LIKE ?)")
+                params.append(f"%{subject}%")
+            else:
+                where.append("subject LIKE ? ESCAPE '\\'")
+                params.append("%" + subject.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        clause = (" WHERE " + " AND ".join(where)) if where else ""
+
+        if count_only:
+            return self._query(f"SELECT COUNT(*) FROM issues{clause}", tuple(params))[0][0]
+        sql = f"SELECT {ISSUE_COLUMNS} FROM issues{clause} ORDER BY {ORDER_BY[sort]}"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else limit, offset])
+        return [_issue_from_row(row) for row in self._query(sql, tuple(params))]
+
+    def all_issues(self, batch_size: int = 10000):
+        """Streams every issue with its description, in id order."""
+        last_id = 0
+        while True:
+            rows = self._query(
+                f"SELECT {FULL_ISSUE_COLUMNS} FROM issues WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+            )
+            yield from (_issue_from_row(row) for row in rows)
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
+
+    def issues_updated_since(self, updated_on: str) -> list[dict]:
+        """Issues (with descriptions) whose updated_on is at or after ``updated_on``."""
+        rows = self._query(f"SELECT {FULL_ISSUE_COLUMNS} FROM issues WHERE updated_on >= ? ORDER BY updated_on", (updated_on,))
+        return [_issue_from_row(row) for row in rows]
+
+    def get_issues(self, issue_ids) -> list[dict]:
+        """Returns the issues with these ids, in the same order, skipping unknown ids."""
+        live = self._live()
+        if live:
+            return live.get_issues(issue_ids)
+        issue_ids = list(issue_ids)
+        found = {}
+        # Stay under SQLite's limit on bound parameters
+        for start in range(0, len(issue_ids), 500):
+            chunk = issue_ids[start:start + 500]
+            rows = self._query(
+                f"SELECT {ISSUE_COLUMNS} FROM issues WHERE id IN ({', '.join('?' * len(chunk))})", tuple(chunk)
+            )
+            found.update((row[0], _issue_from_row(row)) for row in rows)
+        return [found[i] for i in issue_ids if i in found]
+
+    def search_issue_ids(self, query: str, limit: int = 25):
+        """Redmine's own search results until the first sync finished; None once the local index can answer."""
+        live = self._live()
+        return live.search_issue_ids(query, limit) if live else None
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def _issue_from_row(row) -> dict:
+    """Issue record from a row of ISSUE_COLUMNS (or FULL_ISSUE_COLUMNS)."""
+    issue = {"id": row[0], "project_id": row[1], "subject": row[2], "status": row[3], "priority": row[4],
+             "assigned_to": row[5], "updated_on": row[6]}
+    if len(row) > 7:
+        issue["description"] = row[7]
+    return issue
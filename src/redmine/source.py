@@ -0,0 +1,164 @@
+import itertools
+import os
+import threading
+import time
+
+from src.redmine.client import RedmineClient
+from src.redmine.query import check_sort, parse_values
+
+# How each sort order is expressed in the /issues.json sort parameter
+REDMINE_SORT = {"id": "id", "priority": "priority:desc,id", "updated": "updated_on:desc,id"}
+
+# Live data has no change signal; cached answers and tool results built on it expire this fast (0 = never cached)
+LIVE_CACHE_SECONDS = float(os.environ.get("REDMINE_LIVE_CACHE_SECONDS", 30))
+
+
+def issue_record(issue: dict) -> dict:
+    """Flattens a Redmine API issue into the record shape used by RedmineStore."""
+    assigned_to = issue.get("assigned_to") or {}
+    return {
+        "id": issue["id"],
+        "project_id": issue["project"]["id"],
+        "subject": issue.get("subject", ""),
+        "description": issue.get("description") or "",
+        "status": issue["status"]["name"],
+        "priority": issue["priority"]["name"],
+        "assigned_to": assigned_to.get("id"),
+        "updated_on": issue.get("updated_on"),
+    }
+
+
+class RedmineSource:
+    """Live Redmine data behind the same query methods as RedmineStore.
+
+    Issue lists come straight from the paginated API as generators, and the
+    project and assignee names embedded in every issue are remembered, so turning
+    issues into tool results never needs one request per issue.
+    """
+
+    def __init__(self, client: RedmineClient, cache_seconds: float = LIVE_CACHE_SECONDS):
+        self.client = client
+        self.cache_seconds = cache_seconds
+        self._versions = itertools.count(1)
+        self._lock = threading.Lock()
+        self._user_ids = {}       # lowercased login -> user id
+        self._user_names = {}     # user id -> login (or display name)
+        self._projects = {}       # lowercased project name -> project
+        self._project_names = {}  # project id -> name
+
+    @property
+    def version(self) -> int:
+        """Changes every ``cache_seconds`` (on every read when 0).
+
+        The response cache and the tool memo are keyed on the data version, so
+        nothing they hold outlives that window even though edits in Redmine go unseen.
+        """
+        if self.cache_seconds <= 0:
+            return next(self._versions)
+        return int(time.time() // self.cache_seconds)
+
+    @classmethod
+    def from_env(cls) -> "RedmineSource":
+        return cls(RedmineClient.from_env())
+
+    # --- Users ---
+    def find_user_id(self, username: str):
+        """Returns the id of the user with this login (case-insensitive), or None."""
+        key = username.lower()
+        if key not in self._user_ids:
+            for user in self.client.iter_users(name=username):
+                self._remember_user(user["id"], user.get("login") or user.get("firstname", ""))
+        return self._user_ids.get(key)
+
+    def get_username(self, user_id, default=None):
+        return self._user_names.get(user_id, default)
+
+    def _remember_user(self, user_id, name: str):
+        with self._lock:
+            self._user_names.setdefault(user_id, name)
+            self._user_ids[name.lower()] = user_id
+
+    # --- Projects ---
+    def all_projects(self):
+        for project in self.client.iter_projects():
+            yield self._remember_project(project)
+
+    def find_project(self, name: str):
+        """Returns the project with the given name (case-insensitive), or None."""
+        project = self._projects.get(name.lower())
+        if project is None:
+            # Unknown name: refresh the project list once
+            for candidate in self.all_projects():
+                if candidate["name"].lower() == name.lower():
+                    project = candidate
+        return project
+
+    def get_project_name(self, project_id, default=None):
+        return self._project_names.get(project_id, default)
+
+    def projects_for_member(self, user_id: int) -> list[dict]:
+        """Projects of one user from a single /users/:id.json?include=memberships request."""
+        memberships = self.client.get_user(user_id).get("memberships", [])
+        projects = {m["project"]["id"]: self._remember_project(m["project"]) for m in memberships}
+        return [projects[project_id] for project_id in sorted(projects)]
+
+    def _remember_project(self, project: dict) -> dict:
+        record = {"id": project["id"], "name": project["name"]}
+        with self._lock:
+            self._projects[record["name"].lower()] = record
+            self._project_names[record["id"]] = record["name"]
+        return record
+
+    # --- Issues ---
+    def issues_for_project(self, project_id: int, status: str = None, priority: str = None):
+        """Streams a project's issues, optionally filtered by status and/or priority."""
+        return self.query_issues(project_id=project_id, status=status, priority=priority)
+
+    def issues_assigned_to(self, user_id: int, status: str = None, priority: str = None):
+        """Streams the issues assigned to a user, optionally filtered by status and/or priority."""
+        return self.query_issues(assigned_to=user_id, status=status, priority=priority)
+
+    def query_issues(self, project_id: int = None, assigned_to: int = None, status=None, priority=None,
+                     subject: str = None, sort: str = "id", limit: int = None, offset: int = 0,
+                     count_only: bool = False):
+        """Same contract as RedmineStore.query_issues; filtering, sorting and paging run in Redmine."""
+        sort = check_sort(sort)
+        status_id = self._enumeration_ids(self.client.issue_statuses(), parse_values(status), "*")
+        priority_id = self._enumeration_ids(self.client.issue_priorities(), parse_values(priority), None)
+        filters = {
+            "project_id": project_id,
+            "assigned_to_id": assigned_to,
+            "status_id": status_id,
+            "priority_id": priority_id,
+            "subject": f"~{subject}" if subject else None,
+        }
+        if status_id is None or (priority and priority_id is None):
+            # Unknown status or priority names match nothing
+            return 0 if count_only else iter(())
+        if count_only:
+            return self.client.count_issues(**filters)
+        return self._records(self.client.iter_issues(sort=REDMINE_SORT[sort], offset=offset, limit=limit, **filters))
+
+    def get_issues(self, issue_ids) -> list[dict]:
+        """Returns the issues with these ids, in the same order, skipping unknown ids."""
+        found = {issue["id"]: issue for issue in self._records(self.client.get_issues(issue_ids))}
+        return [found[i] for i in issue_ids if i in found]
+
+    def search_issue_ids(self, query: str, limit: int = 25) -> list[int]:
+        """Ranked issue ids from Redmine's own full-text search (no local index when live)."""
+        return self.client.search_issues(query, limit)
+
+    def _records(self, issues):
+        for issue in issues:
+            self._remember_project(issue["project"])
+            if issue.get("assigned_to"):
+                self._user_names.setdefault(issue["assigned_to"]["id"], issue["assigned_to"]["name"])
+            yield issue_record(issue)
+
+    @staticmethod
+    def _enumeration_ids(ids: dict, names, default):
+        """Maps names to a Redmine multi-value filter ('1|2'); None if none of them exist."""
+        if not names:
+            return default
+        known = [str(ids[name]) for name in names if name in ids]
+        return "|".join(known) if known else None
@@ -0,0 +1,192 @@
+import asyncio
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, every process syncs
+    fcntl = None
+
+from src.redmine.client import RedmineClient, RedmineError
+from src.redmine.replica import RedmineReplica
+from src.redmine.source import issue_record
+from src.utils.metrics import REGISTRY
+
+SYNC_LAG = REGISTRY.gauge("redmine_sync_lag_seconds", "Seconds since the Redmine replica was last synced")
+SYNC_DURATION = REGISTRY.histogram("redmine_sync_duration_seconds", "Duration of replica syncs", ("kind",))
+SYNC_ISSUES = REGISTRY.counter("redmine_sync_issues_total", "Issues written to the replica", ("kind",))
+SYNC_ERRORS = REGISTRY.counter("redmine_sync_errors_total", "Failed replica syncs")
+
+
+class RedmineSync:
+    """Keeps a RedmineReplica up to date.
+
+    The first run (and every ``full_sync_seconds``) copies everything, including
+    project memberships, and removes issues deleted in Redmine. It pages by id,
+    which edits made meanwhile cannot reorder, and fetches the stored issues it
+    did not see by id before deleting any. In between, only issues with
+    ``updated_on >= cursor`` are fetched, also paged by id. The cursor is the
+    newest ``updated_on`` Redmine reported when the previous sync started, and the
+    comparison is inclusive, so issues changed during that sync are fetched again;
+    the replica skips the ones it already holds unchanged.
+
+    When several worker processes share the replica file, ``lock_path`` makes
+    only one of them sync at a time; the others retry the lock every interval
+    and take over if that worker exits.
+    """
+
+    def __init__(self, client: RedmineClient, replica: RedmineReplica, interval_seconds: float = 60,
+                 full_sync_seconds: float = 24 * 3600, batch_size: int = 1000, lock_path: str = None):
+        self.client = client
+        self.replica = replica
+        self.interval_seconds = interval_seconds
+        self.full_sync_seconds = full_sync_seconds
+        self.batch_size = batch_size
+        self.lock_path = lock_path
+        self._lock_file = None
+
+    @classmethod
+    def from_env(cls, replica: RedmineReplica) -> "RedmineSync":
+        """Reads REDMINE_SYNC_INTERVAL_SECONDS and REDMINE_FULL_SYNC_SECONDS."""
+        return cls(
+            RedmineClient.from_env(),
+            replica,
+            interval_seconds=float(os.environ.get("REDMINE_SYNC_INTERVAL_SECONDS", 60)),
+            full_sync_seconds=float(os.environ.get("REDMINE_FULL_SYNC_SECONDS", 24 * 3600)),
+            lock_path=None if replica.path == ":memory:" else replica.path + ".sync.lock"
+        )
+
+    def acquire_lock(self) -> bool:
+        """True if this process may sync: it holds the sync lock, or no lock is used."""
+        if self.lock_path is None or fcntl is None or self._lock_file is not None:
+            return True
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # The lock lasts as long as the file stays open, i.e. until close() or process exit
+        self._lock_file = lock_file
+        return True
+
+    def _needs_full_sync(self) -> bool:
+        last_full = self.replica.get_state("last_full_sync_at")
+        return last_full is None or time.time() - float(last_full) >= self.full_sync_seconds
+
+    def sync_once(self, full: bool = None) -> int:
+        """Runs one sync and returns the number of issues written."""
+        full = self._needs_full_sync() if full is None else full
+        kind = "full" if full else "incremental"
+        started = time.time()
+        try:
+            written = self._full_sync(started) if full else self._incremental_sync(started)
+        except (RedmineError, OSError, ValueError) as e:
+            SYNC_ERRORS.inc()
+            print(f"❌ Redmine {kind} sync failed: {e}")
+            raise
+        finally:
+            SYNC_DURATION.observe(time.time() - started, kind=kind)
+        SYNC_ISSUES.inc(written, kind=kind)
+        self.update_lag()
+        print(f"🔄 Redmine {kind} sync wrote {written} issues in {time.time() - started:.1f}s")
+        return written
+
+    def _full_sync(self, started: float) -> int:
+        projects = [{"id": p["id"], "name": p["name"]} for p in self.client.iter_projects()]
+        users = []
+        try:
+            users = [
+                {"id": u["id"], "login": u.get("login"), "name": f"{u.get('firstname', '')} {u.get('lastname', '')}".strip()}
+                for u in self.client.iter_users()
+            ]
+        except RedmineError as e:
+            # Listing users needs admin rights; assignees are still learned from issues
+            print(f"⚠️ Cannot list Redmine users ({e.status_code}); using issue assignees only")
+        memberships = {
+            project["id"]: [m["user"]["id"] for m in self.client.iter_memberships(project["id"]) if "user" in m]
+            for project in projects
+        }
+        self.replica.write(users=users, projects=projects, memberships=memberships)
+
+        # Issues edited from here on have updated_on >= cursor and are fetched again by the next sync
+        newest = list(self.client.iter_issues(status_id="*", sort="updated_on:desc,id", limit=1))
+        cursor = newest[0]["updated_on"] if newest else None
+        seen = []
+        # Paged by id: edits during the sync do not shift the pages, unlike an updated_on sort
+        written = self._copy_issues(self.client.iter_issues(status_id="*", sort="id"), seen, cursor)
+        # Issues deleted meanwhile still shift the later pages; confirm the missing ones before deleting
+        unseen = self.replica.issue_ids_not_in(seen)
+        for start in range(0, len(unseen), self.client.page_size):
+            written += self._copy_issues(self.client.get_issues(unseen[start:start + self.client.page_size]), seen, cursor)
+        self.replica.delete_issues_not_in(seen)
+        self.replica.write(
+            state={"last_synced_at": started, "last_full_sync_at": started},
+            bump_version=True
+        )
+        return written
+
+    def _incremental_sync(self, started: float) -> int:
+        cursor = self.replica.get_state("cursor")
+        updated_on = f">={cursor}" if cursor else None
+        # As in the full sync: issues edited from here on are fetched again by the next sync
+        newest = list(self.client.iter_issues(status_id="*", updated_on=updated_on, sort="updated_on:desc,id", limit=1))
+        # Paged by id: an issue edited meanwhile keeps its position, so no other issue moves onto a page already read
+        written = self._copy_issues(self.client.iter_issues(status_id="*", updated_on=updated_on, sort="id"))
+        # The cursor only moves once every page was written; a failed sync starts over from the old one
+        state = {"last_synced_at": started}
+        if newest:
+            state["cursor"] = newest[0]["updated_on"]
+        # Readers only need a new version when something actually changed
+        self.replica.write(state=state, bump_version=written > 0)
+        return written
+
+    def _copy_issues(self, issues, seen: list = None, cursor: str = None) -> int:
+        """Writes streamed issues in batches and returns how many changed; ``cursor`` is stored with each batch."""
+        written = 0
+        batch, users, projects = [], {}, {}
+        for issue in issues:
+            record = issue_record(issue)
+            batch.append(record)
+            projects[issue["project"]["id"]] = {"id": issue["project"]["id"], "name": issue["project"]["name"]}
+            if issue.get("assigned_to"):
+                users[record["assigned_to"]] = {"id": record["assigned_to"], "name": issue["assigned_to"]["name"]}
+            if seen is not None:
+                seen.append(record["id"])
+            if len(batch) >= self.batch_size:
+                written += self._flush(batch, users, projects, cursor)
+                batch, users, projects = [], {}, {}
+        if batch:
+            written += self._flush(batch, users, projects, cursor)
+        return written
+
+    def _flush(self, batch, users, projects, cursor) -> int:
+        state = {"cursor": cursor} if cursor else None
+        return self.replica.write(users=users.values(), projects=projects.values(), issues=batch, state=state)
+
+    def update_lag(self):
+        staleness = self.replica.staleness_seconds()
+        if staleness is not None:
+            SYNC_LAG.set(round(staleness, 3))
+
+    async def run(self):
+        """Syncs every ``interval_seconds`` until cancelled; failures are retried next round."""
+        while True:
+            try:
+                if self.acquire_lock():
+                    await asyncio.to_thread(self.sync_once)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Redmine sync will retry in {self.interval_seconds}s: {e}")
+            # Keep the lag gauge moving between syncs
+            deadline = time.monotonic() + self.interval_seconds
+            while time.monotonic() < deadline:
+                self.update_lag()
+                await asyncio.sleep(min(5.0, max(deadline - time.monotonic(), 0)))
+
+    def close(self):
+        self.client.close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
@@ -0,0 +1,244 @@
+import asyncio
+import math
+import os
+import time
+
+from src.utils.history import count_tokens
+from src.utils.metrics import REGISTRY
+
+QUEUE_DEPTH = REGISTRY.gauge("admission_queue_depth", "Chat requests waiting for a slot")
+ACTIVE = REGISTRY.gauge("admission_active_requests", "Chat requests holding a slot")
+WAIT_SECONDS = REGISTRY.histogram("admission_wait_seconds", "Time chat requests waited before running")
+REJECTED = REGISTRY.counter(
+    "admission_rejected_total", "Chat requests turned away, by reason", ("reason",)
+)
+
+# What one chat is expected to cost upstream: an agent turn usually calls the
+# model twice (tool call, then answer), and each reply may use up to max_tokens
+AGENT_LLM_CALLS = 2
+COMPLETION_TOKENS = 500
+
+
+def estimate_chat_cost(query: str, history: list = None, agent: bool = False) -> tuple[int, int]:
+    """(LLM calls, tokens) a chat request will probably use, for the rate limits."""
+    prompt = count_tokens(query) + sum(count_tokens(str(m.get("content") or "")) for m in history or [])
+    calls = AGENT_LLM_CALLS if agent else 1
+    return calls, calls * (prompt + COMPLETION_TOKENS)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; ``retry_after`` is a hint in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Request rejected ({reason}), retry after {retry_after:.0f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allows ``per_minute`` units per minute, in bursts of up to ``burst_seconds`` worth.
+
+    OpenAI enforces its per-minute limits over shorter windows, so the default
+    burst is one second of budget. ``reserve`` takes units right away and returns
+    how long the caller must wait before using them, so waiting callers are
+    served in arrival order.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = 1):
+        self.rate = per_minute / 60
+        self.capacity = max(self.rate * burst_seconds, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until ``amount`` units are available."""
+        self._refill()
+        # A request larger than the burst would otherwise never fit
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self._tokens) / self.rate)
+
+    def reserve(self, amount: float) -> float:
+        wait = self.delay(amount)
+        self._tokens -= min(amount, self.capacity)
+        return wait
+
+    def pause(self, seconds: float):
+        """Empties the bucket so nothing is let through for ``seconds`` (upstream said 429)."""
+        self._refill()
+        self._tokens = min(self._tokens, -self.rate * seconds)
+
+
+class _UserSlots:
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0  # requests of this user waiting or running
+
+
+class AdmissionController:
+    """Concurrency limits, a bounded wait queue and upstream rate limits for chat requests.
+
+    A request needs a slot of its user (``max_per_user``) and a global slot
+    (``max_concurrency``). Requests that cannot start right away wait in a queue of
+    at most ``max_queue`` requests for up to ``queue_timeout`` seconds; beyond that
+    they are rejected at once with a retry hint instead of piling up. Admitted
+    requests then draw from token buckets sized to the model's requests and tokens
+    per minute, so a spike is smoothed here rather than answered by OpenAI 429s.
+    """
+
+    def __init__(self, max_concurrency: int = 32, max_per_user: int = 4, max_queue: int = 64,
+                 queue_timeout: float = 10, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.max_concurrency = max_concurrency
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._user_slots = {}  # user -> _UserSlots
+        self._active = 0
+        self._waiting = 0
+        self._service_seconds = 1.0  # moving average of how long admitted requests run
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """Reads ADMISSION_* and the model's LLM_REQUESTS_PER_MINUTE / LLM_TOKENS_PER_MINUTE (0 = no limit)."""
+        return cls(
+            max_concurrency=int(os.environ.get("ADMISSION_MAX_CONCURRENCY", 32)),
+            max_per_user=int(os.environ.get("ADMISSION_MAX_PER_USER", 4)),
+            max_queue=int(os.environ.get("ADMISSION_MAX_QUEUE", 64)),
+            queue_timeout=float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_SECONDS", 10)),
+            requests_per_minute=float(os.environ.get("LLM_REQUESTS_PER_MINUTE", 0)),
+            tokens_per_minute=float(os.environ.get("LLM_TOKENS_PER_MINUTE", 0))
+        )
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def _retry_after(self) -> float:
+        # Roughly how long until the queue ahead of a new request has drained
+        return max(1.0, math.ceil((self._waiting + 1) / self.max_concurrency * self._service_seconds))
+
+    def _reject(self, reason: str, retry_after: float):
+        REJECTED.inc(reason=reason)
+        raise AdmissionRejected(reason, retry_after)
+
+    async def acquire(self, user: str = None, llm_calls: int = 1, tokens: int = 0) -> "AdmissionTicket":
+        """Waits for a slot and rate budget; raises AdmissionRejected when the wait would be too long."""
+        start = time.monotonic()
+        user = user or ""
+        slots = self._user_slots.get(user)
+        if slots is None:
+            slots = self._user_slots[user] = _UserSlots(self.max_per_user)
+        can_start = self._active < self.max_concurrency and not slots.semaphore.locked()
+        if not can_start and self._waiting >= self.max_queue:
+            self._forget_user(user, slots)
+            self._reject("queue_full", self._retry_after())
+
+        slots.users += 1
+        self._waiting += 1
+        QUEUE_DEPTH.set(self._waiting)
+        acquired = []
+        try:
+            for reason, semaphore in (("user_limit", slots.semaphore), ("queue_timeout", self._global)):
+                remaining = self.queue_timeout - (time.monotonic() - start)
+                try:
+                    if semaphore.locked():
+                        await asyncio.wait_for(semaphore.acquire(), max(remaining, 0))
+                    else:
+                        await semaphore.acquire()
+                except asyncio.TimeoutError:
+                    self._reject(reason, self._retry_after())
+                acquired.append(semaphore)
+
+            # Budget of the upstream model, checked before anything is taken from it
+            delay = max(
+                self.requests.delay(llm_calls) if self.requests else 0.0,
+                self.tokens.delay(tokens) if self.tokens else 0.0
+            )
+            if time.monotonic() - start + delay > self.queue_timeout:
+                self._reject("rate_limited", math.ceil(delay))
+            if self.requests:
+                self.requests.reserve(llm_calls)
+            if self.tokens:
+                self.tokens.reserve(tokens)
+            if delay:
+                await asyncio.sleep(delay)
+        except BaseException:
+            for semaphore in acquired:
+                semaphore.release()
+            slots.users -= 1
+            self._forget_user(user, slots)
+            raise
+        finally:
+            self._waiting -= 1
+            QUEUE_DEPTH.set(self._waiting)
+
+        WAIT_SECONDS.observe(time.monotonic() - start)
+        self._active += 1
+        ACTIVE.set(self._active)
+        return AdmissionTicket(self, user, slots)
+
+    def _release(self, user: str, slots: _UserSlots, started: float):
+        self._global.release()
+        slots.semaphore.release()
+        slots.users -= 1
+        self._forget_user(user, slots)
+        self._active -= 1
+        ACTIVE.set(self._active)
+        self._service_seconds = 0.8 * self._service_seconds + 0.2 * (time.monotonic() - started)
+
+    def _forget_user(self, user: str, slots: _UserSlots):
+        if slots.users == 0 and self._user_slots.get(user) is slots:
+            del self._user_slots[user]
+
+    def upstream_limited(self, retry_after: float):
+        """Holds back new requests after OpenAI answered 429."""
+        for bucket in (self.requests, self.tokens):
+            if bucket is not None:
+                bucket.pause(retry_after)
+
+
+class AdmissionTicket:
+    """An admitted request; ``release`` (idempotent) frees its slots. Also an async context manager."""
+
+    def __init__(self, controller: AdmissionController, user: str, slots: _UserSlots):
+        self._controller = controller
+        self._user = user
+        self._slots = slots
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(self._user, self._slots, self._started)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+def upstream_retry_after(error, default: float = 1.0) -> float:
+    """Seconds OpenAI asked to wait in a 429 response (retry-after headers), or ``default``."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return default
+
@@ -0,0 +1,358 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, the last worker to flush wins
+    fcntl = None
+
+import numpy as np
+
+from src.utils.metrics import REGISTRY
+
+CACHE_REQUESTS = REGISTRY.counter(
+    "response_cache_requests_total",
+    "Response cache lookups by scope, tier and result",
+    ("scope", "tier", "result")
+)
+CACHE_ENTRIES = REGISTRY.gauge("response_cache_entries", "Entries held by the response cache", ("tier",))
+
+# Semantic tier files live next to the other embeddings
+DEFAULT_EMBEDDINGS_PATH = os.path.join("data", "embeddings", "response_cache")
+
+_MISSING = object()
+
+
+def normalize_query(text: str) -> str:
+    """Lowercases, strips accents and punctuation and collapses whitespace."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl_seconds``."""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl_seconds: float = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+            return default if item is _MISSING else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class HashingEmbedder:
+    """Deterministic local embedding: hashed word and character n-grams.
+
+    Good enough to match rephrasings that share most of their words, needs no
+    model download and gives identical vectors across processes.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str):
+        words = normalize_query(text).split()
+        for word in words:
+            yield "w:" + word
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield "c:" + padded[i:i + 3]
+        for first, second in zip(words, words[1:]):
+            yield f"b:{first}_{second}"
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_many(self, texts: list[str]) -> np.ndarray:
+        return np.stack([self.embed(text) for text in texts]) if texts else np.zeros((0, self.dim), dtype=np.float32)
+
+
+class SemanticCache:
+    """Similarity tier: finds a cached answer to a differently worded, equivalent query.
+
+    Vectors are kept in one NumPy matrix, so a lookup is a single matrix-vector
+    product. Entries are persisted under data/embeddings/ and reloaded on start.
+    Worker processes share the files: a flush merges in what the others flushed
+    (entries of an older data version never match a lookup and expire with their TTL).
+    """
+
+    def __init__(self, embedder=None, threshold: float = 0.92, max_entries: int = 5000,
+                 ttl_seconds: float = 3600, path: str = DEFAULT_EMBEDDINGS_PATH):
+        self.embedder = embedder or HashingEmbedder()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self._entries = []  # dicts: partition, query, response, expires_at, last_used
+        self._dirty = False
+        self._pending = 0
+        self._load()
+
+    # Persist the tier after this many additions (and at exit)
+    FLUSH_EVERY = 50
+
+    def lookup(self, partition: str, query: str):
+        vector = self.embedder.embed(query)
+        now = time.time()
+        with self._lock:
+            if not self._entries:
+                return None
+            scores = self._vectors[:len(self._entries)] @ vector
+            candidates = np.nonzero(scores >= self.threshold)[0]
+            for index in candidates[np.argsort(-scores[candidates])]:
+                entry = self._entries[index]
+                if entry["partition"] == partition and entry["expires_at"] > now:
+                    entry["last_used"] = now
+                    return entry["response"]
+        return None
+
+    def add(self, partition: str, query: str, response: str):
+        vector = self.embedder.embed(query)
+        now = time.time()
+        with self._lock:
+            size = len(self._entries)
+            if size == len(self._vectors):
+                # Grow geometrically so adding stays amortized O(1)
+                grown = np.zeros((max(2 * size, 64), self.embedder.dim), dtype=np.float32)
+                grown[:size] = self._vectors[:size]
+                self._vectors = grown
+            self._vectors[size] = vector
+            self._entries.append({
+                "partition": partition,
+                "query": query,
+                "response": response,
+                "expires_at": now + self.ttl_seconds,
+                "last_used": now,
+            })
+            if len(self._entries) > self.max_entries:
+                self._evict(now)
+            self._dirty = True
+            self._pending += 1
+            flush = self._pending >= self.FLUSH_EVERY
+        if flush:
+            self.flush()
+
+    def _evict(self, now: float):
+        # Drop expired entries, then the least recently used down to 90% of capacity
+        order = sorted(
+            (i for i, entry in enumerate(self._entries) if entry["expires_at"] > now),
+            key=lambda i: self._entries[i]["last_used"],
+            reverse=True
+        )[:int(self.max_entries * 0.9)]
+        order.sort()
+        self._vectors = self._vectors[order]
+        self._entries = [self._entries[i] for i in order]
+
+    def clear(self):
+        with self._lock:
+            self._vectors = np.zeros((0, self.embedder.dim), dtype=np.float32)
+            self._entries = []
+            self._dirty = True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def flush(self):
+        """Merges the entries with the stored ones and writes the vectors (.npy) and entries (.json)."""
+        with self._lock:
+            if not self._dirty or not self.path:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with self._file_lock():
+                self._merge(self._read())
+                # Replace each file in one step: _read checks the two still match
+                np.save(self.path + ".tmp.npy", self._vectors[:len(self._entries)])
+                with open(self.path + ".json.tmp", "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.embedder.dim, "entries": self._entries}, f, ensure_ascii=False)
+                os.replace(self.path + ".tmp.npy", self.path + ".npy")
+                os.replace(self.path + ".json.tmp", self.path + ".json")
+            self._dirty = False
+            self._pending = 0
+
+    @contextmanager
+    def _file_lock(self):
+        """Holds ``<path>.lock`` so only one worker process reads and rewrites the files at a time."""
+        with open(self.path + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                # Released when the file is closed
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _read(self):
+        """The stored (vectors, entries) that have not expired, or None."""
+        if not os.path.exists(self.path + ".json"):
+            return None
+        try:
+            with open(self.path + ".json", encoding="utf-8") as f:
+                stored = json.load(f)
+            vectors = np.load(self.path + ".npy")
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable semantic cache at {self.path}: {e}")
+            return None
+        if stored.get("dim") != self.embedder.dim or len(vectors) != len(stored["entries"]):
+            return None
+        now = time.time()
+        keep = [i for i, entry in enumerate(stored["entries"]) if entry["expires_at"] > now]
+        return vectors[keep].astype(np.float32), [stored["entries"][i] for i in keep]
+
+    def _merge(self, stored):
+        """Adds the stored entries this process does not hold (another worker's, or evicted here)."""
+        if stored is None:
+            return
+        vectors, entries = stored
+        held = {(entry["partition"], entry["query"]) for entry in self._entries}
+        keep = [i for i, entry in enumerate(entries) if (entry["partition"], entry["query"]) not in held]
+        if not keep:
+            return
+        self._vectors = np.concatenate([self._vectors[:len(self._entries)], vectors[keep]])
+        self._entries = self._entries + [entries[i] for i in keep]
+        if len(self._entries) > self.max_entries:
+            self._evict(time.time())
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path + ".json"):
+            return
+        with self._file_lock():
+            stored = self._read()
+        if stored is not None:
+            self._vectors, self._entries = stored
+
+
+class ResponseCache:
+    """Two-tier cache for final assistant answers.
+
+    The exact tier is keyed on the normalized query, the user and the version of
+    the Redmine data the answer was built from; the optional semantic tier also
+    matches rephrased queries. When the data version changes every entry is
+    dropped, so answers never outlive the data behind them.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600, semantic: SemanticCache = None):
+        self.exact = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.semantic = semantic
+        self._data_version = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _partition(scope: str, user: str, data_version) -> str:
+        return f"{scope}|{(user or '').lower()}|{data_version}"
+
+    def _check_version(self, data_version):
+        with self._lock:
+            if data_version != self._data_version:
+                if self._data_version is not None:
+                    self.invalidate()
+                self._data_version = data_version
+
+    def get(self, query: str, user: str = None, data_version=0, scope: str = "agent"):
+        """Returns the cached response or None, recording hit/miss metrics per tier."""
+        self._check_version(data_version)
+        partition = self._partition(scope, user, data_version)
+        response = self.exact.get((partition, normalize_query(query)))
+        if response is not None:
+            CACHE_REQUESTS.inc(scope=scope, tier="exact", result="hit")
+            return response
+        CACHE_REQUESTS.inc(scope=scope, tier="exact", result="miss")
+
+        if self.semantic is not None:
+            response = self.semantic.lookup(partition, query)
+            CACHE_REQUESTS.inc(scope=scope, tier="semantic", result="hit" if response is not None else "miss")
+        return response
+
+    def put(self, query: str, response: str, user: str = None, data_version=0, scope: str = "agent"):
+        self._check_version(data_version)
+        partition = self._partition(scope, user, data_version)
+        self.exact.set((partition, normalize_query(query)), response)
+        CACHE_ENTRIES.set(len(self.exact), tier="exact")
+        if self.semantic is not None:
+            self.semantic.add(partition, query, response)
+            CACHE_ENTRIES.set(len(self.semantic), tier="semantic")
+
+    def invalidate(self):
+        """Drops every cached response, e.g. after Redmine data changed."""
+        self.exact.clear()
+        CACHE_ENTRIES.set(0, tier="exact")
+        if self.semantic is not None:
+            self.semantic.clear()
+            CACHE_ENTRIES.set(0, tier="semantic")
+
+
+def is_cacheable(history) -> bool:
+    """Only opening questions are cached; follow-ups depend on earlier turns."""
+    for message in history or []:
+        role = message.get("role") if isinstance(message, dict) else getattr(message, "type", "")
+        if role in ("user", "human"):
+            return False
+    return True
+
+
+@lru_cache(maxsize=1)
+def get_response_cache():
+    """Returns the process-wide response cache, or None when RESPONSE_CACHE_ENABLED is false."""
+    if os.environ.get("RESPONSE_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    ttl_seconds = float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", 3600))
+    semantic = None
+    if os.environ.get("RESPONSE_CACHE_SEMANTIC", "false").lower() in ("1", "true", "yes"):
+        semantic = SemanticCache(
+            threshold=float(os.environ.get("RESPONSE_CACHE_SEMANTIC_THRESHOLD", 0.92)),
+            max_entries=int(os.environ.get("RESPONSE_CACHE_SEMANTIC_MAX_ENTRIES", 5000)),
+            ttl_seconds=ttl_seconds,
+            path=os.environ.get("RESPONSE_CACHE_SEMANTIC_PATH", DEFAULT_EMBEDDINGS_PATH)
+        )
+        atexit.register(semantic.flush)
+    return ResponseCache(
+        max_entries=int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 1000)),
+        ttl_seconds=ttl_seconds,
+        semantic=semantic
+    )
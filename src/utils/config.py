@@ -0,0 +1,29 @@
+import os
+
+
+def worker_count() -> int:
+    """Server worker processes; gunicorn.conf.py exports the count it starts."""
+    return int(os.environ.get("WEB_CONCURRENCY", 1))
+
+
+def checkpoint_backend() -> str:
+    """The CHECKPOINT_BACKEND to use: "sqlite" by default with several workers, "memory" otherwise.
+
+    In-memory conversations are per worker, so with several workers a session's
+    turns would land on workers holding different versions of it; that
+    combination is refused.
+    """
+    workers = worker_count()
+    backend = os.environ.get("CHECKPOINT_BACKEND", "sqlite" if workers > 1 else "memory").lower()
+    if backend == "memory" and workers > 1:
+        raise ValueError(f"CHECKPOINT_BACKEND=memory keeps conversations per worker; use sqlite with {workers} workers")
+    return backend
+
+
+def parse_seconds(value: str) -> dict:
+    """Parses per-name settings like 'tool_a=5,tool_b=2.5' into {'tool_a': 5.0, 'tool_b': 2.5}."""
+    seconds = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, number = item.partition("=")
+        seconds[name.strip()] = float(number)
+    return seconds
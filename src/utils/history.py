@@ -0,0 +1,273 @@
+import itertools
+import json
+import os
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character-based estimate
+    tiktoken = None
+
+# Extra tokens per message for role and separators in the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Counts tokens with tiktoken when available, otherwise estimates ~4 characters per token."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class CompactionPolicy:
+    """How much history one endpoint may send to the model.
+
+    Args:
+        max_tokens: Token budget for the whole prompt (system prompt included).
+        keep_recent_turns: Most recent user turns that are never summarized away.
+        tool_result_max_chars: Tool results outside the recent turns are cut to this size.
+        summary_max_chars: Size cap for the summary that replaces dropped turns.
+    """
+
+    def __init__(self, max_tokens: int = 4000, keep_recent_turns: int = 4,
+                 tool_result_max_chars: int = 400, summary_max_chars: int = 800):
+        self.max_tokens = max_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.tool_result_max_chars = tool_result_max_chars
+        self.summary_max_chars = summary_max_chars
+
+    @classmethod
+    def from_env(cls, endpoint: str, **defaults) -> "CompactionPolicy":
+        """Reads HISTORY_<ENDPOINT>_MAX_TOKENS, _KEEP_TURNS, _TOOL_CHARS and _SUMMARY_CHARS."""
+        prefix = f"HISTORY_{endpoint.upper()}_"
+        policy = cls(**defaults)
+        policy.max_tokens = int(os.environ.get(prefix + "MAX_TOKENS", policy.max_tokens))
+        policy.keep_recent_turns = int(os.environ.get(prefix + "KEEP_TURNS", policy.keep_recent_turns))
+        policy.tool_result_max_chars = int(os.environ.get(prefix + "TOOL_CHARS", policy.tool_result_max_chars))
+        policy.summary_max_chars = int(os.environ.get(prefix + "SUMMARY_CHARS", policy.summary_max_chars))
+        return policy
+
+
+# Defaults per endpoint; the agent needs more room for tool results
+_DEFAULTS = {
+    "chat": {"max_tokens": 3000, "keep_recent_turns": 4},
+    "agent": {"max_tokens": 6000, "keep_recent_turns": 3},
+}
+
+
+@lru_cache(maxsize=None)
+def get_policy(endpoint: str) -> CompactionPolicy:
+    return CompactionPolicy.from_env(endpoint, **_DEFAULTS.get(endpoint, {}))
+
+
+# --- Accessors that work for both OpenAI-style dicts and LangChain messages ---
+_ROLES = {"human": "user", "ai": "assistant"}
+
+
+def _role(message) -> str:
+    if isinstance(message, dict):
+        return message.get("role", "")
+    return _ROLES.get(message.type, message.type)
+
+
+def _content(message) -> str:
+    content = message.get("content") if isinstance(message, dict) else message.content
+    if isinstance(content, str):
+        return content
+    return json.dumps(content, ensure_ascii=False) if content else ""
+
+
+def _tool_call_ids(message) -> list:
+    tool_calls = message.get("tool_calls") if isinstance(message, dict) else getattr(message, "tool_calls", None)
+    return [call.get("id") for call in tool_calls or []]
+
+
+def _tool_call_id(message):
+    return message.get("tool_call_id") if isinstance(message, dict) else getattr(message, "tool_call_id", None)
+
+
+def _with_content(message, content: str):
+    if isinstance(message, dict):
+        return {**message, "content": content}
+    return message.model_copy(update={"content": content})
+
+
+def message_tokens(message) -> int:
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(_content(message))
+    tool_calls = message.get("tool_calls") if isinstance(message, dict) else getattr(message, "tool_calls", None)
+    if tool_calls:
+        tokens += count_tokens(json.dumps(tool_calls, ensure_ascii=False, default=str))
+    return tokens
+
+
+def count_prompt_tokens(messages: list) -> int:
+    return sum(message_tokens(message) for message in messages)
+
+
+def _turns_newest_first(messages: list, start: int = 0):
+    """Yields the turns of ``messages[start:]`` from the newest back; each turn starts at a user message.
+
+    Tool calls and their results always live in the same turn, so dropping whole
+    turns never leaves a tool result without the call that produced it.
+    """
+    turn = []
+    for index in range(len(messages) - 1, start - 1, -1):
+        turn.append(messages[index])
+        if _role(messages[index]) == "user":
+            yield turn[::-1]
+            turn = []
+    if turn:
+        yield turn[::-1]
+
+
+def _shrink_tool_results(turn: list, max_chars: int) -> list:
+    shrunk = []
+    for message in turn:
+        content = _content(message)
+        if _role(message) == "tool" and len(content) > max_chars:
+            omitted = len(content) - max_chars
+            message = _with_content(message, f"{content[:max_chars]}… [{omitted} characters omitted]")
+        shrunk.append(message)
+    return shrunk
+
+
+def _questions(messages_newest_first):
+    for message in messages_newest_first:
+        if _role(message) == "user":
+            text = " ".join(_content(message).split())
+            yield text[:120] + ("…" if len(text) > 120 else "")
+
+
+def _summary(questions_newest_first, max_chars: int) -> str:
+    questions, length = [], -3
+    for question in questions_newest_first:
+        questions.append(question)
+        length += len(question) + 3
+        # A longer summary is cut from the front, so older questions would not show
+        if length >= max_chars:
+            break
+    summary = "Resumen de la conversación anterior. El usuario preguntó: " + " | ".join(reversed(questions))
+    if len(summary) > max_chars:
+        summary = "…" + summary[-(max_chars - 1):]
+    return summary
+
+
+def summarize_turns(turns: list[list], max_chars: int) -> str:
+    """Default summary of dropped turns: the questions the user asked, newest last."""
+    return _summary(_questions(message for turn in reversed(turns) for message in reversed(turn)), max_chars)
+
+
+def _drop_orphan_tool_results(messages: list) -> list:
+    """Removes tool results whose tool call is no longer in the prompt."""
+    known_ids = set()
+    valid = []
+    for message in messages:
+        known_ids.update(_tool_call_ids(message))
+        if _role(message) == "tool" and _tool_call_id(message) not in known_ids:
+            continue
+        valid.append(message)
+    return valid
+
+
+def _newest_that_fit(turns, budget: int, reserve: int) -> tuple[list, bool, int]:
+    """Counts turns (newest first) until they exceed ``budget``.
+
+    Returns the turns read that fit, whether that was all of them, and how many
+    of them fit while leaving ``reserve`` tokens for a summary.
+    """
+    taken, total, with_reserve = [], 0, None
+    for turn in turns:
+        total += count_prompt_tokens(turn)
+        if total > budget:
+            break
+        taken.append(turn)
+        if total + reserve > budget and with_reserve is None:
+            with_reserve = len(taken) - 1
+    else:
+        return taken, True, len(taken) if with_reserve is None else with_reserve
+    return taken, False, len(taken) if with_reserve is None else with_reserve
+
+
+def compact_history(messages: list, policy: CompactionPolicy, summarizer=None) -> list:
+    """Fits a conversation into the policy's token budget.
+
+    The system messages it starts with and the most recent turns are kept
+    verbatim (tool results in older turns are shortened first). If the prompt
+    is still over budget, the oldest turns are dropped whole and replaced by a
+    short summary. Turns are counted from the newest back and only until the
+    budget is used up, so a long conversation costs no more to compact than one
+    that just fits. Works on both OpenAI-style dicts and LangChain messages; the
+    input list is not modified.
+
+    Args:
+        messages: The full prompt, system messages first.
+        policy: Budget and limits for this endpoint.
+        summarizer: Optional callable(turns, max_chars) -> str used instead of
+            summarize_turns, e.g. to summarize with a small model. It gets every
+            dropped turn.
+    """
+    start = 0
+    while start < len(messages) and _role(messages[start]) == "system":
+        start += 1
+    budget = policy.max_tokens - count_prompt_tokens(messages[:start])
+    reserve = MESSAGE_OVERHEAD_TOKENS + policy.summary_max_chars // 3
+
+    total = 0
+    for index in range(len(messages) - 1, start - 1, -1):
+        total += message_tokens(messages[index])
+        if total > budget:
+            break
+    else:
+        return list(messages)
+
+    def shrink(turn):
+        return _shrink_tool_results(turn, policy.tool_result_max_chars)
+
+    turns = _turns_newest_first(messages, start)
+    recent = list(itertools.islice(turns, policy.keep_recent_turns))
+    # The recent turns verbatim, then the older ones with shortened tool results
+    taken, all_fit, fitting = _newest_that_fit(itertools.chain(recent, map(shrink, turns)), budget, reserve)
+    if all_fit:
+        kept = taken
+    elif fitting >= len(recent):
+        kept = taken[:fitting]
+    else:
+        # The recent turns alone are over budget: shorten their tool results, then drop the oldest of them
+        recent = [shrink(turn) for turn in recent]
+        has_older = len(messages) - sum(len(turn) for turn in recent) > start
+        taken, all_fit, fitting = _newest_that_fit(recent, budget, reserve)
+        kept = taken if all_fit and not has_older else recent[:max(fitting, 1)]
+
+    # Everything before the kept turns is dropped
+    boundary = len(messages) - sum(len(turn) for turn in kept)
+    prompt = list(messages[:start])
+    if boundary > start:
+        if summarizer is not None:
+            summary = summarizer(list(_turns_newest_first(messages[:boundary], start))[::-1], policy.summary_max_chars)
+        else:
+            summary = _summary(_questions(messages[i] for i in range(boundary - 1, start - 1, -1)), policy.summary_max_chars)
+        prompt.append(_summary_message(messages[0], summary))
+    for turn in reversed(kept):
+        prompt.extend(turn)
+    return _drop_orphan_tool_results(prompt)
+
+
+def _summary_message(template, summary: str):
+    # Import here: the API counts tokens for admission before the LangChain modules are loaded
+    from langchain_core.messages import BaseMessage, SystemMessage
+    if isinstance(template, BaseMessage):
+        return SystemMessage(content=summary)
+    return {"role": "system", "content": summary}
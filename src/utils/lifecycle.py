@@ -0,0 +1,47 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from src.utils.metrics import REGISTRY
+
+IN_FLIGHT = REGISTRY.gauge("http_in_flight_requests", "Chat requests and streams being served", ("kind",))
+
+
+class InFlightRequests:
+    """Counts the requests a worker is serving so shutdown can wait for them.
+
+    Once ``drain`` starts, ``draining`` is True and new requests should be
+    refused (503) while the ones already running, streams in particular,
+    finish normally.
+    """
+
+    def __init__(self):
+        self.draining = False
+        self._active = {}  # kind -> count
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def count(self) -> int:
+        return sum(self._active.values())
+
+    @asynccontextmanager
+    async def track(self, kind: str = "request"):
+        self._active[kind] = self._active.get(kind, 0) + 1
+        IN_FLIGHT.set(self._active[kind], kind=kind)
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._active[kind] -= 1
+            IN_FLIGHT.set(self._active[kind], kind=kind)
+            if not self.count:
+                self._idle.set()
+
+    async def drain(self, timeout: float) -> int:
+        """Waits up to ``timeout`` seconds for in-flight requests; returns how many are left."""
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.count
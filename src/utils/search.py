@@ -0,0 +1,388 @@
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, every process writes
+    fcntl = None
+
+import numpy as np
+
+# Words too common to help rank issues
+STOPWORDS = frozenset(
+    "a about after all an and any are as at be but by can did do does for from has have how i in is it its "
+    "me my no not of on or our so that the their there this to was we were what when where which who why "
+    "will with you".split()
+)
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased words of ``text`` without stopwords and single letters."""
+    return [
+        token for token in _TOKEN.findall((text or "").lower())
+        if token not in STOPWORDS and (len(token) > 1 or token.isdigit())
+    ]
+
+
+class BM25Index:
+    """Inverted index ranking documents with BM25, updated one document at a time.
+
+    Postings are compact arrays of (slot, term frequency). Replacing or removing a
+    document only marks its slot dead; dead slots are skipped when scoring and
+    dropped by a compaction once they make up a third of the index. Scoring is
+    vectorized with NumPy, one term at a time.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._slot_by_id = {}       # doc id -> slot
+        self._ids = array("q")      # slot -> doc id
+        self._lengths = array("f")  # slot -> number of tokens
+        self._alive = bytearray()   # slot -> 1 while it holds the current version of a doc
+        self._postings = {}         # term -> (array of slots, array of term frequencies)
+        self._total_length = 0.0
+
+    def __len__(self):
+        return len(self._slot_by_id)
+
+    def add(self, doc_id: int, text: str):
+        """Indexes a document, replacing its previous version."""
+        self.add_many([(doc_id, text)])
+
+    def add_many(self, docs):
+        """Indexes ``(doc_id, text)`` pairs under one lock acquisition."""
+        tokenized = [(doc_id, Counter(tokenize(text))) for doc_id, text in docs]
+        with self._lock:
+            for doc_id, counts in tokenized:
+                self._remove(doc_id)
+                slot = len(self._ids)
+                length = sum(counts.values())
+                self._slot_by_id[doc_id] = slot
+                self._ids.append(doc_id)
+                self._lengths.append(length)
+                self._alive.append(1)
+                self._total_length += length
+                for term, tf in counts.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array("I"), array("H"))
+                    postings[0].append(slot)
+                    postings[1].append(min(tf, 65535))
+            self._maybe_compact()
+
+    def remove(self, doc_id: int):
+        self.remove_many([doc_id])
+
+    def remove_many(self, doc_ids):
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove(doc_id)
+            self._maybe_compact()
+
+    def _remove(self, doc_id):
+        slot = self._slot_by_id.pop(doc_id, None)
+        if slot is not None:
+            self._alive[slot] = 0
+            self._total_length -= self._lengths[slot]
+
+    def search(self, query: str, k: int = 10) -> list[tuple]:
+        """Returns up to ``k`` ``(doc_id, score)`` pairs, best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            live = len(self._slot_by_id)
+            if not terms or not live:
+                return []
+            alive = np.frombuffer(self._alive, dtype=np.bool_)
+            lengths = np.frombuffer(self._lengths, dtype=np.float32)
+            average_length = self._total_length / live
+            scores = np.zeros(len(lengths), dtype=np.float32)
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                slots = np.frombuffer(postings[0], dtype=np.uint32)
+                tfs = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+                current = alive[slots]
+                df = int(np.count_nonzero(current))
+                if not df:
+                    continue
+                idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+                # Each slot appears once per term, so fancy-index += is safe
+                norm = self.k1 * (1 - self.b + self.b * lengths[slots] / average_length)
+                scores[slots] += current * (idf * tfs * (self.k1 + 1) / (tfs + norm))
+            matched = np.flatnonzero(scores)
+            if len(matched) > k:
+                matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            ranked = matched[np.argsort(-scores[matched], kind="stable")]
+            return [(self._ids[slot], float(scores[slot])) for slot in ranked.tolist()]
+
+    def _maybe_compact(self):
+        dead = len(self._ids) - len(self._slot_by_id)
+        if dead > 1000 and dead * 3 > len(self._ids):
+            self._compact()
+
+    def _compact(self):
+        """Renumbers the live slots and drops the postings of dead ones."""
+        alive = np.frombuffer(self._alive, dtype=np.bool_).copy()
+        new_slot = (np.cumsum(alive) - 1).astype(np.uint32)
+        postings = {}
+        for term, (slots, tfs) in self._postings.items():
+            slots = np.frombuffer(slots, dtype=np.uint32)
+            keep = alive[slots]
+            if keep.any():
+                postings[term] = (
+                    array("I", new_slot[slots[keep]].tobytes()),
+                    array("H", np.frombuffer(tfs, dtype=np.uint16)[keep].tobytes()),
+                )
+        ids = np.frombuffer(self._ids, dtype=np.int64)[alive]
+        self._postings = postings
+        self._ids = array("q", ids.tobytes())
+        self._lengths = array("f", np.frombuffer(self._lengths, dtype=np.float32)[alive].tobytes())
+        self._alive = bytearray(b"\x01" * len(ids))
+        self._slot_by_id = {doc_id: slot for slot, doc_id in enumerate(ids.tolist())}
+
+
+class VectorIndex:
+    """Embeddings by id in memory-mapped NumPy arrays, searched by batched dot products.
+
+    With a ``path`` the vectors, ids and text fingerprints live in ``<path>.vectors``,
+    ``<path>.ids`` and ``<path>.fingerprints`` and survive restarts, so only the
+    documents whose fingerprint changed need to be embedded again. Vectors are
+    expected to be L2-normalized; the score is their cosine similarity.
+
+    Worker processes sharing the files do not write them concurrently: the one
+    holding ``<path>.lock`` opens them for writing, the others open them read-only
+    (``writable`` is False) and ``refresh`` picks up what the writer flushed. A
+    reader takes over once the writer exits.
+    """
+
+    def __init__(self, dim: int, path: str = None, batch_rows: int = 65536):
+        self.dim = dim
+        self.path = path
+        self.batch_rows = batch_rows
+        self._lock = threading.Lock()
+        self._slot_by_id = {}
+        self._free = []  # slots of removed vectors, reused first
+        self._size = 0   # slots in use, including free ones
+        self._capacity = 0
+        self._lock_file = None
+        self._meta_stamp = None  # metadata file a reader loaded, to notice new flushes
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.writable = self._acquire_lock()
+        self._load()
+
+    def __len__(self):
+        return len(self._slot_by_id)
+
+    def _files(self):
+        return {name: f"{self.path}.{name}" for name in ("vectors", "ids", "fingerprints")}
+
+    def _acquire_lock(self) -> bool:
+        """True if this process may write the files: it holds the write lock, or no lock is used."""
+        if self.path is None or fcntl is None or self._lock_file is not None:
+            return True
+        lock_file = open(self.path + ".lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # The lock lasts as long as the file stays open, i.e. until close() or process exit
+        self._lock_file = lock_file
+        return True
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.path + ".json")
+        except OSError:
+            return None
+        # Each flush replaces the file, so its inode changes even within one mtime tick
+        return stat.st_ino, stat.st_mtime_ns
+
+    def refresh(self) -> bool:
+        """Reader: reloads the files if the writer flushed since, or becomes the writer if it exited.
+
+        Returns True when this process just became the writer.
+        """
+        if self.writable:
+            return False
+        with self._lock:
+            if self.writable:
+                return False
+            writable = self._acquire_lock()
+            if not writable and self._stamp() == self._meta_stamp:
+                return False
+            self.writable = writable
+            self._slot_by_id, self._free, self._size, self._capacity = {}, [], 0, 0
+            self._load()
+            return writable
+
+    def close(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _map(self, capacity: int):
+        """(Re)creates the arrays for ``capacity`` rows, keeping the rows written so far."""
+        if self.path is None:
+            vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            ids = np.full(capacity, -1, dtype=np.int64)
+            fingerprints = np.zeros(capacity, dtype=np.uint64)
+            if self._capacity:
+                vectors[:self._size] = self.vectors[:self._size]
+                ids[:self._size] = self.ids[:self._size]
+                fingerprints[:self._size] = self.fingerprints[:self._size]
+            self.vectors, self.ids, self.fingerprints = vectors, ids, fingerprints
+        elif not self.writable:
+            files = self._files()
+            self.vectors = np.memmap(files["vectors"], dtype=np.float32, mode="r", shape=(capacity, self.dim))
+            self.ids = np.memmap(files["ids"], dtype=np.int64, mode="r", shape=(capacity,))
+            self.fingerprints = np.memmap(files["fingerprints"], dtype=np.uint64, mode="r", shape=(capacity,))
+        else:
+            files = self._files()
+            row_bytes = {"vectors": 4 * self.dim, "ids": 8, "fingerprints": 8}
+            for name, filename in files.items():
+                with open(filename, "ab") as f:
+                    f.truncate(capacity * row_bytes[name])
+            self.vectors = np.memmap(files["vectors"], dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+            self.ids = np.memmap(files["ids"], dtype=np.int64, mode="r+", shape=(capacity,))
+            self.fingerprints = np.memmap(files["fingerprints"], dtype=np.uint64, mode="r+", shape=(capacity,))
+            # Rows added by growing the files are zeros; mark them empty
+            self.ids[self._capacity:] = -1
+        self._capacity = capacity
+
+    def _load(self):
+        if not self.writable:
+            self._meta_stamp = self._stamp()
+        meta = self._read_meta()
+        if meta is None or meta.get("dim") != self.dim:
+            if self.writable:
+                self._map(1024)
+            else:
+                # Nothing flushed yet: an empty index until the writer's first flush
+                self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+                self.ids = np.zeros(0, dtype=np.int64)
+                self.fingerprints = np.zeros(0, dtype=np.uint64)
+            return
+        self._capacity = meta["capacity"]
+        self._size = meta["size"]
+        self._map(self._capacity)
+        ids = np.asarray(self.ids[:self._size])
+        used = np.flatnonzero(ids >= 0)
+        self._slot_by_id = dict(zip(ids[used].tolist(), used.tolist()))
+        self._free = np.flatnonzero(ids < 0).tolist()
+
+    def _read_meta(self):
+        if self.path is None or not os.path.exists(self.path + ".json"):
+            return None
+        try:
+            with open(self.path + ".json", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable vector index at {self.path}: {e}")
+            return None
+        # Files from an interrupted write are shorter than the metadata says
+        if os.path.getsize(self.path + ".ids") < 8 * meta.get("capacity", 0):
+            return None
+        return meta
+
+    def fingerprint(self, doc_id: int):
+        """Fingerprint stored with the vector of ``doc_id``, or None if it is not indexed."""
+        slot = self._slot_by_id.get(doc_id)
+        return None if slot is None else int(self.fingerprints[slot])
+
+    def doc_ids(self) -> list[int]:
+        return list(self._slot_by_id)
+
+    def upsert(self, doc_ids, vectors: np.ndarray, fingerprints=None):
+        """Writes one vector per id, replacing existing ones in place."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._check_writable()
+            slots = []
+            for doc_id in doc_ids:
+                slot = self._slot_by_id.get(doc_id)
+                if slot is None:
+                    slot = self._free.pop() if self._free else self._append_slot()
+                    self._slot_by_id[doc_id] = slot
+                slots.append(slot)
+            slots = np.asarray(slots, dtype=np.int64)
+            self.vectors[slots] = vectors
+            self.ids[slots] = np.asarray(list(doc_ids), dtype=np.int64)
+            self.fingerprints[slots] = 0 if fingerprints is None else np.asarray(fingerprints, dtype=np.uint64)
+
+    def _append_slot(self) -> int:
+        if self._size == self._capacity:
+            # Grow geometrically so appending stays amortized O(1)
+            self._map(max(2 * self._capacity, 1024))
+        self._size += 1
+        return self._size - 1
+
+    def _check_writable(self):
+        if not self.writable:
+            raise PermissionError(f"Vector index {self.path} is written by another process")
+
+    def remove(self, doc_ids):
+        with self._lock:
+            self._check_writable()
+            for doc_id in doc_ids:
+                slot = self._slot_by_id.pop(doc_id, None)
+                if slot is not None:
+                    self.ids[slot] = -1
+                    self.vectors[slot] = 0
+                    self._free.append(slot)
+
+    def search(self, vector: np.ndarray, k: int = 10) -> list[tuple]:
+        """Returns up to ``k`` ``(doc_id, score)`` pairs, best first.
+
+        Scores ``batch_rows`` vectors at a time so only one batch of the memory map
+        is paged in at once, keeping a running top-k.
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        best_scores = np.zeros(0, dtype=np.float32)
+        best_slots = np.zeros(0, dtype=np.int64)
+        with self._lock:
+            if not self._slot_by_id:
+                return []
+            for start in range(0, self._size, self.batch_rows):
+                end = min(start + self.batch_rows, self._size)
+                scores = self.vectors[start:end] @ vector
+                scores[np.asarray(self.ids[start:end]) < 0] = -np.inf
+                if end - start > k:
+                    top = np.argpartition(-scores, k - 1)[:k]
+                else:
+                    top = np.arange(end - start)
+                best_scores = np.concatenate([best_scores, scores[top]])
+                best_slots = np.concatenate([best_slots, top + start])
+                if len(best_scores) > k:
+                    keep = np.argpartition(-best_scores, k - 1)[:k]
+                    best_scores, best_slots = best_scores[keep], best_slots[keep]
+            order = np.argsort(-best_scores, kind="stable")
+            return [
+                (int(self.ids[slot]), float(score))
+                for slot, score in zip(best_slots[order].tolist(), best_scores[order].tolist())
+                if score != -np.inf
+            ]
+
+    def flush(self):
+        """Writes the arrays and the metadata describing them to disk."""
+        if self.path is None:
+            return
+        with self._lock:
+            self._check_writable()
+            for array_ in (self.vectors, self.ids, self.fingerprints):
+                array_.flush()
+            # Readers may load the metadata at any time: replace it in one step
+            with open(self.path + ".json.tmp", "w", encoding="utf-8") as f:
+                json.dump({"dim": self.dim, "capacity": self._capacity, "size": self._size}, f)
+            os.replace(self.path + ".json.tmp", self.path + ".json")
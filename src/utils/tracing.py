@@ -0,0 +1,257 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import aclosing, contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from src.utils.metrics import REGISTRY
+
+NODE_SECONDS = REGISTRY.histogram("agent_node_seconds", "Time spent in each agent graph node", ("node",))
+TOOL_SECONDS = REGISTRY.histogram("agent_tool_seconds", "Tool call latency by tool and outcome", ("tool", "outcome"))
+LLM_SECONDS = REGISTRY.histogram(
+    "llm_call_seconds", "LLM call latency by endpoint and outcome, retries included", ("endpoint", "outcome")
+)
+ITERATIONS = REGISTRY.histogram(
+    "agent_iterations", "LLM calls made by one agent request", buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+)
+
+# Trace of the request being served; spans started inside it are recorded there
+_TRACE = contextvars.ContextVar("trace", default=None)
+
+
+class Span:
+    """A timed operation: a graph node, a tool call or an LLM call."""
+
+    __slots__ = ("kind", "name", "start", "duration", "attributes")
+
+    def __init__(self, kind: str, name: str, attributes: dict):
+        self.kind = kind
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration = None
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self, trace_start: float) -> dict:
+        return {
+            "kind": self.kind,
+            "name": self.name,
+            "offset_ms": round((self.start - trace_start) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+            **self.attributes,
+        }
+
+
+class Trace:
+    """One request. Counts its LLM calls always; keeps its spans only when sampled."""
+
+    def __init__(self, name: str, sampled: bool, attributes: dict):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.sampled = sampled
+        self.attributes = attributes
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.duration = None
+        self.llm_calls = 0
+        self.spans = []
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start": self.started_at.isoformat(),
+            "duration_ms": round(self.duration * 1000, 3),
+            "llm_calls": self.llm_calls,
+            "attributes": self.attributes,
+            "spans": [span.to_dict(self.start) for span in self.spans],
+        }
+
+
+class JsonlTraceExporter:
+    """Appends traces to a JSON Lines file from a background thread, off the request path."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue = queue.Queue(maxsize=10000)
+        self._thread = None
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, trace: Trace):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(trace.to_dict())
+        except queue.Full:
+            # Losing traces beats slowing requests down
+            pass
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    f.flush()
+                    return
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+    def close(self, timeout: float = 5):
+        """Writes the queued traces and stops the thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+
+class Tracer:
+    """Starts request traces; a ``sample_rate`` share of them is written by the exporter.
+
+    Metrics are recorded for every request. Spans are only kept, and traces only
+    exported, for sampled requests, and nothing is sampled without an exporter.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, exporter: JsonlTraceExporter = None):
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """Reads TRACE_EXPORT_PATH (JSON Lines file, unset = no export) and TRACE_SAMPLE_RATE (0-1)."""
+        path = os.environ.get("TRACE_EXPORT_PATH")
+        return cls(
+            sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE", 1.0)),
+            exporter=JsonlTraceExporter(path) if path else None
+        )
+
+    def _sample(self) -> bool:
+        return self.exporter is not None and random.random() < self.sample_rate
+
+    @contextmanager
+    def trace(self, name: str, **attributes):
+        """Traces the block as one request; nested traces are part of the outer one."""
+        if _TRACE.get() is not None:
+            yield _TRACE.get()
+            return
+        trace = Trace(name, self._sample(), attributes)
+        token = _TRACE.set(trace)
+        try:
+            yield trace
+        finally:
+            trace.duration = time.perf_counter() - trace.start
+            try:
+                _TRACE.reset(token)
+            except ValueError:
+                # Async generators may be closed from another context
+                pass
+            if name == "agent" and trace.llm_calls:
+                ITERATIONS.observe(trace.llm_calls)
+            if trace.sampled:
+                self.exporter.export(trace)
+
+    def close(self):
+        if self.exporter is not None:
+            self.exporter.close()
+
+
+@lru_cache(maxsize=1)
+def get_tracer() -> Tracer:
+    return Tracer.from_env()
+
+
+def annotate(**attributes):
+    """Adds attributes (session, route, ...) to the current request's trace."""
+    trace = _TRACE.get()
+    if trace is not None and trace.sampled:
+        trace.attributes.update(attributes)
+
+
+def _observe(span: Span):
+    outcome = span.attributes.get("outcome", "ok")
+    if span.kind == "node":
+        NODE_SECONDS.observe(span.duration, node=span.name)
+    elif span.kind == "tool":
+        TOOL_SECONDS.observe(span.duration, tool=span.name, outcome=outcome)
+    elif span.kind == "llm":
+        LLM_SECONDS.observe(span.duration, endpoint=span.name, outcome=outcome)
+
+
+@contextmanager
+def span(kind: str, name: str, **attributes):
+    """Times the block into the histogram of its kind (node, tool or llm) and the sampled trace."""
+    current = Span(kind, name, attributes)
+    trace = _TRACE.get()
+    if trace is not None and kind == "llm":
+        trace.llm_calls += 1
+    try:
+        yield current
+    except BaseException as e:
+        current.set(outcome="error", error=type(e).__name__)
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.start
+        _observe(current)
+        if trace is not None and trace.sampled:
+            trace.spans.append(current)
+
+
+def traced(kind: str, name: str):
+    """Decorator running a sync or async function inside a span."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(kind, name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(kind, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_request(name: str):
+    """Decorator tracing each call of a sync, async or async generator function as one request."""
+    def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def generator_wrapper(*args, **kwargs):
+                with get_tracer().trace(name):
+                    # Closing the wrapper (client gone) closes the wrapped generator right away
+                    async with aclosing(func(*args, **kwargs)) as stream:
+                        async for item in stream:
+                            yield item
+            return generator_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with get_tracer().trace(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_tracer().trace(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
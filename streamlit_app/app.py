@@ -62,6 +62,32 @@ def get_assistant_response(query, conversation_history=None):
     except Exception as e:
         raise Exception(f"Error getting response from model: {str(e)}")
 
+# Backend API used for streaming responses
+API_URL = os.environ.get("API_URL", "http://localhost:8080")
+
+def stream_agent_response(query, conversation_history, user_str):
+    """Yield reply tokens from the API's /chat/stream endpoint as they arrive"""
+    payload = {
+        "query": query,
+        "conversation_history": conversation_history,
+        "user": user_str,
+        "session_id": st.session_state.session_id
+    }
+    with requests.post(f"{API_URL}/chat/stream", json=payload, stream=True, timeout=(3, 120)) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):])
+                if event == "token":
+                    yield data["content"]
+                elif event == "tool_start":
+                    st.toast(f"🔧 {data['name']}")
+                elif event == "error":
+                    raise Exception(data["message"])
+
 # Initialize chat history and session ID
 import uuid
 
@@ -78,6 +104,8 @@ if st.sidebar.button("Clear Chat History"):
     st.session_state.messages = [
         {"role": "assistant", "content": "¡Hola! Soy tu asistente de Redmine. ¿En qué puedo ayudarte hoy?"}
     ]
+    # The agent resumes from its checkpoint per session, so start a new one
+    st.session_state.session_id = str(uuid.uuid4())
     st.rerun()
 
 # UI Components
@@ -172,40 +200,49 @@ if user_input:
     st.session_state.messages.append({"role": "user", "content": user_input})
     
     # Process the query
-    with st.spinner("Thinking..."):
+    try:
+        # Get conversation history
+        conversation_history = prepare_conversation_history()
+        
+        # Get response from model
+        # This is the Redmine username that will be used in the system message
+        # and for automatically handling queries about "my tasks" or "my projects"
+        user_str = 'sally'  # In a real app, this would come from authentication
         try:
-            # Get conversation history
-            conversation_history = prepare_conversation_history()
-            
-            # Get response from model
-            # This is the Redmine username that will be used in the system message
-            # and for automatically handling queries about "my tasks" or "my projects"
-            user_str = 'sally'  # In a real app, this would come from authentication
-            try:
-                response_content = call_agent(user_input, st.session_state.session_id, user_str, conversation_history)
-                if isinstance(response_content, dict) and 'message' in response_content:
-                    message_response = response_content['message']
-                    print('Response content:', message_response)
-                    
-                    # Add response to chat history and update UI
-                    display_bot_response(message_response)
-                else:
-                    print('Unexpected response format:', response_content)
+            # Render tokens as they arrive from the API
+            with chat_container:
+                message_response = st.write_stream(
+                    stream_agent_response(user_input, conversation_history, user_str)
+                )
+            display_bot_response(message_response)
+        except requests.exceptions.ConnectionError:
+            # API not reachable: run the agent in-process instead
+            with st.spinner("Thinking..."):
+                try:
+                    response_content = call_agent(user_input, st.session_state.session_id, user_str, conversation_history)
+                    if isinstance(response_content, dict) and 'message' in response_content:
+                        message_response = response_content['message']
+                        print('Response content:', message_response)
+                        
+                        # Add response to chat history and update UI
+                        display_bot_response(message_response)
+                    else:
+                        print('Unexpected response format:', response_content)
+                        display_bot_response("I'm sorry, I encountered an error processing your request.")
+                except Exception as e:
+                    print(f"Error in call_agent: {str(e)}")
                     display_bot_response("I'm sorry, I encountered an error processing your request.")
-            except Exception as e:
-                print(f"Error in call_agent: {str(e)}")
-                display_bot_response("I'm sorry, I encountered an error processing your request.")
-            
-        except Exception as e:
-            # Log the error
-            print('Error generating response:', str(e))
-            st.error(f"Error generating response: {str(e)}", icon="🚨")
-            
-            # Get fallback response
-            response_content = get_fallback_response(user_input)
-            
-            # Add fallback response to chat history and update UI
-            display_bot_response(response_content)
+        
+    except Exception as e:
+        # Log the error
+        print('Error generating response:', str(e))
+        st.error(f"Error generating response: {str(e)}", icon="🚨")
+        
+        # Get fallback response
+        response_content = get_fallback_response(user_input)
+        
+        # Add fallback response to chat history and update UI
+        display_bot_response(response_content)
             
     # Force a rerun to update the UI with all messages
     st.rerun()